@@ -0,0 +1,37 @@
+"""
+CLI command to build lesson template schemas.
+Run after deploying new lesson fixtures so sandboxes clone fresh data.
+"""
+
+import asyncio
+import sys
+
+from app.core.sandbox_config import get_sandbox_config
+from app.services.schema_manager import LESSON_FIXTURES, MySQLSchemaManager
+
+
+async def build_templates(lesson_ids: list[int]) -> None:
+    """(Re)build template schemas for the given lessons."""
+    config = get_sandbox_config()
+    schema_manager = MySQLSchemaManager(config)
+    try:
+        print("Building lesson template schemas...")
+        for lesson_id in lesson_ids:
+            tables = await schema_manager.build_template(lesson_id)
+            print(f"  {config.get_template_schema_name(lesson_id)}: {len(tables)} tables")
+        print("✓ Successfully built lesson templates")
+    except Exception as e:
+        print(f"✗ Error building lesson templates: {e}")
+        sys.exit(1)
+    finally:
+        await schema_manager.close()
+
+
+def main(args: list[str] | None = None) -> None:
+    """Main entry point for the CLI command."""
+    lesson_ids = [int(arg) for arg in args] if args else sorted(LESSON_FIXTURES)
+    asyncio.run(build_templates(lesson_ids))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
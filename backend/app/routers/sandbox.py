@@ -2,42 +2,175 @@
 Sandbox API endpoints for SQL query execution.
 """
 
+import asyncio
+import math
+from collections.abc import AsyncIterator, Awaitable
 from datetime import UTC, datetime
+from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.auth import get_current_user
 from app.core.database import get_db
 from app.core.sandbox_config import SandboxConfig
-from app.models.database import Lesson
+from app.models.database import Lesson, User
 from app.schemas.sandbox import (
     QueryExecuteRequest,
     QueryExecuteResponse,
+    QueryResultPage,
+    QueryStreamError,
+    QueryStreamFrame,
     QueryValidateResponse,
     SandboxCreateRequest,
     SandboxCreateResponse,
     SandboxDestroyResponse,
+    SandboxMetricsReport,
     SandboxStatus,
     SandboxStatusResponse,
 )
+from app.services.admission import SandboxAdmission, SandboxBusy
+from app.services.connection_pool import SandboxConnectionPool
+from app.services.cost_gate import QueryCostGate
+from app.services.metrics import SandboxMetricsCollector
+from app.services.orphan_collector import OrphanSchemaCollector
 from app.services.query_executor import MySQLQueryExecutor
-from app.services.sandbox import InMemorySandboxManager, SandboxService
-from app.services.schema_manager import MySQLSchemaManager
+from app.services.query_scheduler import QueryScheduler
+from app.services.query_validator import ValidatorRegistry
+from app.services.rate_limiter import RateLimiter, RateLimitExceeded, SQLRateLimitBackend
+from app.services.reaper import SandboxReaper
+from app.services.result_encoding import (
+    COLUMNAR_MEDIA_TYPE,
+    accepts_columnar,
+    dumps,
+    encode_result,
+)
+from app.services.result_fingerprint import ExpectedResult, ExpectedResultCache
+from app.services.result_store import ResultStore
+from app.services.sandbox import InMemorySandboxManager, ISandboxManager, SandboxService
+from app.services.sandbox_registry import SQLSandboxManager
+from app.services.schema_manager import MySQLSchemaManager, create_admin_pool
+from app.services.shared_schema import SharedSchemaManager, SharedSchemaSandboxManager
+from app.services.sqlite_engine import SQLiteQueryExecutor, SQLiteSchemaManager
+from app.services.verdict_cache import VerdictCache, VerdictCacheKey
+from app.services.warm_pool import WarmSandboxPool
 
 router = APIRouter(prefix="/api/v1/sandbox", tags=["sandbox"])
 
+# How often a running query checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+
 # Initialize services (in production, these would be dependency-injected)
 sandbox_config = SandboxConfig()
-sandbox_manager = InMemorySandboxManager(sandbox_config)
-schema_manager = MySQLSchemaManager(sandbox_config)
-query_executor = MySQLQueryExecutor(sandbox_config)
+# A shared registry lets several workers serve the same sandboxes
+sandbox_manager: ISandboxManager = (
+    SQLSandboxManager(sandbox_config)
+    if sandbox_config.registry_url
+    else InMemorySandboxManager(sandbox_config)
+)
+metrics = SandboxMetricsCollector(sandbox_config)
+schema_manager = MySQLSchemaManager(sandbox_config, pool=create_admin_pool(sandbox_config))
+query_pool = SandboxConnectionPool(sandbox_config, metrics=metrics)
+result_store = ResultStore(sandbox_config)
+validator_registry = ValidatorRegistry(sandbox_config)
+query_scheduler = QueryScheduler(sandbox_config) if sandbox_config.scheduler_enabled else None
+cost_gate = QueryCostGate(sandbox_config) if sandbox_config.cost_gate_enabled else None
+query_executor = MySQLQueryExecutor(
+    sandbox_config,
+    pool=query_pool,
+    result_store=result_store,
+    validator_registry=validator_registry,
+    scheduler=query_scheduler,
+    metrics=metrics,
+    cost_gate=cost_gate,
+)
+# Lessons whose policy selects SQLite run in process; all others go on to MySQL
+sqlite_schema_manager = (
+    SQLiteSchemaManager(sandbox_config, validator_registry, fallback=schema_manager)
+    if sandbox_config.sqlite_engine_enabled
+    else None
+)
+sqlite_query_executor = (
+    SQLiteQueryExecutor(sandbox_config, sqlite_schema_manager, fallback=query_executor)
+    if sqlite_schema_manager is not None
+    else None
+)
+
+
+def _runs_on_mysql(lesson_id: int) -> bool:
+    return sqlite_schema_manager is None or not sqlite_schema_manager.handles(lesson_id)
+
+
+# Warm schemas are MySQL schemas, so lessons on SQLite never claim them
+warm_pool = (
+    WarmSandboxPool(sandbox_config, schema_manager, lesson_filter=_runs_on_mysql)
+    if sandbox_config.warm_pool_enabled
+    else None
+)
+expected_results = ExpectedResultCache()
+verdict_cache = VerdictCache(sandbox_config) if sandbox_config.verdict_cache_enabled else None
+# Workers sharing the sandbox registry also share rate limit buckets
+rate_limit_backend = (
+    SQLRateLimitBackend(sandbox_manager.engine)
+    if isinstance(sandbox_manager, SQLSandboxManager)
+    else None
+)
+rate_limiter = RateLimiter(sandbox_config, rate_limit_backend)
+admission = SandboxAdmission(sandbox_config)
 sandbox_service = SandboxService(
     config=sandbox_config,
-    sandbox_manager=sandbox_manager,
-    schema_manager=schema_manager,
-    query_executor=query_executor,
+    # SELECT-only lessons share their template schema instead of getting private copies
+    sandbox_manager=(
+        SharedSchemaSandboxManager(sandbox_config, sandbox_manager, validator_registry)
+        if sandbox_config.shared_schemas_enabled
+        else sandbox_manager
+    ),
+    schema_manager=(
+        SharedSchemaManager(sandbox_config, sqlite_schema_manager or schema_manager)
+        if sandbox_config.shared_schemas_enabled
+        else sqlite_schema_manager or schema_manager
+    ),
+    query_executor=sqlite_query_executor or query_executor,
+    warm_pool=warm_pool,
+    result_store=result_store,
+    verdict_cache=verdict_cache,
+    rate_limiter=rate_limiter if sandbox_config.rate_limit_enabled else None,
+    admission=admission,
+    metrics=metrics,
 )
+reaper = SandboxReaper(sandbox_config, sandbox_service)
+orphan_collector = OrphanSchemaCollector(sandbox_config, sandbox_manager, schema_manager, warm_pool)
+
+
+async def start_sandbox_services() -> None:
+    """Start background sandbox tasks on application startup."""
+    if sandbox_config.enabled and isinstance(sandbox_manager, SQLSandboxManager):
+        await sandbox_manager.initialize()
+    if sandbox_config.enabled and rate_limit_backend is not None:
+        await rate_limit_backend.initialize()
+    if sandbox_config.enabled and warm_pool is not None:
+        warm_pool.start()
+    if sandbox_config.enabled:
+        reaper.start()
+    if sandbox_config.enabled and sandbox_config.orphan_gc_enabled:
+        orphan_collector.start()
+
+
+async def close_sandbox_services() -> None:
+    """Release long-lived sandbox resources on application shutdown."""
+    await reaper.stop()
+    await orphan_collector.stop()
+    if warm_pool is not None:
+        await warm_pool.stop()
+    await query_pool.close()
+    await schema_manager.close()
+    if sqlite_query_executor is not None:
+        sqlite_query_executor.close()
+    result_store.close()
+    if isinstance(sandbox_manager, SQLSandboxManager):
+        await sandbox_manager.close()
 
 
 @router.post("/create", response_model=SandboxCreateResponse, status_code=status.HTTP_201_CREATED)
@@ -89,8 +222,10 @@ async def create_sandbox(
 async def execute_query(
     sandbox_id: str,
     request: QueryExecuteRequest,
+    http_request: Request,
     db: AsyncSession = Depends(get_db),
-) -> QueryValidateResponse:
+    accept: str | None = Header(default=None),
+) -> QueryValidateResponse | Response:
     """
     Execute a SQL query in a sandbox environment.
 
@@ -99,6 +234,12 @@ async def execute_query(
     - Executes the query with timeout enforcement
     - Optionally compares results with expected output
     - Returns pass/fail status with result preview
+
+    Send ``Accept: application/vnd.sqlhero.columnar+json`` to receive the result
+    column by column (see app.services.result_encoding) instead of as row arrays.
+
+    If the client disconnects while the query runs, the query is cancelled and
+    killed on the MySQL server.
     """
     try:
         # Get sandbox
@@ -111,7 +252,12 @@ async def execute_query(
 
         # Execute query
         try:
-            result = await sandbox_service.execute_query(sandbox_id, request.query)
+            result, cache_key = await _cancel_on_disconnect(
+                http_request,
+                sandbox_service.execute_query_with_cache_key(sandbox_id, request.query),
+            )
+        except (RateLimitExceeded, SandboxBusy) as e:
+            raise _rate_limit_error(e)
         except TimeoutError as e:
             raise HTTPException(
                 status_code=status.HTTP_408_REQUEST_TIMEOUT,
@@ -126,21 +272,44 @@ async def execute_query(
         # If validation requested, compare with expected result
         if request.validate_against_expected:
             # Get lesson expected result
-            result_db = await db.execute(select(Lesson).where(Lesson.id == sandbox.lesson_id))
-            lesson = result_db.scalar_one_or_none()
+            expected = await _get_expected_result(db, sandbox.lesson_id)
 
-            if not lesson or not lesson.expected_result:
-                return QueryValidateResponse(
-                    passed=False,
-                    result=result,
-                    differences=["No expected result defined for this lesson"],
-                    message="Cannot validate: no expected result available",
+            if expected is None:
+                return _render_response(
+                    QueryValidateResponse(
+                        passed=False,
+                        result=result,
+                        differences=["No expected result defined for this lesson"],
+                        message="Cannot validate: no expected result available",
+                    ),
+                    accept,
                 )
 
-            # Compare results
-            matches, differences = query_executor.compare_results(
-                result, lesson.expected_result, ordered=False
-            )
+            verdict = None
+            if cache_key is not None and verdict_cache is not None:
+                verdict = verdict_cache.get_verdict(cache_key, expected.version)
+
+            if verdict is not None:
+                matches, differences = verdict
+            else:
+                # Compare against the full result, not just the first page of a spilled one
+                full_result = result
+                if result.result_handle:
+                    full_result = result.model_copy(
+                        update={"rows": result_store.get_rows(sandbox_id, result.result_handle)}
+                    )
+
+                # Compare results
+                with metrics.time("compare"):
+                    matches, differences = query_executor.compare_results(
+                        full_result,
+                        expected.result,
+                        ordered=False,
+                        expected_fingerprint=expected.fingerprint,
+                    )
+
+                if cache_key is not None and verdict_cache is not None:
+                    verdict_cache.put_verdict(cache_key, expected.version, matches, differences)
 
             message = (
                 "✓ Perfect! Your query result matches the expected output."
@@ -148,19 +317,25 @@ async def execute_query(
                 else "✗ Your query result doesn't match the expected output. Review the differences below."
             )
 
-            return QueryValidateResponse(
-                passed=matches,
-                result=result,
-                differences=differences,
-                message=message,
+            return _render_response(
+                QueryValidateResponse(
+                    passed=matches,
+                    result=result,
+                    differences=differences,
+                    message=message,
+                ),
+                accept,
             )
         else:
             # Just return the result without validation
-            return QueryValidateResponse(
-                passed=True,
-                result=result,
-                differences=[],
-                message="Query executed successfully",
+            return _render_response(
+                QueryValidateResponse(
+                    passed=True,
+                    result=result,
+                    differences=[],
+                    message="Query executed successfully",
+                ),
+                accept,
             )
 
     except HTTPException:
@@ -177,6 +352,143 @@ async def execute_query(
         )
 
 
+async def _get_expected_result(db: AsyncSession, lesson_id: int) -> ExpectedResult | None:
+    """
+    Get a lesson's expected result and fingerprint.
+    Only the lesson's updated_at is read unless the cached entry is missing or stale.
+    """
+    version_db = await db.execute(select(Lesson.updated_at).where(Lesson.id == lesson_id))
+    version = version_db.scalar_one_or_none()
+
+    expected = expected_results.get(lesson_id, version)
+    if expected is not None:
+        return expected
+
+    result_db = await db.execute(select(Lesson).where(Lesson.id == lesson_id))
+    lesson = result_db.scalar_one_or_none()
+    if not lesson or not lesson.expected_result:
+        return None
+
+    return expected_results.put(lesson_id, lesson.updated_at, lesson.expected_result)
+
+
+async def _cancel_on_disconnect(
+    http_request: Request,
+    awaitable: Awaitable[tuple[QueryExecuteResponse, VerdictCacheKey | None]],
+) -> tuple[QueryExecuteResponse, VerdictCacheKey | None]:
+    """Await the result, cancelling the work if the client disconnects first."""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                break
+    finally:
+        if not task.done():
+            task.cancel()
+            # Let the executor kill the statement before the request ends
+            await asyncio.wait({task})
+
+    raise HTTPException(status_code=499, detail="Client closed request")
+
+
+def _rate_limit_error(error: RateLimitExceeded | SandboxBusy) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=str(error),
+        headers={"Retry-After": str(math.ceil(error.retry_after))},
+    )
+
+
+def _render_response(
+    response: QueryValidateResponse, accept: str | None
+) -> QueryValidateResponse | Response:
+    """Return the response as-is, or column-encoded if the client asked for it."""
+    if not accepts_columnar(accept):
+        return response
+
+    with metrics.time("serialize"):
+        body = response.model_dump(exclude={"result"})
+        body["result"] = encode_result(response.result)
+        content = dumps(body)
+    return Response(content=content, media_type=COLUMNAR_MEDIA_TYPE)
+
+
+@router.post("/{sandbox_id}/execute/stream")
+async def execute_query_stream(sandbox_id: str, request: QueryExecuteRequest) -> StreamingResponse:
+    """
+    Execute a SQL query and stream the result as NDJSON.
+
+    Frames, one JSON object per line:
+    - {"type": "header", "columns": [...]}
+    - {"type": "rows", "rows": [[...], ...]} (repeated)
+    - {"type": "trailer", "row_count": ..., "execution_time": ..., "truncated": ...}
+
+    Errors raised before the first frame are returned as regular HTTP errors; errors
+    after that end the stream with an {"type": "error", "detail": ...} frame.
+    Result comparison is not available on this endpoint.
+    """
+    sandbox = await sandbox_manager.get_sandbox(sandbox_id)
+    if not sandbox:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Sandbox {sandbox_id} not found",
+        )
+
+    frames = sandbox_service.stream_query(sandbox_id, request.query)
+    try:
+        first_frame = await anext(frames)
+    except (RateLimitExceeded, SandboxBusy) as e:
+        raise _rate_limit_error(e)
+    except TimeoutError as e:
+        raise HTTPException(status_code=status.HTTP_408_REQUEST_TIMEOUT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e),
+        )
+
+    def encode(frame: QueryStreamFrame) -> str:
+        with metrics.time("serialize"):
+            return frame.model_dump_json() + "\n"
+
+    async def encode_frames() -> AsyncIterator[str]:
+        frame: QueryStreamFrame = first_frame
+        try:
+            yield encode(frame)
+            async for frame in frames:
+                yield encode(frame)
+        except Exception as e:
+            yield QueryStreamError(detail=str(e)).model_dump_json() + "\n"
+        finally:
+            await frames.aclose()
+
+    return StreamingResponse(encode_frames(), media_type="application/x-ndjson")
+
+
+@router.get("/{sandbox_id}/results/{result_handle}", response_model=QueryResultPage)
+async def get_result_page(
+    sandbox_id: str,
+    result_handle: str,
+    offset: int = Query(default=0, ge=0),
+    limit: int | None = Query(default=None, ge=1, le=10000),
+) -> QueryResultPage:
+    """
+    Fetch a page of a spilled query result without re-executing the query.
+
+    Results larger than result_spill_threshold_rows return a result_handle from
+    /execute; use next_offset from each page to fetch the following one.
+    """
+    try:
+        return result_store.get_page(sandbox_id, result_handle, offset=offset, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
 @router.get("/{sandbox_id}/status", response_model=SandboxStatusResponse)
 async def get_sandbox_status(sandbox_id: str) -> SandboxStatusResponse:
     """Get the status of a sandbox environment."""
@@ -224,3 +536,52 @@ async def destroy_sandbox(sandbox_id: str) -> SandboxDestroyResponse:
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to destroy sandbox: {str(e)}",
         )
+
+
+@router.get("/admin/metrics", response_model=SandboxMetricsReport)
+async def get_sandbox_metrics(
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> SandboxMetricsReport:
+    """
+    Get sandbox counters, per-phase latency histograms and component statistics.
+    Admin endpoint.
+    """
+    return await _build_metrics_report()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_prometheus_metrics(
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> PlainTextResponse:
+    """
+    Sandbox metrics in the Prometheus text exposition format, for scraping.
+    Requires an authenticated user, as the report describes pools and lessons.
+    """
+    report = await _build_metrics_report()
+    return PlainTextResponse(
+        metrics.render_prometheus(report), media_type="text/plain; version=0.0.4"
+    )
+
+
+async def _build_metrics_report() -> SandboxMetricsReport:
+    try:
+        active_sandboxes = await sandbox_manager.count_sandboxes()
+    except Exception:
+        # Shared registry unreachable; report the rest
+        active_sandboxes = 0
+
+    return SandboxMetricsReport(
+        metrics=metrics.get_metrics(active_sandboxes),
+        phases=metrics.get_phase_stats(),
+        connection_pool=query_pool.get_stats(),
+        validation_cache=validator_registry.get_stats(),
+        rate_limiter=rate_limiter.get_stats(),
+        admission=admission.get_stats(),
+        reaper=reaper.get_stats(),
+        scheduler=query_scheduler.get_stats() if query_scheduler is not None else None,
+        cost_gate=cost_gate.get_stats() if cost_gate is not None else None,
+        warm_pool=warm_pool.get_stats() if warm_pool is not None else None,
+        result_store=result_store.get_stats(),
+        verdict_cache=verdict_cache.get_stats() if verdict_cache is not None else None,
+        orphan_collector=orphan_collector.last_run,
+    )
@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import BaseModel, Field
 
@@ -38,6 +38,48 @@ class QueryExecuteResponse(BaseModel):
     row_count: int = Field(..., ge=0, description="Number of rows returned")
     execution_time: float = Field(..., ge=0, description="Query execution time in seconds")
     affected_rows: int | None = Field(default=None, description="Rows affected (for DML)")
+    result_handle: str | None = Field(
+        default=None,
+        description="Handle for fetching further pages when the result was spilled to disk",
+    )
+    truncated: bool = Field(
+        default=False, description="Whether rows were cut at the maximum result size"
+    )
+
+
+class QueryResultPage(BaseModel):
+    result_handle: str = Field(..., description="Spilled result handle")
+    columns: list[str] = Field(default=[], description="Column names")
+    rows: list[list[Any]] = Field(default=[], description="Rows in this page")
+    offset: int = Field(..., ge=0, description="Offset of the first row in this page")
+    row_count: int = Field(..., ge=0, description="Total number of rows in the result")
+    next_offset: int | None = Field(default=None, description="Offset of the next page, if any")
+
+
+class QueryStreamHeader(BaseModel):
+    type: Literal["header"] = "header"
+    columns: list[str] = Field(default=[], description="Column names")
+
+
+class QueryStreamRows(BaseModel):
+    type: Literal["rows"] = "rows"
+    rows: list[list[Any]] = Field(default=[], description="Next chunk of result rows")
+
+
+class QueryStreamTrailer(BaseModel):
+    type: Literal["trailer"] = "trailer"
+    row_count: int = Field(..., ge=0, description="Number of rows streamed")
+    execution_time: float = Field(..., ge=0, description="Query execution time in seconds")
+    affected_rows: int | None = Field(default=None, description="Rows affected (for DML)")
+    truncated: bool = Field(default=False, description="Whether rows were cut at the row limit")
+
+
+class QueryStreamError(BaseModel):
+    type: Literal["error"] = "error"
+    detail: str = Field(..., description="Error that ended the stream")
+
+
+QueryStreamFrame = QueryStreamHeader | QueryStreamRows | QueryStreamTrailer | QueryStreamError
 
 
 class QueryValidateResponse(BaseModel):
@@ -87,3 +129,158 @@ class CleanupResult(BaseModel):
     failed_count: int = Field(..., ge=0, description="Number of cleanup failures")
     duration: float = Field(..., ge=0, description="Cleanup duration in seconds")
     cleaned_sandbox_ids: list[str] = Field(default=[], description="IDs of cleaned sandboxes")
+    retried_count: int = Field(default=0, ge=0, description="Teardown attempts that were retried")
+    throughput: float = Field(default=0.0, ge=0, description="Sandboxes cleaned per second")
+
+
+class OrphanCollectionResult(BaseModel):
+    dry_run: bool = Field(..., description="Whether orphans were only reported")
+    scanned_count: int = Field(..., ge=0, description="Sandbox schemas found on the server")
+    orphan_count: int = Field(..., ge=0, description="Schemas not owned by any sandbox")
+    dropped_count: int = Field(..., ge=0, description="Orphan schemas dropped")
+    failed_count: int = Field(..., ge=0, description="Orphan schemas that could not be dropped")
+    freed_bytes: int = Field(..., ge=0, description="Size of the dropped schemas")
+    duration: float = Field(..., ge=0, description="Collection duration in seconds")
+    orphan_schemas: list[str] = Field(
+        default=[], description="Orphans dropped, or that would be dropped in a dry run"
+    )
+
+
+class ReaperStats(BaseModel):
+    runs: int = Field(..., ge=0, description="Completed cleanup runs")
+    errors: int = Field(..., ge=0, description="Cleanup runs that raised")
+    cleaned: int = Field(..., ge=0, description="Sandboxes torn down since startup")
+    failed: int = Field(..., ge=0, description="Teardowns that failed after all retries")
+    retried: int = Field(..., ge=0, description="Teardown attempts that were retried")
+    last_run: CleanupResult | None = Field(None, description="Result of the most recent run")
+
+
+class RateLimiterStats(BaseModel):
+    allowed: int = Field(..., ge=0, description="Queries admitted since startup")
+    rejected: int = Field(..., ge=0, description="Queries rejected with 429 since startup")
+    tracked_users: int | None = Field(
+        None, ge=0, description="Users with a partly drained bucket in this process"
+    )
+
+
+class AdmissionStats(BaseModel):
+    active: int = Field(..., ge=0, description="Queries currently running in sandboxes")
+    queued: int = Field(..., ge=0, description="Queries currently waiting for a busy sandbox")
+    max_queue_depth: int = Field(..., ge=0, description="Longest queue seen for one sandbox")
+    admitted: int = Field(..., ge=0, description="Queries admitted since startup")
+    rejected: int = Field(
+        ..., ge=0, description="Queries rejected because the queue was full or the wait timed out"
+    )
+    average_wait_time: float = Field(..., ge=0, description="Average admission wait in seconds")
+    max_wait_time: float = Field(..., ge=0, description="Longest admission wait in seconds")
+
+
+class SchedulerStats(BaseModel):
+    max_concurrency: int = Field(..., ge=1, description="Configured global query concurrency")
+    running: int = Field(..., ge=0, description="Queries currently running")
+    running_long: int = Field(..., ge=0, description="Running queries in the long lane")
+    queued: int = Field(..., ge=0, description="Queries waiting to be dispatched")
+    dispatched: int = Field(..., ge=0, description="Queries dispatched since startup")
+    average_wait_time: float = Field(..., ge=0, description="Average queue wait in seconds")
+    max_wait_time: float = Field(..., ge=0, description="Longest queue wait in seconds")
+    tracked_fingerprints: int = Field(
+        ..., ge=0, description="Query fingerprints with a latency estimate"
+    )
+
+
+class CostGateStats(BaseModel):
+    max_rows_examined: int = Field(..., ge=1, description="Configured rows-examined budget")
+    entries: int = Field(..., ge=0, description="Cached cost estimates")
+    hits: int = Field(..., ge=0, description="Estimates served from the cache")
+    misses: int = Field(..., ge=0, description="Queries that ran EXPLAIN")
+    explain_failures: int = Field(
+        ..., ge=0, description="EXPLAIN runs that failed; those queries ran unchecked"
+    )
+    rejected: int = Field(..., ge=0, description="Queries rejected as too expensive")
+    downgraded: int = Field(..., ge=0, description="Over-budget queries sent to the long lane")
+
+
+class ConnectionPoolStats(BaseModel):
+    min_size: int = Field(..., ge=0, description="Configured minimum pool size")
+    max_size: int = Field(..., ge=1, description="Configured maximum pool size")
+    size: int = Field(..., ge=0, description="Currently open connections")
+    free: int = Field(..., ge=0, description="Idle connections available for checkout")
+    acquisitions: int = Field(..., ge=0, description="Total successful checkouts")
+    average_wait_time: float = Field(..., ge=0, description="Average checkout wait in seconds")
+    max_wait_time: float = Field(..., ge=0, description="Longest checkout wait in seconds")
+    discarded_connections: int = Field(
+        ..., ge=0, description="Connections closed instead of being returned to the pool"
+    )
+    killed_queries: int = Field(
+        ..., ge=0, description="Statements stopped with KILL QUERY after a timeout or disconnect"
+    )
+
+
+class WarmPoolStats(BaseModel):
+    hits: int = Field(..., ge=0, description="Sandbox creations served from the warm pool")
+    misses: int = Field(..., ge=0, description="Sandbox creations provisioned inline")
+    hit_rate: float = Field(..., ge=0, le=1, description="Fraction of creations served warm")
+    ready: int = Field(..., ge=0, description="Ready schemas across all lessons")
+    pending: int = Field(..., ge=0, description="Schemas currently being provisioned")
+    provisioned: int = Field(..., ge=0, description="Schemas provisioned by the warm pool")
+    failures: int = Field(..., ge=0, description="Failed provisioning attempts")
+    ready_by_lesson: dict[int, int] = Field(default={}, description="Ready schemas per lesson")
+    targets_by_lesson: dict[int, int] = Field(
+        default={}, description="Current target size per lesson"
+    )
+
+
+class ResultStoreStats(BaseModel):
+    results: int = Field(..., ge=0, description="Spilled results currently on disk")
+    used_bytes: int = Field(..., ge=0, description="Disk space used by spilled results")
+    budget_bytes: int = Field(..., ge=0, description="Disk budget for spilled results")
+    evicted: int = Field(..., ge=0, description="Results evicted to stay within the budget")
+
+
+class ValidationCacheStats(BaseModel):
+    policies: int = Field(..., ge=0, description="Registered lesson and module policies")
+    entries: int = Field(..., ge=0, description="Memoised validation results")
+    max_entries: int = Field(..., ge=0, description="Configured maximum number of entries")
+    hits: int = Field(..., ge=0, description="Validations served from the cache")
+    misses: int = Field(..., ge=0, description="Validations that ran the validator")
+    hit_rate: float = Field(..., ge=0, le=1, description="Fraction of lookups served from cache")
+
+
+class VerdictCacheStats(BaseModel):
+    entries: int = Field(..., ge=0, description="Cached query results")
+    max_entries: int = Field(..., ge=0, description="Configured maximum number of entries")
+    cached_rows: int = Field(..., ge=0, description="Rows held across all cached results")
+    hits: int = Field(..., ge=0, description="Executions served from the cache")
+    misses: int = Field(..., ge=0, description="Cacheable executions that ran on MySQL")
+    hit_rate: float = Field(..., ge=0, le=1, description="Fraction of lookups served from cache")
+    verdict_hits: int = Field(..., ge=0, description="Verdicts reused without comparing results")
+    evictions: int = Field(..., ge=0, description="Entries evicted by the LRU policy")
+
+
+class PhaseLatencyStats(BaseModel):
+    count: int = Field(..., ge=0, description="Observations recorded")
+    total_seconds: float = Field(..., ge=0, description="Sum of all observations in seconds")
+    average_seconds: float = Field(..., ge=0, description="Average observation in seconds")
+    buckets: dict[str, int] = Field(
+        default={}, description="Cumulative observation counts by upper bound in seconds"
+    )
+
+
+class SandboxMetricsReport(BaseModel):
+    metrics: SandboxMetrics
+    phases: dict[str, PhaseLatencyStats] = Field(
+        default={}, description="Latency histograms per sandbox and query phase"
+    )
+    connection_pool: ConnectionPoolStats
+    validation_cache: ValidationCacheStats
+    rate_limiter: RateLimiterStats
+    admission: AdmissionStats
+    reaper: ReaperStats
+    scheduler: SchedulerStats | None = None
+    cost_gate: CostGateStats | None = None
+    warm_pool: WarmPoolStats | None = None
+    result_store: ResultStoreStats | None = None
+    verdict_cache: VerdictCacheStats | None = None
+    orphan_collector: OrphanCollectionResult | None = Field(
+        None, description="Result of the most recent orphan schema collection"
+    )
@@ -0,0 +1,129 @@
+"""
+Per-sandbox admission control for query execution.
+
+At most max_connections_per_sandbox queries run in one sandbox at a time. Further
+queries wait in a short FIFO queue of sandbox_queue_size entries for up to
+sandbox_queue_timeout_seconds; when the queue is full or the wait runs out they are
+rejected with SandboxBusy, so one hot sandbox cannot take over the shared pool.
+
+Gates live in process memory, so with several workers the limit applies per worker.
+"""
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import AdmissionStats
+
+
+class SandboxBusy(Exception):
+    def __init__(self, sandbox_id: str, retry_after: float):
+        super().__init__(f"Sandbox {sandbox_id} is busy, retry shortly")
+        self.retry_after = retry_after
+
+
+class _Gate:
+    __slots__ = ("active", "waiters")
+
+    def __init__(self) -> None:
+        self.active = 0
+        self.waiters: deque[asyncio.Future[None]] = deque()
+
+
+class SandboxAdmission:
+    def __init__(self, config: SandboxConfig):
+        self.config = config
+        # Only sandboxes with running or waiting queries have a gate
+        self._gates: dict[str, _Gate] = {}
+
+        self._admitted = 0
+        self._rejected = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._max_queue_depth = 0
+
+    @asynccontextmanager
+    async def admit(self, sandbox_id: str) -> AsyncIterator[None]:
+        """
+        Hold one of the sandbox's query slots for the duration of the block.
+
+        Raises:
+            SandboxBusy: If the wait queue is full or no slot frees up in time
+        """
+        await self._enter(sandbox_id)
+        try:
+            yield
+        finally:
+            self._leave(sandbox_id)
+
+    async def _enter(self, sandbox_id: str) -> None:
+        gate = self._gates.get(sandbox_id)
+        if gate is None:
+            gate = self._gates[sandbox_id] = _Gate()
+
+        if gate.active < self.config.max_connections_per_sandbox and not gate.waiters:
+            gate.active += 1
+            self._record_wait(0.0)
+            return
+
+        if len(gate.waiters) >= self.config.sandbox_queue_size:
+            self._rejected += 1
+            raise SandboxBusy(sandbox_id, self.config.sandbox_queue_timeout_seconds)
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        gate.waiters.append(future)
+        self._max_queue_depth = max(self._max_queue_depth, len(gate.waiters))
+
+        start_time = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.config.sandbox_queue_timeout_seconds):
+                await future
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # A slot was handed over just as the wait ended; pass it on
+                self._leave(sandbox_id)
+            else:
+                gate.waiters.remove(future)
+                self._drop_if_idle(sandbox_id, gate)
+            if isinstance(e, TimeoutError):
+                self._rejected += 1
+                raise SandboxBusy(sandbox_id, self.config.sandbox_queue_timeout_seconds) from e
+            raise
+
+        self._record_wait(time.perf_counter() - start_time)
+
+    def _leave(self, sandbox_id: str) -> None:
+        gate = self._gates[sandbox_id]
+        # The slot goes straight to the next waiter, so active stays the same
+        while gate.waiters:
+            waiter = gate.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        gate.active -= 1
+        self._drop_if_idle(sandbox_id, gate)
+
+    def _drop_if_idle(self, sandbox_id: str, gate: _Gate) -> None:
+        if gate.active == 0 and not gate.waiters:
+            del self._gates[sandbox_id]
+
+    def _record_wait(self, wait_time: float) -> None:
+        self._admitted += 1
+        self._total_wait_time += wait_time
+        if wait_time > self._max_wait_time:
+            self._max_wait_time = wait_time
+
+    def get_stats(self) -> AdmissionStats:
+        """Get current queue depths and admission wait-time statistics."""
+        return AdmissionStats(
+            active=sum(gate.active for gate in self._gates.values()),
+            queued=sum(len(gate.waiters) for gate in self._gates.values()),
+            max_queue_depth=self._max_queue_depth,
+            admitted=self._admitted,
+            rejected=self._rejected,
+            average_wait_time=self._total_wait_time / self._admitted if self._admitted else 0.0,
+            max_wait_time=self._max_wait_time,
+        )
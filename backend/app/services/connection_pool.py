@@ -0,0 +1,240 @@
+"""
+Shared MySQL connection pool for sandbox query execution.
+"""
+
+import asyncio
+import struct
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import aiomysql
+from pymysql.constants import COMMAND
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import ConnectionPoolStats
+from app.services.metrics import SandboxMetricsCollector
+
+# COM_RESET_CONNECTION is not exposed by pymysql.constants.COMMAND
+COM_RESET_CONNECTION = 0x1F
+
+# COM_SET_OPTION argument; aiomysql always negotiates CLIENT.MULTI_STATEMENTS
+MYSQL_OPTION_MULTI_STATEMENTS_OFF = 1
+
+
+class SandboxConnectionPool:
+    """
+    Long-lived, bounded aiomysql pool shared by all sandboxes.
+
+    - Connections are opened without a default schema
+    - Each checkout switches to the sandbox schema (COM_INIT_DB)
+    - Checkouts for shared schemas run inside a read-only transaction
+    - Transactional checkouts only accept one statement per round-trip
+    - Each release resets session state so nothing leaks between sandboxes
+    - Idle connections are recycled after pool_idle_recycle_seconds
+    - Statements on checked-out connections can be killed from a side connection
+    """
+
+    def __init__(
+        self,
+        config: SandboxConfig,
+        min_size: int | None = None,
+        max_size: int | None = None,
+        metrics: SandboxMetricsCollector | None = None,
+        **connect_kwargs: Any,
+    ):
+        self.config = config
+        self.metrics = metrics
+        self.min_size = config.pool_min_size if min_size is None else min_size
+        self.max_size = config.pool_max_size if max_size is None else max_size
+        self._connect_kwargs = connect_kwargs
+
+        self._pool: aiomysql.Pool | None = None
+        self._pool_lock = asyncio.Lock()
+
+        self._acquisitions = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._discarded_connections = 0
+        self._killed_queries = 0
+
+    async def _get_pool(self) -> aiomysql.Pool:
+        """Create the underlying pool on first use."""
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await aiomysql.create_pool(
+                        minsize=self.min_size,
+                        maxsize=self.max_size,
+                        pool_recycle=self.config.pool_idle_recycle_seconds,
+                        host=self.config.mysql_host,
+                        port=self.config.mysql_port,
+                        user=self.config.mysql_admin_user,
+                        password=self.config.mysql_admin_password,
+                        autocommit=True,
+                        **self._connect_kwargs,
+                    )
+        return self._pool
+
+    @asynccontextmanager
+    async def acquire(
+        self, schema_name: str | None = None, read_only: bool = False, rollback: bool = False
+    ) -> AsyncIterator[aiomysql.Connection]:
+        """
+        Check out a connection, optionally switched to the given schema.
+
+        With read_only, statements run inside START TRANSACTION READ ONLY, so MySQL
+        rejects any write. With rollback, they run inside a read-write transaction
+        whose changes are discarded. Either transaction is rolled back on release,
+        and the server refuses multi-statement text on the connection, so a stacked
+        COMMIT cannot end the transaction early.
+
+        Raises:
+            TimeoutError: If no connection becomes free within pool_acquire_timeout_seconds
+        """
+        pool = await self._get_pool()
+
+        start_time = time.perf_counter()
+        try:
+            conn = await asyncio.wait_for(
+                pool.acquire(), timeout=self.config.pool_acquire_timeout_seconds
+            )
+        except TimeoutError as e:
+            raise TimeoutError(
+                f"No database connection available within "
+                f"{self.config.pool_acquire_timeout_seconds} seconds"
+            ) from e
+        self._record_wait(time.perf_counter() - start_time)
+
+        try:
+            if schema_name is not None:
+                await conn.select_db(schema_name)
+            if read_only or rollback:
+                await self._disable_multi_statements(conn)
+            if read_only:
+                await conn.query("START TRANSACTION READ ONLY")
+            elif rollback:
+                await conn.query("START TRANSACTION")
+            yield conn
+        except aiomysql.Error:
+            # Statement-level errors leave the connection usable
+            raise
+        except BaseException as e:
+            if (
+                isinstance(e, (asyncio.CancelledError, GeneratorExit, TimeoutError))
+                and not conn.closed
+            ):
+                # Timed out (a cancelled checkout, or a deadline hit while streaming),
+                # disconnected or abandoned mid-stream: the statement would otherwise
+                # keep running on the server until max_execution_time
+                await asyncio.shield(self._kill_running_query(conn))
+            # Cancellation or a client-side failure may leave a half-read result behind
+            self.discard(conn)
+            raise
+        finally:
+            await self._release(pool, conn, read_only or rollback)
+
+    async def _release(
+        self, pool: aiomysql.Pool, conn: aiomysql.Connection, in_transaction: bool = False
+    ) -> None:
+        """Roll back the checkout's transaction, reset the session and hand the connection back."""
+        if not conn.closed and in_transaction:
+            try:
+                await conn.rollback()
+            except Exception:
+                self.discard(conn)
+        if not conn.closed and self.config.pool_reset_on_release:
+            try:
+                await self._reset_session(conn)
+            except Exception:
+                self.discard(conn)
+
+        await pool.release(conn)
+
+    async def _reset_session(self, conn: aiomysql.Connection) -> None:
+        """
+        Clear user variables, temporary tables and session settings.
+        COM_RESET_CONNECTION also restores the server's default autocommit mode.
+        """
+        await conn._execute_command(COM_RESET_CONNECTION, b"")
+        await conn._read_ok_packet()
+        await conn.autocommit(True)
+
+    async def _disable_multi_statements(self, conn: aiomysql.Connection) -> None:
+        """Make the server reject text with more than one statement for this session."""
+        await conn._execute_command(
+            COMMAND.COM_SET_OPTION, struct.pack("<H", MYSQL_OPTION_MULTI_STATEMENTS_OFF)
+        )
+        # EOF packet, or OK with CLIENT_DEPRECATE_EOF; an error packet raises
+        await conn._read_packet()
+
+    async def kill_query(self, thread_id: int) -> None:
+        """
+        Stop the statement running on the connection with the given thread id.
+
+        KILL QUERY is sent on a separate, unpooled connection, so it works even when
+        the pool is exhausted. The killed connection's session stays open.
+        """
+        conn = await asyncio.wait_for(
+            aiomysql.connect(
+                host=self.config.mysql_host,
+                port=self.config.mysql_port,
+                user=self.config.mysql_admin_user,
+                password=self.config.mysql_admin_password,
+                autocommit=True,
+                **self._connect_kwargs,
+            ),
+            timeout=self.config.pool_acquire_timeout_seconds,
+        )
+        try:
+            async with conn.cursor() as cursor:
+                await cursor.execute("KILL QUERY %s", (thread_id,))
+            self._killed_queries += 1
+        finally:
+            conn.close()
+
+    async def _kill_running_query(self, conn: aiomysql.Connection) -> None:
+        try:
+            await self.kill_query(conn.thread_id())
+        except Exception:
+            # The statement may have finished already; closing the connection still
+            # makes the server stop it once it next writes to the socket
+            pass
+
+    def discard(self, conn: aiomysql.Connection) -> None:
+        """Close a checked-out connection so it is dropped instead of reused on release."""
+        if not conn.closed:
+            conn.close()
+            self._discarded_connections += 1
+
+    def _record_wait(self, wait_time: float) -> None:
+        if self.metrics is not None:
+            self.metrics.observe("pool_acquire", wait_time)
+        self._acquisitions += 1
+        self._total_wait_time += wait_time
+        if wait_time > self._max_wait_time:
+            self._max_wait_time = wait_time
+
+    def get_stats(self) -> ConnectionPoolStats:
+        """Get pool size and checkout wait-time statistics."""
+        return ConnectionPoolStats(
+            min_size=self.min_size,
+            max_size=self.max_size,
+            size=self._pool.size if self._pool else 0,
+            free=self._pool.freesize if self._pool else 0,
+            acquisitions=self._acquisitions,
+            average_wait_time=(
+                self._total_wait_time / self._acquisitions if self._acquisitions else 0.0
+            ),
+            max_wait_time=self._max_wait_time,
+            discarded_connections=self._discarded_connections,
+            killed_queries=self._killed_queries,
+        )
+
+    async def close(self) -> None:
+        """Close all pooled connections."""
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
@@ -0,0 +1,169 @@
+"""
+EXPLAIN-based cost gate for sandbox queries.
+
+Before a query runs for the first time, the gate asks MySQL for its plan with
+EXPLAIN FORMAT=JSON and estimates how many rows it would examine. Queries over
+cost_gate_max_rows_examined are rejected with a hint on how to narrow them, or,
+with cost_gate_action set to "downgrade", run in the scheduler's long lane.
+
+Estimates are cached per lesson and query fingerprint, so a learner re-running
+the same query does not pay for EXPLAIN again. If EXPLAIN fails (usually because
+the query itself is wrong) the query runs unchecked and reports its own error.
+"""
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import CostGateStats
+from app.services.sandbox import Sandbox
+from app.services.sql_lexer import COMMENT, SEMICOLON, tokenize
+from app.services.verdict_cache import query_fingerprint
+
+# Validator query types MySQL can EXPLAIN
+EXPLAINABLE_TYPES = frozenset({"SELECT", "WITH", "INSERT", "UPDATE", "DELETE"})
+
+CostKey = tuple[int, str]
+
+
+class QueryTooExpensive(ValueError):
+    def __init__(self, rows_examined: float, budget: int):
+        super().__init__(
+            f"This query would examine about {rows_examined:,.0f} rows, more than the limit "
+            f"of {budget:,}. Check that every joined table has a join condition, or narrow "
+            "the query down with WHERE."
+        )
+        self.rows_examined = rows_examined
+        self.budget = budget
+
+
+def explain_statement(query: str) -> str | None:
+    """
+    Build the EXPLAIN FORMAT=JSON statement for a query.
+
+    EXPLAIN runs outside any rollback transaction, so only a single statement is
+    explained: trailing semicolons are dropped, and None is returned if anything
+    follows a semicolon.
+    """
+    code = [token for token in tokenize(query) if token.kind != COMMENT]
+    while code and code[-1].kind == SEMICOLON:
+        code.pop()
+    if not code or any(token.kind == SEMICOLON for token in code):
+        return None
+    end = code[-1].position + len(code[-1].value)
+    return f"EXPLAIN FORMAT=JSON {query[:end]}"
+
+
+def estimate_rows_examined(plan: Any) -> float:
+    """
+    Estimate the rows a query examines from its EXPLAIN FORMAT=JSON plan.
+
+    Each table in a nested loop is scanned once per row produced by the tables
+    before it; subqueries and derived tables add their own estimates.
+    """
+    if isinstance(plan, list):
+        return sum(estimate_rows_examined(node) for node in plan)
+    if not isinstance(plan, dict):
+        return 0.0
+
+    total = 0.0
+    for key, value in plan.items():
+        if key == "nested_loop":
+            total += _nested_loop_rows(value)
+        elif key == "table":
+            total += _nested_loop_rows([{"table": value}])
+        elif isinstance(value, dict | list):
+            total += estimate_rows_examined(value)
+    return total
+
+
+def _nested_loop_rows(entries: list[Any]) -> float:
+    total = 0.0
+    prefix_rows = 1.0
+    for entry in entries:
+        table = entry.get("table") if isinstance(entry, dict) else None
+        if not isinstance(table, dict):
+            total += estimate_rows_examined(entry)
+            continue
+
+        scanned = float(table.get("rows_examined_per_scan", 0))
+        total += prefix_rows * scanned
+        prefix_rows = float(table.get("rows_produced_per_join", prefix_rows * scanned))
+        # Materialised derived tables and attached subqueries
+        total += estimate_rows_examined(table)
+    return total
+
+
+class QueryCostGate:
+    def __init__(self, config: SandboxConfig):
+        self.config = config
+        # (lesson_id, query fingerprint) -> estimated rows examined, least recently used first
+        self._estimates: OrderedDict[CostKey, float] = OrderedDict()
+
+        self._hits = 0
+        self._misses = 0
+        self._explain_failures = 0
+        self._rejected = 0
+        self._downgraded = 0
+
+    async def check(
+        self, sandbox: Sandbox, query: str, explain: Callable[[], Awaitable[Any]]
+    ) -> bool:
+        """
+        Check a query's estimated cost against the budget.
+
+        Args:
+            explain: Returns the query's EXPLAIN FORMAT=JSON plan; only called on a cache miss
+
+        Returns:
+            True if the query is over budget and should run in the long lane
+
+        Raises:
+            QueryTooExpensive: If the query is over budget and cost_gate_action is "reject"
+        """
+        key = (sandbox.lesson_id, query_fingerprint(query))
+        rows = self._estimates.get(key)
+
+        if rows is not None:
+            self._hits += 1
+            self._estimates.move_to_end(key)
+        else:
+            self._misses += 1
+            try:
+                async with asyncio.timeout(self.config.query_timeout_seconds):
+                    plan = await explain()
+                rows = estimate_rows_examined(plan)
+            except Exception:
+                self._explain_failures += 1
+                return False
+            self._remember(key, rows)
+
+        budget = self.config.cost_gate_max_rows_examined
+        if rows <= budget:
+            return False
+        if self.config.cost_gate_action == "reject":
+            self._rejected += 1
+            raise QueryTooExpensive(rows, budget)
+        self._downgraded += 1
+        return True
+
+    def _remember(self, key: CostKey, rows: float) -> None:
+        if self.config.cost_gate_cache_entries == 0:
+            return
+        self._estimates[key] = rows
+        if len(self._estimates) > self.config.cost_gate_cache_entries:
+            self._estimates.popitem(last=False)
+
+    def get_stats(self) -> CostGateStats:
+        """Get cost estimate cache and gate decision statistics."""
+        return CostGateStats(
+            max_rows_examined=self.config.cost_gate_max_rows_examined,
+            entries=len(self._estimates),
+            hits=self._hits,
+            misses=self._misses,
+            explain_failures=self._explain_failures,
+            rejected=self._rejected,
+            downgraded=self._downgraded,
+        )
@@ -0,0 +1,103 @@
+"""
+Expiry index for finding expired sandboxes without scanning all of them.
+
+A min-heap of (deadline, key) with lazy invalidation: rescheduling a key pushes a
+new entry and leaves the old one in place, and entries whose deadline no longer
+matches the key's current deadline are skipped when popped. The heap is rebuilt
+when stale entries outnumber live ones, so its size stays proportional to the
+number of tracked keys.
+"""
+
+import heapq
+from collections.abc import Callable
+from datetime import datetime
+
+
+class ExpiryIndex:
+    """
+    Deadlines per key, ordered for O(log n) retrieval of the next expired keys.
+
+    - schedule: O(log n)
+    - discard: O(1)
+    - pop_expired: O((k + stale) log n) for k returned keys
+    """
+
+    # Rebuild once the heap holds this many times more entries than live keys
+    COMPACT_RATIO = 2
+
+    def __init__(self) -> None:
+        self._deadlines: dict[str, datetime] = {}
+        self._heap: list[tuple[datetime, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._deadlines
+
+    def schedule(self, key: str, deadline: datetime) -> None:
+        """Set or move the deadline of a key."""
+        if self._deadlines.get(key) == deadline:
+            return
+
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+        if len(self._heap) > self.COMPACT_RATIO * len(self._deadlines) + 64:
+            self._compact()
+
+    def discard(self, key: str) -> None:
+        """Stop tracking a key. Its heap entries become stale."""
+        self._deadlines.pop(key, None)
+
+    def next_deadline(self) -> datetime | None:
+        """Get the earliest deadline, or None if no keys are tracked."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_expired(
+        self,
+        now: datetime,
+        limit: int,
+        accept: Callable[[str], bool] | None = None,
+    ) -> list[str]:
+        """
+        Remove and return up to limit keys whose deadline is at or before now,
+        earliest first.
+
+        Expired keys rejected by accept stay tracked and are offered again on the
+        next call.
+        """
+        expired: list[str] = []
+        rejected: list[tuple[datetime, str]] = []
+
+        while self._heap and len(expired) < limit:
+            deadline, key = self._heap[0]
+            if deadline > now:
+                break
+
+            heapq.heappop(self._heap)
+            if self._deadlines.get(key) != deadline:
+                continue
+
+            if accept is not None and not accept(key):
+                rejected.append((deadline, key))
+                continue
+
+            del self._deadlines[key]
+            expired.append(key)
+
+        for entry in rejected:
+            heapq.heappush(self._heap, entry)
+
+        return expired
+
+    def _drop_stale(self) -> None:
+        while self._heap:
+            deadline, key = self._heap[0]
+            if self._deadlines.get(key) == deadline:
+                return
+            heapq.heappop(self._heap)
+
+    def _compact(self) -> None:
+        self._heap = [(deadline, key) for key, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
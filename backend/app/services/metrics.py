@@ -0,0 +1,191 @@
+"""
+In-process metrics for sandboxes and query execution.
+
+SandboxMetricsCollector keeps plain counters and one fixed-bucket latency histogram
+per phase. Recording an observation is a bisect and three additions, so it can sit
+on the query hot path; with enable_metrics off it returns immediately.
+
+Phases:
+- validate: query validation in the executor
+- pool_acquire: waiting for a pooled MySQL connection
+- execute: running the statement until MySQL returns the first result
+- fetch: reading result rows (including spilling them to disk)
+- serialize: encoding columnar responses and stream frames
+- compare: comparing a result with the lesson's expected result
+- create, seed, destroy: sandbox creation, schema provisioning and teardown
+"""
+
+import time
+from bisect import bisect_left
+from datetime import UTC, datetime
+from types import TracebackType
+
+from pydantic import BaseModel
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import PhaseLatencyStats, SandboxMetrics, SandboxMetricsReport
+
+# Upper bounds of the latency buckets in seconds; a final +Inf bucket is implied
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PHASES = (
+    "validate",
+    "pool_acquire",
+    "execute",
+    "fetch",
+    "serialize",
+    "compare",
+    "create",
+    "seed",
+    "destroy",
+)
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def cumulative_counts(self) -> list[int]:
+        """Observations at or below each bucket bound, ending with the +Inf bucket."""
+        cumulative = []
+        running = 0
+        for count in self.counts:
+            running += count
+            cumulative.append(running)
+        return cumulative
+
+
+class _PhaseTimer:
+    __slots__ = ("collector", "phase", "start")
+
+    def __init__(self, collector: "SandboxMetricsCollector", phase: str):
+        self.collector = collector
+        self.phase = phase
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.collector.observe(self.phase, time.perf_counter() - self.start)
+
+
+class SandboxMetricsCollector:
+    def __init__(self, config: SandboxConfig):
+        self.config = config
+        self.enabled = config.enable_metrics
+        self._histograms = {phase: LatencyHistogram() for phase in PHASES}
+
+        self._sandboxes_created = 0
+        self._sandboxes_destroyed = 0
+        self._sandboxes_expired = 0
+        self._total_lifetime = 0.0
+        self._queries_executed = 0
+        self._total_query_time = 0.0
+
+    def observe(self, phase: str, seconds: float) -> None:
+        """Record how long one run of a phase took."""
+        if self.enabled:
+            self._histograms[phase].observe(seconds)
+
+    def time(self, phase: str) -> _PhaseTimer:
+        """Context manager recording the duration of its block for a phase."""
+        return _PhaseTimer(self, phase)
+
+    def record_query(self, seconds: float) -> None:
+        """Record one query answered by the sandbox service, including cached answers."""
+        if self.enabled:
+            self._queries_executed += 1
+            self._total_query_time += seconds
+
+    def record_sandbox_created(self) -> None:
+        if self.enabled:
+            self._sandboxes_created += 1
+
+    def record_sandbox_removed(self, created_at: datetime, expired: bool = False) -> None:
+        """Record a sandbox torn down by its owner, or by the reaper once expired."""
+        if not self.enabled:
+            return
+        if expired:
+            self._sandboxes_expired += 1
+        else:
+            self._sandboxes_destroyed += 1
+        self._total_lifetime += (datetime.now(UTC) - created_at).total_seconds()
+
+    def get_metrics(self, active_sandboxes: int) -> SandboxMetrics:
+        removed = self._sandboxes_destroyed + self._sandboxes_expired
+        return SandboxMetrics(
+            total_sandboxes_created=self._sandboxes_created,
+            active_sandboxes=active_sandboxes,
+            expired_sandboxes=self._sandboxes_expired,
+            total_queries_executed=self._queries_executed,
+            average_query_time=(
+                self._total_query_time / self._queries_executed if self._queries_executed else 0.0
+            ),
+            average_sandbox_lifetime=max(self._total_lifetime / removed, 0.0) if removed else 0.0,
+        )
+
+    def get_phase_stats(self) -> dict[str, PhaseLatencyStats]:
+        phases = {}
+        for phase, histogram in self._histograms.items():
+            bounds = [_format_value(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+            phases[phase] = PhaseLatencyStats(
+                count=histogram.count,
+                total_seconds=histogram.total,
+                average_seconds=histogram.total / histogram.count if histogram.count else 0.0,
+                buckets=dict(zip(bounds, histogram.cumulative_counts(), strict=True)),
+            )
+        return phases
+
+    def render_prometheus(self, report: SandboxMetricsReport) -> str:
+        """Render a metrics report in the Prometheus text exposition format."""
+        lines = [
+            "# HELP sandbox_phase_duration_seconds Duration of sandbox and query phases",
+            "# TYPE sandbox_phase_duration_seconds histogram",
+        ]
+        for phase, histogram in self._histograms.items():
+            bounds = [_format_value(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+            for bound, count in zip(bounds, histogram.cumulative_counts(), strict=True):
+                lines.append(
+                    f'sandbox_phase_duration_seconds_bucket{{phase="{phase}",le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'sandbox_phase_duration_seconds_sum{{phase="{phase}"}} '
+                f"{_format_value(histogram.total)}"
+            )
+            lines.append(
+                f'sandbox_phase_duration_seconds_count{{phase="{phase}"}} {histogram.count}'
+            )
+
+        for component, stats in report:
+            if isinstance(stats, BaseModel):
+                prefix = "sandbox" if component == "metrics" else f"sandbox_{component}"
+                lines.extend(_render_stats(prefix, stats))
+        return "\n".join(lines) + "\n"
+
+
+def _render_stats(prefix: str, stats: BaseModel) -> list[str]:
+    """One untyped sample per numeric field of a stats model."""
+    lines = []
+    for name, value in stats:
+        if isinstance(value, bool | int | float):
+            lines.append(f"# TYPE {prefix}_{name} untyped")
+            lines.append(f"{prefix}_{name} {_format_value(value)}")
+    return lines
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
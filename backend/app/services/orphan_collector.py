@@ -0,0 +1,158 @@
+"""
+Garbage collector for orphaned sandbox schemas.
+
+A schema is orphaned when it carries the sandbox schema prefix but no registered
+sandbox owns it, e.g. after a crash wiped the in-memory registry. Each run lists
+all candidate schemas with their sizes in one INFORMATION_SCHEMA query, then drops
+the orphans and their sandbox users concurrently.
+
+Schemas younger than orphan_gc_min_age_minutes are left alone, which covers schemas
+that are being provisioned. Schemas of unknown age (no tables yet) are left alone
+as well. Ready warm pool schemas are only known to the worker that provisioned
+them and can wait for a learner far longer than the minimum age, so while the
+warm pool is enabled, unclaimed warm schemas are never orphans; they are dropped
+by their worker's pool instead.
+
+Schemas are only dropped when the sandbox registry is shared by all workers: an
+in-memory registry only knows its own worker's sandboxes, so every other worker's
+live schemas would look orphaned. Otherwise runs only report.
+"""
+
+import asyncio
+import time
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import OrphanCollectionResult
+from app.services.sandbox import ISandboxManager, ISchemaManager, SchemaInfo
+from app.services.warm_pool import WarmSandboxPool
+
+
+class OrphanSchemaCollector:
+    def __init__(
+        self,
+        config: SandboxConfig,
+        sandbox_manager: ISandboxManager,
+        schema_manager: ISchemaManager,
+        warm_pool: WarmSandboxPool | None = None,
+    ):
+        self.config = config
+        self.sandbox_manager = sandbox_manager
+        self.schema_manager = schema_manager
+        self.warm_pool = warm_pool
+
+        self._last_run: OrphanCollectionResult | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def last_run(self) -> OrphanCollectionResult | None:
+        return self._last_run
+
+    async def find_orphans(self) -> tuple[int, list[SchemaInfo]]:
+        """
+        Find orphan schemas, oldest first.
+
+        Returns:
+            Tuple of (number of sandbox schemas scanned, orphans)
+        """
+        # List schemas before reading the registry: sandboxes are registered before
+        # their schema is created, so every listed schema that is live is found
+        schemas = await self.schema_manager.list_sandbox_schemas()
+        owned = await self.sandbox_manager.get_schema_names()
+        if self.warm_pool is not None:
+            owned |= self.warm_pool.owned_schema_names()
+
+        min_age = self.config.orphan_gc_min_age_minutes * 60
+        orphans = [
+            schema
+            for schema in schemas
+            if schema.schema_name not in owned
+            and not self.config.is_template_schema(schema.schema_name)
+            and not (
+                self.config.warm_pool_enabled and self.config.is_warm_schema(schema.schema_name)
+            )
+            and schema.age_seconds is not None
+            and schema.age_seconds >= min_age
+        ]
+        orphans.sort(key=lambda schema: schema.age_seconds or 0, reverse=True)
+        return len(schemas), orphans
+
+    async def collect(self, dry_run: bool | None = None) -> OrphanCollectionResult:
+        """
+        Drop up to orphan_gc_max_drops orphan schemas and their sandbox users.
+
+        Args:
+            dry_run: Only report orphans; defaults to orphan_gc_dry_run
+
+        Returns:
+            OrphanCollectionResult describing the run
+
+        Raises:
+            RuntimeError: If asked to drop schemas without a shared sandbox registry
+        """
+        if dry_run is None:
+            dry_run = self.config.orphan_gc_dry_run
+        if not dry_run and not self.sandbox_manager.is_shared():
+            raise RuntimeError(
+                "Orphan schemas can only be dropped with a sandbox registry shared by all "
+                "workers (registry_url)"
+            )
+
+        start_time = time.time()
+        scanned_count, orphans = await self.find_orphans()
+        batch = orphans[: self.config.orphan_gc_max_drops]
+
+        dropped: list[SchemaInfo] = []
+        if not dry_run:
+            semaphore = asyncio.Semaphore(self.config.cleanup_concurrency)
+
+            async def drop(schema: SchemaInfo) -> bool:
+                async with semaphore:
+                    try:
+                        await self.schema_manager.drop_schema(schema.schema_name)
+                        # Sandbox users share their schema's name
+                        await self.schema_manager.drop_sandbox_user(schema.schema_name)
+                    except Exception:
+                        return False
+                    return True
+
+            outcomes = await asyncio.gather(*(drop(schema) for schema in batch))
+            dropped = [schema for schema, ok in zip(batch, outcomes, strict=True) if ok]
+
+        result = OrphanCollectionResult(
+            dry_run=dry_run,
+            scanned_count=scanned_count,
+            orphan_count=len(orphans),
+            dropped_count=len(dropped),
+            failed_count=0 if dry_run else len(batch) - len(dropped),
+            freed_bytes=sum(schema.size_bytes for schema in dropped),
+            duration=time.time() - start_time,
+            orphan_schemas=[schema.schema_name for schema in (batch if dry_run else dropped)],
+        )
+        self._last_run = result
+        return result
+
+    def start(self) -> None:
+        """Start the background collection loop. The first run happens immediately."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the collection loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.collect(
+                    dry_run=self.config.orphan_gc_dry_run or not self.sandbox_manager.is_shared()
+                )
+            except Exception:
+                # MySQL unavailable; try again next interval
+                pass
+            await asyncio.sleep(self.config.orphan_gc_interval_minutes * 60)
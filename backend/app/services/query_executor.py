@@ -3,44 +3,91 @@ MySQL Query Executor with timeout and result comparison support.
 """
 
 import asyncio
-import hashlib
+import json
 import re
+import time
+from collections.abc import AsyncIterator
+from contextlib import AbstractAsyncContextManager, AbstractContextManager, nullcontext
 from typing import Any
 
 import aiomysql
 
 from app.core.sandbox_config import SandboxConfig
-from app.schemas.sandbox import QueryExecuteResponse, QueryValidationResult
-from app.services.sandbox import IQueryExecutor, QueryValidator, Sandbox
+from app.schemas.sandbox import (
+    QueryExecuteResponse,
+    QueryStreamFrame,
+    QueryStreamHeader,
+    QueryStreamRows,
+    QueryStreamTrailer,
+    QueryValidationResult,
+)
+from app.services.connection_pool import SandboxConnectionPool
+from app.services.cost_gate import EXPLAINABLE_TYPES, QueryCostGate, explain_statement
+from app.services.metrics import SandboxMetricsCollector
+from app.services.query_scheduler import QueryScheduler
+from app.services.query_validator import LessonQueryPolicy, ValidatorRegistry
+from app.services.result_fingerprint import (
+    ResultFingerprint,
+    fingerprint_result,
+    normalize_value,
+)
+from app.services.result_store import ResultStore
+from app.services.row_limit import apply_row_limit
+from app.services.sandbox import IQueryExecutor, Sandbox
 
 
 class MySQLQueryExecutor(IQueryExecutor):
     """
     Production MySQL query executor with:
+    - Pooled connections shared by all sandboxes
+    - Read-only transactions for sandboxes on a shared lesson schema
+    - Rolled-back transactions for data modification in lessons that ask for it
+    - Optional EXPLAIN-based cost gate for new queries
+    - Fair-share scheduling across users when the MySQL host is busy
     - Timeout enforcement
+    - LIMIT injection, so MySQL stops producing rows at the row limit
+    - Streaming results through unbuffered server-side cursors
+    - Spilling large results to disk for paged retrieval
     - Error sanitization
     - Result comparison (order-insensitive)
     """
 
-    def __init__(self, config: SandboxConfig):
+    def __init__(
+        self,
+        config: SandboxConfig,
+        pool: SandboxConnectionPool | None = None,
+        result_store: ResultStore | None = None,
+        validator_registry: ValidatorRegistry | None = None,
+        scheduler: QueryScheduler | None = None,
+        metrics: SandboxMetricsCollector | None = None,
+        cost_gate: QueryCostGate | None = None,
+    ):
         self.config = config
-        self.validator = QueryValidator(config)
+        self.validator_registry = validator_registry or ValidatorRegistry(config)
+        self.pool = pool or SandboxConnectionPool(config)
+        self.result_store = result_store
+        self.scheduler = scheduler
+        self.metrics = metrics
+        self.cost_gate = cost_gate
 
     async def execute_query(
         self, sandbox: Sandbox, query: str, timeout: float | None = None
     ) -> QueryExecuteResponse:
         """Execute query with timeout enforcement."""
-        validation = await self.validate_query(query)
+        with self._timed("validate"):
+            validation = await self.validate_query(query, sandbox.lesson_id)
 
         if not validation.is_valid:
             raise ValueError(f"Invalid query: {', '.join(validation.errors)}")
+        self._check_shared_schema(sandbox, validation.query_type)
 
+        long_lane = await self._check_cost(sandbox, query, validation.query_type)
         query_timeout = timeout or self.config.query_timeout_seconds
 
         try:
             # Execute with timeout
             result = await asyncio.wait_for(
-                self._execute_with_connection(sandbox, query, validation.query_type),
+                self._execute_scheduled(sandbox, query, validation.query_type, long_lane),
                 timeout=query_timeout,
             )
             return result
@@ -53,65 +100,389 @@ class MySQLQueryExecutor(IQueryExecutor):
             sanitized_error = self._sanitize_error(str(e))
             raise RuntimeError(f"Query execution failed: {sanitized_error}") from e
 
+    async def _execute_scheduled(
+        self, sandbox: Sandbox, query: str, query_type: str | None, long_lane: bool = False
+    ) -> QueryExecuteResponse:
+        """Wait for an execution slot, then execute; the wait counts towards the timeout."""
+        async with self._schedule(sandbox, query, long_lane):
+            return await self._execute_with_connection(sandbox, query, query_type)
+
     async def _execute_with_connection(
         self, sandbox: Sandbox, query: str, query_type: str | None
     ) -> QueryExecuteResponse:
-        """Execute query using aiomysql connection."""
-        import time
+        """Execute query on a pooled connection switched to the sandbox schema."""
+        rollback_policy = self._rollback_policy(sandbox, query_type)
+        if rollback_policy is not None:
+            return await self._execute_rolled_back(
+                sandbox, query, rollback_policy.verification_query
+            )
+
+        start_time = time.time()
+        statement, server_limited = self._limit_rows(query, query_type, self.config.max_result_rows)
+
+        async with self._acquire(sandbox) as conn:
+            cursor = await conn.cursor(aiomysql.SSCursor)
+
+            # Set statement timeout
+            await cursor.execute(
+                f"SET SESSION max_execution_time={self.config.query_timeout_seconds * 1000}"
+            )
+
+            # Execute the query
+            with self._timed("execute"):
+                await cursor.execute(statement)
+
+            result_handle = None
+            truncated = False
+
+            # Fetch results
+            if query_type == "SELECT" or query_type == "WITH":
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                with self._timed("fetch"):
+                    (
+                        serializable_rows,
+                        row_count,
+                        result_handle,
+                        truncated,
+                    ) = await self._fetch_rows(sandbox, cursor, columns)
+                affected_rows = None
+            else:
+                # For DML statements
+                columns = []
+                serializable_rows = []
+                row_count = 0
+                affected_rows = cursor.rowcount
+
+            if truncated and not server_limited:
+                # Closing the cursor would read the rest of the result off the wire
+                self.pool.discard(conn)
+            else:
+                await cursor.close()
+
+        execution_time = time.time() - start_time
+
+        # Rows come straight from the driver; skip re-validating every cell
+        return QueryExecuteResponse.model_construct(
+            columns=columns,
+            rows=serializable_rows,
+            row_count=row_count,
+            execution_time=execution_time,
+            affected_rows=affected_rows,
+            result_handle=result_handle,
+            truncated=truncated,
+        )
+
+    async def _execute_rolled_back(
+        self, sandbox: Sandbox, query: str, verification_query: str | None
+    ) -> QueryExecuteResponse:
+        """
+        Execute a data-modifying query and the lesson's verification query in one
+        transaction that is always rolled back.
 
+        The result carries the verification query's rows and the query's affected row
+        count; without a verification query it only has the affected row count.
+        """
         start_time = time.time()
+        max_rows = self.config.max_result_rows
+        columns: list[str] = []
+        rows: list[list[Any]] = []
+        truncated = False
+
+        async with self._acquire(sandbox, rollback=True) as conn:
+            # Buffered: the lesson's verification query is known to return small results
+            cursor = await conn.cursor()
+            await cursor.execute(
+                f"SET SESSION max_execution_time={self.config.query_timeout_seconds * 1000}"
+            )
 
-        # Create connection to sandbox schema
-        conn = await aiomysql.connect(
-            host=self.config.mysql_host,
-            port=self.config.mysql_port,
-            user=self.config.mysql_admin_user,
-            password=self.config.mysql_admin_password,
-            db=sandbox.schema_name,
-            autocommit=True,
+            with self._timed("execute"):
+                await cursor.execute(query)
+            affected_rows = cursor.rowcount
+
+            if verification_query is not None:
+                statement, _ = self._limit_rows(verification_query, "SELECT", max_rows)
+                with self._timed("execute"):
+                    await cursor.execute(statement)
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                with self._timed("fetch"):
+                    fetched = await cursor.fetchmany(max_rows + 1)
+                truncated = len(fetched) > max_rows
+                rows = [list(row) for row in fetched[:max_rows]]
+
+            await cursor.close()
+
+        return QueryExecuteResponse.model_construct(
+            columns=columns,
+            rows=rows,
+            row_count=len(rows),
+            execution_time=time.time() - start_time,
+            affected_rows=affected_rows,
+            result_handle=None,
+            truncated=truncated,
         )
 
+    async def _fetch_rows(
+        self, sandbox: Sandbox, cursor: aiomysql.SSCursor, columns: list[str]
+    ) -> tuple[list[list[Any]], int, str | None, bool]:
+        """
+        Fetch up to max_result_rows rows, reading one more to detect truncation.
+
+        Results larger than result_spill_threshold_rows are written to the result store;
+        only the first page is returned inline, together with the result handle.
+
+        Returns:
+            Tuple of (inline rows, total row count, result handle or None, truncated)
+        """
+        max_rows = self.config.max_result_rows
+        threshold = self.config.result_spill_threshold_rows
+
+        if self.result_store is None or threshold >= max_rows:
+            rows = await cursor.fetchmany(max_rows + 1)
+            truncated = len(rows) > max_rows
+            rows = rows[:max_rows]
+            return [list(row) for row in rows], len(rows), None, truncated
+
+        rows = await cursor.fetchmany(threshold + 1)
+        if len(rows) <= threshold:
+            return [list(row) for row in rows], len(rows), None, False
+
+        page_size = self.config.result_page_size
+        inline_rows = [list(row) for row in rows[:page_size]]
+        row_count = len(rows)
+
+        writer = self.result_store.open_writer(sandbox, columns)
+        try:
+            writer.write(rows)
+            while row_count < max_rows:
+                rows = await cursor.fetchmany(min(page_size, max_rows - row_count))
+                if not rows:
+                    break
+                writer.write(rows)
+                row_count += len(rows)
+            truncated = row_count >= max_rows and await cursor.fetchone() is not None
+            spilled = writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+
+        return inline_rows, row_count, spilled.handle, truncated
+
+    async def stream_query(self, sandbox: Sandbox, query: str) -> AsyncIterator[QueryStreamFrame]:
+        """
+        Stream query results without buffering them.
+
+        Rows are read from an SSCursor in chunks of stream_chunk_rows, so memory stays
+        flat and the first rows are sent as soon as MySQL produces them. At most
+        stream_max_rows rows are streamed; the trailer frame reports truncation.
+        """
+        with self._timed("validate"):
+            validation = await self.validate_query(query, sandbox.lesson_id)
+
+        if not validation.is_valid:
+            raise ValueError(f"Invalid query: {', '.join(validation.errors)}")
+        self._check_shared_schema(sandbox, validation.query_type)
+
+        long_lane = await self._check_cost(sandbox, query, validation.query_type)
+
         try:
+            async with self._schedule(sandbox, query, long_lane):
+                async for frame in self._stream_with_connection(
+                    sandbox, query, validation.query_type
+                ):
+                    yield frame
+        except TimeoutError:
+            raise
+        except Exception as e:
+            sanitized_error = self._sanitize_error(str(e))
+            raise RuntimeError(f"Query execution failed: {sanitized_error}") from e
+
+    async def _stream_with_connection(
+        self, sandbox: Sandbox, query: str, query_type: str | None
+    ) -> AsyncIterator[QueryStreamFrame]:
+        """Stream query results from a pooled connection using an unbuffered cursor."""
+        start_time = time.time()
+        deadline = time.monotonic() + self.config.query_timeout_seconds
+
+        rollback_policy = self._rollback_policy(sandbox, query_type)
+        if rollback_policy is not None:
+            # The transaction must end before the first frame goes out, so the
+            # verification result is buffered; it is small by construction
+            result = await self._with_deadline(
+                self._execute_rolled_back(sandbox, query, rollback_policy.verification_query),
+                deadline,
+            )
+            yield QueryStreamHeader(columns=result.columns)
+            chunk_size = self.config.stream_chunk_rows
+            for start in range(0, len(result.rows), chunk_size):
+                yield QueryStreamRows(rows=result.rows[start : start + chunk_size])
+            yield QueryStreamTrailer(
+                row_count=result.row_count,
+                execution_time=result.execution_time,
+                affected_rows=result.affected_rows,
+                truncated=result.truncated,
+            )
+            return
+
+        statement, server_limited = self._limit_rows(query, query_type, self.config.stream_max_rows)
+
+        async with self._acquire(sandbox) as conn:
+            cursor = await conn.cursor(aiomysql.SSCursor)
+            await cursor.execute(
+                f"SET SESSION max_execution_time={self.config.query_timeout_seconds * 1000}"
+            )
+            with self._timed("execute"):
+                await self._with_deadline(cursor.execute(statement), deadline)
+
+            row_count = 0
+            truncated = False
+            affected_rows = None
+
+            if query_type == "SELECT" or query_type == "WITH":
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                yield QueryStreamHeader(columns=columns)
+
+                while True:
+                    limit = min(
+                        self.config.stream_chunk_rows, self.config.stream_max_rows - row_count
+                    )
+                    if limit == 0:
+                        truncated = (
+                            await self._with_deadline(cursor.fetchone(), deadline) is not None
+                        )
+                        break
+
+                    rows = await self._with_deadline(cursor.fetchmany(limit), deadline)
+                    if not rows:
+                        break
+
+                    row_count += len(rows)
+                    yield QueryStreamRows(rows=[list(row) for row in rows])
+            else:
+                yield QueryStreamHeader(columns=[])
+                affected_rows = cursor.rowcount
+
+            if truncated and not server_limited:
+                # Closing the cursor would read the rest of the result off the wire
+                self.pool.discard(conn)
+            else:
+                await cursor.close()
+
+        yield QueryStreamTrailer(
+            row_count=row_count,
+            execution_time=time.time() - start_time,
+            affected_rows=affected_rows,
+            truncated=truncated,
+        )
+
+    def _acquire(
+        self, sandbox: Sandbox, rollback: bool = False
+    ) -> AbstractAsyncContextManager[aiomysql.Connection]:
+        """
+        Check out a connection for the sandbox.
+
+        Shared lesson schemas are read-only unless the checkout's transaction is rolled
+        back, in which case writes are never committed.
+        """
+        read_only = not rollback and self.config.is_template_schema(sandbox.schema_name)
+        return self.pool.acquire(sandbox.schema_name, read_only=read_only, rollback=rollback)
+
+    def _check_shared_schema(self, sandbox: Sandbox, query_type: str | None) -> None:
+        """
+        Refuse statements that could change a shared lesson schema.
+
+        READ ONLY transactions do not stop statements that commit implicitly, such as
+        RENAME TABLE, so only SELECT and rolled-back data modification reach a template.
+        """
+        if not self.config.is_template_schema(sandbox.schema_name):
+            return
+        if query_type == "SELECT" or self._rollback_policy(sandbox, query_type) is not None:
+            return
+        raise ValueError("Invalid query: only SELECT statements can run on a shared lesson schema")
+
+    def _rollback_policy(
+        self, sandbox: Sandbox, query_type: str | None
+    ) -> LessonQueryPolicy | None:
+        """The lesson's policy, if the query modifies data and the lesson rolls it back."""
+        if query_type not in ValidatorRegistry.ROLLED_BACK_TYPES:
+            return None
+        policy = self.validator_registry.get_policy(sandbox.lesson_id)
+        return policy if policy.rollback_dml else None
+
+    def _limit_rows(self, query: str, query_type: str | None, max_rows: int) -> tuple[str, bool]:
+        """
+        Add LIMIT max_rows + 1 to a SELECT query; the extra row marks a truncated result.
+
+        Returns:
+            Tuple of (statement to execute, whether MySQL stops after max_rows + 1 rows)
+        """
+        if not self.config.row_limit_injection or query_type != "SELECT":
+            return query, False
+
+        statement = apply_row_limit(query, max_rows + 1)
+        if statement is None:
+            return query, False
+        return statement, True
+
+    def _timed(self, phase: str) -> AbstractContextManager[None]:
+        """Record the block's duration for a metrics phase, if metrics are collected."""
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.time(phase)
+
+    def _schedule(
+        self, sandbox: Sandbox, query: str, long_lane: bool = False
+    ) -> AbstractAsyncContextManager[None]:
+        """Wait for an execution slot from the scheduler, if there is one."""
+        if self.scheduler is None:
+            return nullcontext()
+        return self.scheduler.slot(sandbox, query, long_lane)
+
+    async def _check_cost(self, sandbox: Sandbox, query: str, query_type: str | None) -> bool:
+        """
+        Check the query's estimated cost with the cost gate, if there is one.
+
+        Returns:
+            True if the query should run in the scheduler's long lane
+
+        Raises:
+            QueryTooExpensive: If the query would examine too many rows
+        """
+        if self.cost_gate is None or query_type not in EXPLAINABLE_TYPES:
+            return False
+        return await self.cost_gate.check(sandbox, query, lambda: self._explain(sandbox, query))
+
+    async def _explain(self, sandbox: Sandbox, query: str) -> Any:
+        """Get the query's plan from EXPLAIN FORMAT=JSON in the sandbox schema."""
+        statement = explain_statement(query)
+        if statement is None:
+            raise ValueError("Only a single statement can be explained")
+
+        async with self._acquire(sandbox) as conn:
             async with conn.cursor() as cursor:
-                # Set statement timeout
-                await cursor.execute(
-                    f"SET SESSION max_execution_time={self.config.query_timeout_seconds * 1000}"
-                )
+                await cursor.execute(statement)
+                (plan,) = await cursor.fetchone()
+        return json.loads(plan)
+
+    async def _with_deadline(self, awaitable: Any, deadline: float) -> Any:
+        """Await a cursor operation within the time left before the query deadline."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(
+                f"Query execution exceeded timeout of {self.config.query_timeout_seconds} seconds"
+            )
 
-                # Execute the query
-                await cursor.execute(query)
+        try:
+            return await asyncio.wait_for(awaitable, timeout=remaining)
+        except TimeoutError as e:
+            raise TimeoutError(
+                f"Query execution exceeded timeout of {self.config.query_timeout_seconds} seconds"
+            ) from e
 
-                # Fetch results
-                if query_type == "SELECT" or query_type == "WITH":
-                    rows = await cursor.fetchmany(self.config.max_result_rows)
-                    columns = [desc[0] for desc in cursor.description] if cursor.description else []
-                    row_count = len(rows)
-                    affected_rows = None
-
-                    # Convert rows to list of lists for JSON serialization
-                    serializable_rows = [list(row) for row in rows]
-                else:
-                    # For DML statements
-                    columns = []
-                    serializable_rows = []
-                    row_count = 0
-                    affected_rows = cursor.rowcount
-
-                execution_time = time.time() - start_time
-
-                return QueryExecuteResponse(
-                    columns=columns,
-                    rows=serializable_rows,
-                    row_count=row_count,
-                    execution_time=execution_time,
-                    affected_rows=affected_rows,
-                )
-        finally:
-            conn.close()
-
-    async def validate_query(self, query: str) -> QueryValidationResult:
-        """Validate query using the validator."""
-        return self.validator.validate(query)
+    async def validate_query(
+        self, query: str, lesson_id: int | None = None
+    ) -> QueryValidationResult:
+        """Validate query against the lesson's policy, reusing memoised results."""
+        return self.validator_registry.validate(query, lesson_id)
 
     def _sanitize_error(self, error_message: str) -> str:
         """
@@ -141,6 +512,7 @@ class MySQLQueryExecutor(IQueryExecutor):
         user_result: QueryExecuteResponse,
         expected_result: dict[str, Any],
         ordered: bool = False,
+        expected_fingerprint: ResultFingerprint | None = None,
     ) -> tuple[bool, list[str]]:
         """
         Compare user query result with expected result.
@@ -149,10 +521,17 @@ class MySQLQueryExecutor(IQueryExecutor):
             user_result: The result from user's query
             expected_result: Expected result dict with 'columns' and 'rows' keys
             ordered: Whether to compare in order (True) or order-insensitive (False)
+            expected_fingerprint: Precomputed fingerprint of the expected result; for
+                order-insensitive comparisons a matching fingerprint skips the full diff
 
         Returns:
             Tuple of (matches: bool, differences: list[str])
         """
+        if expected_fingerprint is not None and not ordered:
+            user_fingerprint = fingerprint_result(user_result.columns, user_result.rows)
+            if user_fingerprint == expected_fingerprint:
+                return True, []
+
         differences = []
 
         # Extract expected data
@@ -223,20 +602,4 @@ class MySQLQueryExecutor(IQueryExecutor):
 
     def _normalize_value(self, value: Any) -> Any:
         """Normalize a single value for comparison."""
-        # Handle None
-        if value is None:
-            return None
-
-        # Handle floats (round to avoid floating point precision issues)
-        if isinstance(value, float):
-            return round(value, 6)
-
-        # Handle datetime (convert to ISO string)
-        if hasattr(value, "isoformat"):
-            return value.isoformat()
-
-        # Handle bytes
-        if isinstance(value, bytes):
-            return value.decode("utf-8", errors="ignore")
-
-        return value
+        return normalize_value(value)
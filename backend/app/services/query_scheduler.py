@@ -0,0 +1,207 @@
+"""
+Fair-share scheduling of sandbox queries on the MySQL host.
+
+At most scheduler_max_concurrency queries run at once. When all slots are taken,
+queries queue and are dispatched by weighted fair queuing: each user's queries get
+virtual finish tags spaced by their expected run time, so a user running slow
+queries gets the same share of execution time as everyone else, not more.
+
+Queries are split into two lanes by the observed latency of their fingerprint
+(lesson plus normalised query text). Queries that have taken longer than
+scheduler_long_query_seconds run in the long lane, which holds at most
+scheduler_long_lane_slots slots; the remaining slots stay free for short queries,
+so a burst of slow queries cannot block quick ones behind it.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import SchedulerStats
+from app.services.sandbox import Sandbox
+from app.services.verdict_cache import query_fingerprint
+
+# Weight of the newest sample in a fingerprint's latency average
+LATENCY_SMOOTHING = 0.3
+
+# Expected run time of a query with no latency history, in seconds
+DEFAULT_COST = 0.05
+
+LatencyKey = tuple[int, str]
+
+
+@dataclass(order=True)
+class _Waiter:
+    finish: float
+    sequence: int
+    start: float = field(compare=False)
+    future: asyncio.Future[None] = field(compare=False)
+
+
+class QueryScheduler:
+    def __init__(self, config: SandboxConfig):
+        self.config = config
+
+        self._running = 0
+        self._running_long = 0
+        # Min-heaps of waiters by virtual finish tag; cancelled waiters are skipped
+        self._short_queue: list[_Waiter] = []
+        self._long_queue: list[_Waiter] = []
+        self._queued = 0
+        self._sequence = itertools.count()
+
+        # Virtual time: start tag of the last dispatched waiter
+        self._virtual_time = 0.0
+        # user_id -> finish tag of the user's last queued query
+        self._user_finish: dict[int, float] = {}
+        # (lesson_id, query fingerprint) -> smoothed latency, least recently used first
+        self._latencies: OrderedDict[LatencyKey, float] = OrderedDict()
+
+        self._dispatched = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    @asynccontextmanager
+    async def slot(
+        self, sandbox: Sandbox, query: str, long_lane: bool = False
+    ) -> AsyncIterator[None]:
+        """
+        Hold an execution slot while the block runs, and record how long it took.
+
+        Queries known to be slow, and those passed with long_lane, run in the long lane.
+        Cancelling the caller while it waits removes it from the queue.
+        """
+        key = (sandbox.lesson_id, query_fingerprint(query))
+        estimate = self._latencies.get(key)
+        long = long_lane or (
+            estimate is not None and estimate >= self.config.scheduler_long_query_seconds
+        )
+
+        await self._acquire(sandbox.user_id, long, estimate or DEFAULT_COST)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Timeouts and cancellations count too: they are what marks a runaway query
+            self._record_latency(key, time.perf_counter() - start_time)
+            self._release(long)
+
+    def _can_run(self, long: bool) -> bool:
+        if self._running >= self.config.scheduler_max_concurrency:
+            return False
+        return not long or self._running_long < self.config.scheduler_long_lane_slots
+
+    async def _acquire(self, user_id: int, long: bool, cost: float) -> None:
+        if not self._queued and self._can_run(long):
+            self._occupy(long)
+            self._record_wait(0.0)
+            return
+
+        start = max(self._virtual_time, self._user_finish.get(user_id, 0.0))
+        finish = start + cost
+        self._user_finish[user_id] = finish
+
+        waiter = _Waiter(
+            finish, next(self._sequence), start, asyncio.get_running_loop().create_future()
+        )
+        heapq.heappush(self._long_queue if long else self._short_queue, waiter)
+        self._queued += 1
+        # The queue may only hold long queries waiting for their lane
+        self._dispatch()
+
+        wait_start = time.perf_counter()
+        try:
+            await waiter.future
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Dispatched just as the wait was cancelled; give the slot back
+                self._release(long)
+            else:
+                # Left in its queue and skipped when it reaches the front
+                self._queued -= 1
+                waiter.future.cancel()
+            raise
+        self._record_wait(time.perf_counter() - wait_start)
+
+    def _occupy(self, long: bool) -> None:
+        self._running += 1
+        if long:
+            self._running_long += 1
+
+    def _release(self, long: bool) -> None:
+        self._running -= 1
+        if long:
+            self._running_long -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Start queued waiters, lowest finish tag first, while their lane has room."""
+        while self._queued:
+            eligible = [
+                (waiter, long)
+                for waiter, long in (
+                    (_head(self._short_queue), False),
+                    (_head(self._long_queue), True),
+                )
+                if waiter is not None and self._can_run(long)
+            ]
+            if not eligible:
+                return
+
+            waiter, long = min(eligible)
+            heapq.heappop(self._long_queue if long else self._short_queue)
+            self._queued -= 1
+            self._virtual_time = waiter.start
+            self._occupy(long)
+            waiter.future.set_result(None)
+
+        # Nothing queued: restart virtual time so finish tags do not grow without bound
+        self._short_queue.clear()
+        self._long_queue.clear()
+        self._virtual_time = 0.0
+        self._user_finish.clear()
+
+    def _record_latency(self, key: LatencyKey, latency: float) -> None:
+        if self.config.scheduler_latency_entries == 0:
+            return
+
+        previous = self._latencies.pop(key, None)
+        if previous is not None:
+            latency = previous + LATENCY_SMOOTHING * (latency - previous)
+        self._latencies[key] = latency
+        if len(self._latencies) > self.config.scheduler_latency_entries:
+            self._latencies.popitem(last=False)
+
+    def _record_wait(self, wait_time: float) -> None:
+        self._dispatched += 1
+        self._total_wait_time += wait_time
+        if wait_time > self._max_wait_time:
+            self._max_wait_time = wait_time
+
+    def get_stats(self) -> SchedulerStats:
+        """Get running and queued query counts and queue wait-time statistics."""
+        return SchedulerStats(
+            max_concurrency=self.config.scheduler_max_concurrency,
+            running=self._running,
+            running_long=self._running_long,
+            queued=self._queued,
+            dispatched=self._dispatched,
+            average_wait_time=(
+                self._total_wait_time / self._dispatched if self._dispatched else 0.0
+            ),
+            max_wait_time=self._max_wait_time,
+            tracked_fingerprints=len(self._latencies),
+        )
+
+
+def _head(queue: list[_Waiter]) -> _Waiter | None:
+    """Front of a waiter queue, dropping waiters that were cancelled."""
+    while queue and queue[0].future.done():
+        heapq.heappop(queue)
+    return queue[0] if queue else None
@@ -9,12 +9,26 @@ Provides comprehensive validation including:
 - Clear validation messages
 """
 
+import hashlib
+import itertools
 import re
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import ClassVar
+from typing import ClassVar, Literal
 
 from app.core.sandbox_config import SandboxConfig
-from app.schemas.sandbox import QueryValidationResult
+from app.schemas.sandbox import QueryValidationResult, ValidationCacheStats
+from app.services.sql_lexer import (
+    COMMENT,
+    DOT,
+    LPAREN,
+    RPAREN,
+    SEMICOLON,
+    VARIABLE,
+    WORD,
+    Token,
+    tokenize,
+)
 
 
 @dataclass
@@ -26,6 +40,14 @@ class LessonQueryPolicy:
     allowed_query_types: list[str] | None = None
     custom_blocked_patterns: list[str] | None = None
     custom_messages: dict[str, str] | None = None
+    # Run data modification inside a transaction that is always rolled back, so
+    # learners see its effect while the lesson data never changes
+    rollback_dml: bool = False
+    # SELECT run after the learner's statement in the same transaction; its result
+    # is what the learner sees and what gets validated
+    verification_query: str | None = None
+    # Database engine the lesson's sandboxes run on (see app.services.sqlite_engine)
+    engine: Literal["mysql", "sqlite"] = "mysql"
 
     def get_allowed_types(self, default: list[str]) -> list[str]:
         """Get allowed query types, falling back to default if not specified."""
@@ -51,29 +73,23 @@ class QueryValidator:
     - Provides clear, actionable error messages
     """
 
-    # SQL keywords that indicate query type
-    QUERY_TYPE_PATTERNS: ClassVar[list[tuple[str, str]]] = [
-        ("SELECT", r"^\s*(?:WITH\s+.+\s+AS\s+.+\s+)?SELECT\b"),
-        ("INSERT", r"^\s*INSERT\b"),
-        ("UPDATE", r"^\s*UPDATE\b"),
-        ("DELETE", r"^\s*DELETE\b"),
-        ("WITH", r"^\s*WITH\b"),
-        ("CREATE", r"^\s*CREATE\b"),
-        ("DROP", r"^\s*DROP\b"),
-        ("ALTER", r"^\s*ALTER\b"),
-        ("TRUNCATE", r"^\s*TRUNCATE\b"),
+    # Statement keywords that determine the query type
+    QUERY_TYPES: ClassVar[frozenset[str]] = frozenset(
+        {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "CREATE", "DROP", "ALTER", "TRUNCATE"}
+    )
+
+    # Constructs blocked as potential injection, in the order they are reported
+    DANGEROUS_PATTERNS: ClassVar[list[str]] = [
+        "UNION-based injection",
+        "Stacked queries",
+        "Comment-based bypass",
+        "System variables",
+        "OUTFILE operation",
+        "LOAD DATA operation",
+        "System function calls",
     ]
 
-    # Additional dangerous patterns to block
-    DANGEROUS_PATTERNS: ClassVar[list[tuple[str, str]]] = [
-        ("UNION-based injection", r"\bUNION\s+(?:ALL\s+)?SELECT\b"),
-        ("Stacked queries", r";\s*(?:SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER)\b"),
-        ("Comment-based bypass", r"--\s*$|/\*.*?\*/|#"),
-        ("System variables", r"@@\w+"),
-        ("OUTFILE operation", r"\bINTO\s+(?:OUT|DUMP)FILE\b"),
-        ("LOAD DATA operation", r"\bLOAD\s+DATA\b"),
-        ("System function calls", r"\b(?:LOAD_FILE|SYSTEM|EXEC)\s*\("),
-    ]
+    SYSTEM_FUNCTIONS: ClassVar[frozenset[str]] = frozenset({"LOAD_FILE", "SYSTEM", "EXEC"})
 
     # System schemas that should never be accessed
     SYSTEM_SCHEMAS: ClassVar[list[str]] = [
@@ -100,10 +116,6 @@ class QueryValidator:
             re.compile(pattern, re.IGNORECASE) for pattern in blocked_patterns
         ]
 
-        self._compiled_dangerous_patterns = [
-            (name, re.compile(pattern, re.IGNORECASE)) for name, pattern in self.DANGEROUS_PATTERNS
-        ]
-
         # Get effective allowed query types
         self.allowed_query_types = self.lesson_policy.get_allowed_types(config.allowed_query_types)
 
@@ -131,9 +143,11 @@ class QueryValidator:
                 query_type=None,
             )
 
+        tokens = tokenize(query_stripped)
+        code = [token for token in tokens if token.kind != COMMENT]
+
         # Detect query type
-        query_upper = query_stripped.upper()
-        detected_type = self._detect_query_type(query_upper)
+        detected_type = self._detect_query_type(code)
 
         # Check for blocked patterns (destructive commands)
         for pattern in self._compiled_blocked_patterns:
@@ -144,9 +158,11 @@ class QueryValidator:
                     f"This operation is not allowed in sandbox environments."
                 )
 
+        found_patterns, found_schemas = self._scan_tokens(tokens, code)
+
         # Check for dangerous patterns (SQL injection attempts)
-        for pattern_name, pattern in self._compiled_dangerous_patterns:
-            if pattern.search(query):
+        for pattern_name in self.DANGEROUS_PATTERNS:
+            if pattern_name in found_patterns:
                 errors.append(
                     f"Query contains potentially dangerous pattern ({pattern_name}). "
                     f"This is blocked for security reasons."
@@ -154,14 +170,20 @@ class QueryValidator:
 
         # Check for system schema access
         for schema in self.SYSTEM_SCHEMAS:
-            if re.search(rf"\b{schema}\.", query, re.IGNORECASE):
+            if schema in found_schemas:
                 errors.append(
                     f"Access to system schema '{schema}' is not allowed. "
                     f"Please query only the lesson tables in your sandbox."
                 )
 
-        # Check query type against allowed types
-        if detected_type and detected_type not in self.allowed_query_types:
+        # Check query type against allowed types; a statement that cannot be classified
+        # (RENAME, LOCK, SET, ...) is never on the allow-list
+        if detected_type is None:
+            errors.append(
+                "Query type is not recognised. Only "
+                f"{', '.join(self.allowed_query_types)} statements are allowed."
+            )
+        elif detected_type not in self.allowed_query_types:
             allowed_str = ", ".join(self.allowed_query_types)
             if lesson_id:
                 errors.append(
@@ -174,7 +196,7 @@ class QueryValidator:
                 )
 
         # Quality warnings
-        if query_upper.count("SELECT") > 10:
+        if sum(1 for token in code if token.keyword == "SELECT") > 10:
             warnings.append(
                 "Query contains many SELECT statements. Consider simplifying your query."
             )
@@ -185,13 +207,14 @@ class QueryValidator:
             )
 
         # Check for potentially unintended patterns
-        if re.search(r"\bDELETE\s+FROM\s+\w+\s*(?:;|$)", query, re.IGNORECASE):
+        unfiltered = self._find_unfiltered_statements(code)
+        if "DELETE" in unfiltered:
             warnings.append(
                 "DELETE without WHERE clause detected. This will remove all rows. "
                 "Is this intentional?"
             )
 
-        if re.search(r"\bUPDATE\s+\w+\s+SET\s+.+?(?:;|$)(?!.*WHERE)", query, re.IGNORECASE):
+        if "UPDATE" in unfiltered:
             warnings.append(
                 "UPDATE without WHERE clause detected. This will affect all rows. "
                 "Is this intentional?"
@@ -206,20 +229,119 @@ class QueryValidator:
             query_type=detected_type,
         )
 
-    def _detect_query_type(self, query_upper: str) -> str | None:
+    def _detect_query_type(self, code: list[Token]) -> str | None:
         """
         Detect the primary type of SQL query.
 
+        A WITH query counts as SELECT when its main statement is a SELECT.
+
         Args:
-            query_upper: Query string in uppercase
+            code: Query tokens without comments
 
         Returns:
             Query type string or None if not detected
         """
-        for query_type, pattern in self.QUERY_TYPE_PATTERNS:
-            if re.match(pattern, query_upper):
-                return query_type
-        return None
+        if not code or code[0].keyword not in self.QUERY_TYPES:
+            return None
+
+        query_type = code[0].keyword
+        if query_type != "WITH":
+            return query_type
+        return "SELECT" if self._main_keyword(code) == "SELECT" else "WITH"
+
+    def _main_keyword(self, code: list[Token]) -> str:
+        """
+        Get the keyword of a statement's main clause: its leading keyword, or after
+        WITH, the first statement keyword outside the CTE bodies.
+        """
+        if not code:
+            return ""
+        if code[0].keyword != "WITH":
+            return code[0].keyword
+
+        depth = 0
+        for token in code[1:]:
+            if token.kind == LPAREN:
+                depth += 1
+            elif token.kind == RPAREN:
+                depth -= 1
+            elif token.kind == SEMICOLON:
+                break
+            elif depth == 0 and token.keyword in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+                return token.keyword
+        return "WITH"
+
+    def _scan_tokens(self, tokens: list[Token], code: list[Token]) -> tuple[set[str], set[str]]:
+        """
+        Find dangerous constructs and system schema references in one pass.
+
+        Args:
+            tokens: All query tokens
+            code: Query tokens without comments
+
+        Returns:
+            Tuple of (dangerous pattern names, referenced system schemas)
+        """
+        found_patterns: set[str] = set()
+        found_schemas: set[str] = set()
+        system_schemas = set(self.SYSTEM_SCHEMAS)
+
+        if len(code) < len(tokens):
+            found_patterns.add("Comment-based bypass")
+
+        for index, token in enumerate(code):
+            next_token = code[index + 1] if index + 1 < len(code) else None
+            next_keyword = next_token.keyword if next_token else ""
+
+            if token.kind == SEMICOLON:
+                # Any second statement: COMMIT, SET or REPLACE after ';' are as dangerous
+                # as DROP, since the driver sends the whole text in one round-trip
+                if next_token is not None and next_token.kind != SEMICOLON:
+                    found_patterns.add("Stacked queries")
+            elif token.kind == VARIABLE:
+                if token.value.startswith("@@"):
+                    found_patterns.add("System variables")
+            elif token.kind == WORD:
+                keyword = token.keyword
+                if keyword == "UNION":
+                    if next_keyword == "ALL" and index + 2 < len(code):
+                        next_keyword = code[index + 2].keyword
+                    if next_keyword == "SELECT":
+                        found_patterns.add("UNION-based injection")
+                elif keyword == "INTO" and next_keyword in ("OUTFILE", "DUMPFILE"):
+                    found_patterns.add("OUTFILE operation")
+                elif keyword == "LOAD" and next_keyword == "DATA":
+                    found_patterns.add("LOAD DATA operation")
+                elif keyword in self.SYSTEM_FUNCTIONS and next_token and next_token.kind == LPAREN:
+                    found_patterns.add("System function calls")
+
+            if next_token and next_token.kind == DOT and token.identifier in system_schemas:
+                found_schemas.add(token.identifier)
+
+        return found_patterns, found_schemas
+
+    def _find_unfiltered_statements(self, code: list[Token]) -> set[str]:
+        """
+        Get the types of UPDATE/DELETE statements that have no WHERE clause.
+
+        Statements are classified by their main keyword only, so SELECT ... FOR UPDATE
+        and INSERT ... ON DUPLICATE KEY UPDATE are not UPDATE statements.
+        """
+        unfiltered: set[str] = set()
+        statement: list[Token] = []
+
+        for token in [*code, None]:
+            if token is None or token.kind == SEMICOLON:
+                keyword = self._main_keyword(statement)
+                if keyword in ("UPDATE", "DELETE") and not any(
+                    part.keyword == "WHERE" for part in statement
+                ):
+                    unfiltered.add(keyword)
+                statement = []
+            else:
+                statement.append(token)
+
+        return unfiltered
 
     def get_policy_description(self) -> str:
         """Get a human-readable description of the current validation policy."""
@@ -266,3 +388,177 @@ def create_module_validator(
     """
     policy = LessonQueryPolicy(module_id=module_id, allowed_query_types=allowed_types)
     return QueryValidator(config, policy)
+
+
+PolicyKey = tuple[str, int | None]
+
+
+@dataclass(frozen=True)
+class _RegisteredValidator:
+    version: int
+    validator: QueryValidator
+    lesson_id: int | None
+
+
+class ValidatorRegistry:
+    """
+    Process-wide validators per lesson and module policy, plus memoised results.
+
+    - Each policy's validator is built once and rebuilt only when the policy changes
+    - Validation results are kept in an LRU of validation_cache_max_entries entries,
+      keyed by (policy version, query hash)
+    - Changing a policy gives it a new version, so its old results are never reused
+      and age out of the LRU
+
+    Cached results are shared between callers and must not be modified.
+    """
+
+    DEFAULT_POLICY: ClassVar[PolicyKey] = ("default", None)
+
+    # Query types that run inside a rolled-back transaction without committing it
+    ROLLBACK_SAFE_TYPES: ClassVar[frozenset[str]] = frozenset(
+        {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+    )
+
+    # Data modification that rollback_dml lessons run in a rolled-back transaction;
+    # WITH stands for a CTE leading into INSERT, UPDATE or DELETE
+    ROLLED_BACK_TYPES: ClassVar[frozenset[str]] = frozenset({"INSERT", "UPDATE", "DELETE", "WITH"})
+
+    def __init__(self, config: SandboxConfig):
+        self.config = config
+        self._versions = itertools.count()
+        self._validators: dict[PolicyKey, _RegisteredValidator] = {}
+        self._results: OrderedDict[tuple[int, bytes], QueryValidationResult] = OrderedDict()
+
+        self._hits = 0
+        self._misses = 0
+
+        self._register(self.DEFAULT_POLICY, LessonQueryPolicy())
+
+    def set_policy(self, policy: LessonQueryPolicy) -> None:
+        """Register or replace the policy of a lesson or module."""
+        if policy.lesson_id is not None:
+            key: PolicyKey = ("lesson", policy.lesson_id)
+        elif policy.module_id is not None:
+            key = ("module", policy.module_id)
+        else:
+            raise ValueError("Policy must have a lesson_id or module_id")
+        self._register(key, policy)
+
+    def remove_policy(self, lesson_id: int | None = None, module_id: int | None = None) -> None:
+        """Remove a lesson or module policy, falling back to the default policy."""
+        if lesson_id is not None:
+            self._validators.pop(("lesson", lesson_id), None)
+        if module_id is not None:
+            self._validators.pop(("module", module_id), None)
+
+    def get_validator(
+        self, lesson_id: int | None = None, module_id: int | None = None
+    ) -> QueryValidator:
+        """
+        Get the validator for a lesson or module.
+
+        The lesson policy takes precedence over the module policy; without either the
+        default policy applies.
+        """
+        return self._lookup(lesson_id, module_id).validator
+
+    def is_read_only(self, lesson_id: int | None = None, module_id: int | None = None) -> bool:
+        """
+        Whether the lesson or module policy allows nothing but SELECT queries.
+
+        WITH queries whose main statement is a SELECT count as SELECT; the WITH query
+        type stands for CTEs leading into data modification.
+        """
+        allowed = self._lookup(lesson_id, module_id).validator.allowed_query_types
+        return set(allowed) <= {"SELECT"}
+
+    def get_policy(
+        self, lesson_id: int | None = None, module_id: int | None = None
+    ) -> LessonQueryPolicy:
+        """Get the policy that applies to a lesson or module."""
+        return self._lookup(lesson_id, module_id).validator.lesson_policy
+
+    def leaves_data_unchanged(
+        self, lesson_id: int | None = None, module_id: int | None = None
+    ) -> bool:
+        """
+        Whether no query the policy allows can change the lesson data.
+
+        True for SELECT-only policies and for policies that roll back data
+        modification and allow no statement that would commit implicitly.
+        """
+        if self.is_read_only(lesson_id, module_id):
+            return True
+        entry = self._lookup(lesson_id, module_id)
+        return (
+            entry.validator.lesson_policy.rollback_dml
+            and set(entry.validator.allowed_query_types) <= self.ROLLBACK_SAFE_TYPES
+        )
+
+    def validate(
+        self, query: str, lesson_id: int | None = None, module_id: int | None = None
+    ) -> QueryValidationResult:
+        """
+        Validate a query against the lesson or module policy, reusing earlier results.
+
+        Args:
+            query: SQL query string to validate
+            lesson_id: Lesson whose policy applies, if registered
+            module_id: Module whose policy applies when the lesson has none
+
+        Returns:
+            QueryValidationResult with validation status, errors, and warnings
+        """
+        entry = self._lookup(lesson_id, module_id)
+        max_entries = self.config.validation_cache_max_entries
+        if max_entries == 0:
+            return entry.validator.validate(query, entry.lesson_id)
+
+        key = (entry.version, hashlib.blake2b(query.encode("utf-8")).digest())
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            self._hits += 1
+            return result
+
+        self._misses += 1
+        result = entry.validator.validate(query, entry.lesson_id)
+        self._results[key] = result
+        if len(self._results) > max_entries:
+            self._results.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        """Drop all memoised validation results."""
+        self._results.clear()
+
+    def get_stats(self) -> ValidationCacheStats:
+        """Get hit rate and cache occupancy."""
+        lookups = self._hits + self._misses
+        return ValidationCacheStats(
+            policies=len(self._validators) - 1,
+            entries=len(self._results),
+            max_entries=self.config.validation_cache_max_entries,
+            hits=self._hits,
+            misses=self._misses,
+            hit_rate=self._hits / lookups if lookups else 0.0,
+        )
+
+    def _register(self, key: PolicyKey, policy: LessonQueryPolicy) -> None:
+        self._validators[key] = _RegisteredValidator(
+            version=next(self._versions),
+            validator=QueryValidator(self.config, policy),
+            lesson_id=policy.lesson_id,
+        )
+
+    def _lookup(self, lesson_id: int | None, module_id: int | None) -> _RegisteredValidator:
+        if lesson_id is not None:
+            entry = self._validators.get(("lesson", lesson_id))
+            if entry is not None:
+                return entry
+        if module_id is not None:
+            entry = self._validators.get(("module", module_id))
+            if entry is not None:
+                return entry
+        return self._validators[self.DEFAULT_POLICY]
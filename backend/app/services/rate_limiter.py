@@ -0,0 +1,216 @@
+"""
+Per-user token-bucket rate limiting for sandbox queries.
+
+Each user's bucket holds up to rate_limit_burst tokens and refills at
+rate_limit_queries_per_minute; every query takes one token. A bucket is stored as a
+single number, the time at which it will be full again: the tokens left follow from
+it, and a full bucket is the same as no bucket, so refilled buckets are dropped.
+
+InMemoryRateLimitBackend keeps buckets in process memory. SQLRateLimitBackend keeps
+them in a SQL table next to the sandbox registry, so the limit holds across workers.
+"""
+
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from sqlalchemy import (
+    Column,
+    Double,
+    Integer,
+    MetaData,
+    Table,
+    case,
+    delete,
+    insert,
+    literal,
+    select,
+    update,
+)
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import RateLimiterStats
+
+# Allowance for float rounding of epoch timestamps, in seconds
+_ROUNDING_SLACK = 0.001
+
+metadata = MetaData()
+
+rate_limits_table = Table(
+    "sandbox_rate_limits",
+    metadata,
+    Column("user_id", Integer, primary_key=True, autoincrement=False),
+    Column("full_at", Double, nullable=False, index=True),
+)
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Query rate limit exceeded, retry in {math.ceil(retry_after)} seconds")
+        self.retry_after = retry_after
+
+
+class IRateLimitBackend(ABC):
+    @abstractmethod
+    async def acquire(self, user_id: int, now: float, interval: float, window: float) -> float:
+        """
+        Take one token from a user's bucket.
+
+        Args:
+            user_id: Bucket owner
+            now: Current time in seconds since the epoch
+            interval: Seconds to refill one token
+            window: Seconds to refill the whole bucket (burst * interval)
+
+        Returns:
+            0.0 if a token was taken, otherwise seconds until one is available
+        """
+        pass
+
+    @abstractmethod
+    async def prune(self, now: float) -> None:
+        """Drop buckets that have refilled completely."""
+        pass
+
+
+class InMemoryRateLimitBackend(IRateLimitBackend):
+    # Stale buckets dropped per acquire; more than the one bucket an acquire can add
+    EVICT_PER_CALL = 2
+
+    def __init__(self) -> None:
+        # user_id -> time the bucket is full again, least recently used first
+        self._buckets: OrderedDict[int, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def acquire(self, user_id: int, now: float, interval: float, window: float) -> float:
+        self._evict(now, self.EVICT_PER_CALL)
+
+        full_at = max(self._buckets.get(user_id, now), now) + interval
+        if full_at - now > window + _ROUNDING_SLACK:
+            return full_at - now - window
+
+        self._buckets[user_id] = full_at
+        self._buckets.move_to_end(user_id)
+        return 0.0
+
+    async def prune(self, now: float) -> None:
+        refilled = [user_id for user_id, full_at in self._buckets.items() if full_at <= now]
+        for user_id in refilled:
+            del self._buckets[user_id]
+
+    def _evict(self, now: float, limit: int) -> None:
+        # Usage order is only roughly refill order: a drained bucket at the front can
+        # hold back refilled buckets used after it until it refills as well, at most
+        # one window later. prune scans every bucket, so those are not kept past it
+        for _ in range(limit):
+            user_id = next(iter(self._buckets), None)
+            if user_id is None or self._buckets[user_id] > now:
+                return
+            del self._buckets[user_id]
+
+
+class SQLRateLimitBackend(IRateLimitBackend):
+    """
+    IRateLimitBackend backed by a shared SQL table.
+
+    A token is taken with one conditional UPDATE, so concurrent workers cannot
+    overdraw a bucket. Workers compare their own clocks with the stored times, so
+    hosts sharing a table need synchronised clocks.
+    """
+
+    # Attempts for statements that fail on lock contention or on a concurrent
+    # insert of the same user's bucket
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+
+    async def initialize(self) -> None:
+        """Create the rate limit table if it does not exist."""
+        async with self.engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+
+    async def acquire(self, user_id: int, now: float, interval: float, window: float) -> float:
+        attempt = 1
+        while True:
+            try:
+                async with self.engine.begin() as conn:
+                    return await self._acquire(conn, user_id, now, interval, window)
+            except (IntegrityError, OperationalError):
+                if attempt >= self.MAX_ATTEMPTS:
+                    raise
+                attempt += 1
+
+    async def _acquire(
+        self, conn: AsyncConnection, user_id: int, now: float, interval: float, window: float
+    ) -> float:
+        full_at = rate_limits_table.c.full_at
+        next_full_at = case((full_at > now, full_at), else_=literal(now)) + interval
+
+        result = await conn.execute(
+            update(rate_limits_table)
+            .where(
+                rate_limits_table.c.user_id == user_id,
+                next_full_at <= now + window + _ROUNDING_SLACK,
+            )
+            .values(full_at=next_full_at)
+        )
+        if result.rowcount == 1:
+            return 0.0
+
+        stored = await conn.scalar(select(full_at).where(rate_limits_table.c.user_id == user_id))
+        if stored is None:
+            # A concurrent insert of the same bucket raises IntegrityError and is retried
+            await conn.execute(
+                insert(rate_limits_table).values(user_id=user_id, full_at=now + interval)
+            )
+            return 0.0
+
+        return max(stored, now) + interval - now - window
+
+    async def prune(self, now: float) -> None:
+        async with self.engine.begin() as conn:
+            await conn.execute(delete(rate_limits_table).where(rate_limits_table.c.full_at <= now))
+
+
+class RateLimiter:
+    def __init__(self, config: SandboxConfig, backend: IRateLimitBackend | None = None):
+        self.config = config
+        self.backend = backend if backend is not None else InMemoryRateLimitBackend()
+
+        self._allowed = 0
+        self._rejected = 0
+
+    async def acquire(self, user_id: int) -> None:
+        """
+        Take one query token for a user.
+
+        Raises:
+            RateLimitExceeded: If the user's bucket is empty
+        """
+        interval = 60 / self.config.rate_limit_queries_per_minute
+        retry_after = await self.backend.acquire(
+            user_id, time.time(), interval, self.config.rate_limit_burst * interval
+        )
+        if retry_after > 0:
+            self._rejected += 1
+            raise RateLimitExceeded(retry_after)
+        self._allowed += 1
+
+    async def prune(self) -> None:
+        """Drop buckets that have refilled completely."""
+        await self.backend.prune(time.time())
+
+    def get_stats(self) -> RateLimiterStats:
+        return RateLimiterStats(
+            allowed=self._allowed,
+            rejected=self._rejected,
+            tracked_users=(
+                len(self.backend) if isinstance(self.backend, InMemoryRateLimitBackend) else None
+            ),
+        )
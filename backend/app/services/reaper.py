@@ -0,0 +1,77 @@
+"""
+Background reaper for expired sandboxes.
+
+Runs SandboxService.cleanup_expired every cleanup_interval_minutes so expired
+sandboxes lose their MySQL schema and user without anyone calling destroy. A full
+batch is followed immediately by another run, so a backlog drains without waiting
+for the next interval.
+"""
+
+import asyncio
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import CleanupResult, ReaperStats
+from app.services.sandbox import SandboxService
+
+
+class SandboxReaper:
+    def __init__(self, config: SandboxConfig, sandbox_service: SandboxService):
+        self.config = config
+        self.sandbox_service = sandbox_service
+
+        self._runs = 0
+        self._errors = 0
+        self._cleaned = 0
+        self._failed = 0
+        self._retried = 0
+        self._last_run: CleanupResult | None = None
+
+        self._task: asyncio.Task[None] | None = None
+
+    async def run_once(self) -> CleanupResult:
+        """Tear down one batch of expired sandboxes and record the result."""
+        result = await self.sandbox_service.cleanup_expired()
+
+        self._runs += 1
+        self._cleaned += result.cleaned_count
+        self._failed += result.failed_count
+        self._retried += result.retried_count
+        self._last_run = result
+        return result
+
+    def start(self) -> None:
+        """Start the background cleanup loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the cleanup loop. A run in progress is cancelled."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                result = await self.run_once()
+                claimed = result.cleaned_count + result.failed_count
+                if claimed >= self.config.cleanup_batch_size:
+                    continue
+            except Exception:
+                self._errors += 1
+            await asyncio.sleep(self.config.cleanup_interval_minutes * 60)
+
+    def get_stats(self) -> ReaperStats:
+        """Get totals since startup and the most recent run."""
+        return ReaperStats(
+            runs=self._runs,
+            errors=self._errors,
+            cleaned=self._cleaned,
+            failed=self._failed,
+            retried=self._retried,
+            last_run=self._last_run,
+        )
@@ -0,0 +1,154 @@
+"""
+Column-oriented wire format for query results.
+
+Clients that send ``Accept: application/vnd.sqlhero.columnar+json`` get results as
+one entry per column instead of one JSON array per row:
+
+    {"name": "city", "type": "string", "nulls": "<base64 bitmap>",
+     "dictionary": ["Berlin", "Paris"], "values": [0, 1, 0]}
+
+- ``type`` is the column's value type: int, float, bool, string, decimal, datetime,
+  date, time, bytes, or mixed when a column holds more than one type
+- ``values`` holds only the non-null cells, in row order
+- ``nulls`` (only present when the column has nulls) is a bitmap with bit i set
+  when row i is null, least significant bit first
+- ``dictionary`` (strings only) lists distinct values; ``values`` then holds indices
+
+``row_count`` is the number of rows encoded in ``data``. A spilled result only
+carries its first page, so it also gets ``total_rows`` and ``next_offset`` to
+continue from via the result pages endpoint, as in QueryResultPage.
+
+The payload is built from plain lists and serialised with pydantic_core directly,
+so large results skip per-cell model validation.
+"""
+
+import base64
+import datetime
+from decimal import Decimal
+from typing import Any
+
+from pydantic_core import to_json
+
+from app.schemas.sandbox import QueryExecuteResponse
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.sqlhero.columnar+json"
+
+# Checked in order: bool is a subclass of int and datetime of date
+_VALUE_TYPES: list[tuple[type, str]] = [
+    (bool, "bool"),
+    (int, "int"),
+    (float, "float"),
+    (Decimal, "decimal"),
+    (str, "string"),
+    (datetime.datetime, "datetime"),
+    (datetime.date, "date"),
+    (datetime.time, "time"),
+    (datetime.timedelta, "time"),
+    (bytes, "bytes"),
+]
+
+
+def accepts_columnar(accept: str | None) -> bool:
+    """Whether an Accept header asks for the columnar encoding."""
+    if not accept:
+        return False
+    return any(part.split(";")[0].strip() == COLUMNAR_MEDIA_TYPE for part in accept.split(","))
+
+
+def encode_result(result: QueryExecuteResponse) -> dict[str, Any]:
+    """Encode a query result with its rows transposed into typed columns."""
+    payload: dict[str, Any] = {
+        "columns": result.columns,
+        "data": encode_columns(result.columns, result.rows),
+        "row_count": len(result.rows),
+        "execution_time": result.execution_time,
+        "affected_rows": result.affected_rows,
+        "result_handle": result.result_handle,
+        "truncated": result.truncated,
+    }
+    if result.result_handle is not None:
+        encoded = len(result.rows)
+        payload["total_rows"] = result.row_count
+        payload["next_offset"] = encoded if encoded < result.row_count else None
+    return payload
+
+
+def encode_columns(columns: list[str], rows: list[list[Any]]) -> list[dict[str, Any]]:
+    """Transpose rows into one encoded entry per column."""
+    return [
+        _encode_column(name, [row[index] for row in rows]) for index, name in enumerate(columns)
+    ]
+
+
+def decode_columns(data: list[dict[str, Any]], row_count: int) -> list[list[Any]]:
+    """Rebuild JSON row arrays from encoded columns (inverse of encode_columns)."""
+    decoded = [_decode_column(column, row_count) for column in data]
+    return [list(row) for row in zip(*decoded, strict=True)] if decoded else []
+
+
+def dumps(payload: Any) -> bytes:
+    """Serialise a columnar payload."""
+    return to_json(payload)
+
+
+def _encode_column(name: str, cells: list[Any]) -> dict[str, Any]:
+    values = [value for value in cells if value is not None]
+    column: dict[str, Any] = {"name": name, "type": _column_type(values)}
+
+    if len(values) < len(cells):
+        bitmap = bytearray((len(cells) + 7) // 8)
+        for index, value in enumerate(cells):
+            if value is None:
+                bitmap[index >> 3] |= 1 << (index & 7)
+        column["nulls"] = base64.b64encode(bitmap).decode("ascii")
+
+    if column["type"] == "string":
+        dictionary: dict[str, int] = {}
+        indices = [dictionary.setdefault(value, len(dictionary)) for value in values]
+        # Only worth it when values repeat
+        if len(dictionary) * 2 <= len(values):
+            column["dictionary"] = list(dictionary)
+            column["values"] = indices
+            return column
+
+    column["values"] = values
+    return column
+
+
+def _column_type(values: list[Any]) -> str:
+    if not values:
+        return "string"
+
+    column_type = _value_type(values[0])
+    first_type = type(values[0])
+    for value in values:
+        if type(value) is not first_type and _value_type(value) != column_type:
+            return "mixed"
+    return column_type
+
+
+def _value_type(value: Any) -> str:
+    for python_type, name in _VALUE_TYPES:
+        if isinstance(value, python_type):
+            return name
+    return "mixed"
+
+
+def _decode_column(column: dict[str, Any], row_count: int) -> list[Any]:
+    values = column["values"]
+    if "dictionary" in column:
+        dictionary = column["dictionary"]
+        values = [dictionary[index] for index in values]
+
+    if "nulls" not in column:
+        return list(values)
+
+    bitmap = base64.b64decode(column["nulls"])
+    cells: list[Any] = []
+    value_iter = iter(values)
+    for index in range(row_count):
+        if bitmap[index >> 3] & (1 << (index & 7)):
+            cells.append(None)
+        else:
+            cells.append(next(value_iter))
+    return cells
@@ -0,0 +1,138 @@
+"""
+Order-insensitive fingerprints of query results.
+
+A fingerprint is the sorted column names, the row count and a multiset hash of
+the rows: every row is hashed on its own and the row hashes are summed, so the
+fingerprint does not depend on row order and takes one pass to compute.
+
+Values are normalised the same way as MySQLQueryExecutor.compare_results, so equal
+fingerprints mean compare_results(ordered=False) would find no differences.
+"""
+
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from fractions import Fraction
+from typing import Any
+
+_HASH_MODULUS = 1 << 128
+
+
+@dataclass(frozen=True)
+class ResultFingerprint:
+    column_signature: tuple[str, ...]
+    row_count: int
+    row_hash: int
+
+
+@dataclass(frozen=True)
+class ExpectedResult:
+    """A lesson's expected result with its precomputed fingerprint."""
+
+    version: datetime | None
+    result: dict[str, Any]
+    fingerprint: ResultFingerprint
+
+
+def normalize_value(value: Any) -> Any:
+    """Normalize a single value for comparison."""
+    # Handle None
+    if value is None:
+        return None
+
+    # Handle floats (round to avoid floating point precision issues)
+    if isinstance(value, float):
+        return round(value, 6)
+
+    # Handle datetime (convert to ISO string)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+
+    # Handle bytes
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="ignore")
+
+    return value
+
+
+def fingerprint_result(columns: list[str], rows: list[list[Any]]) -> ResultFingerprint:
+    """Compute the fingerprint of a result in a single pass over its rows."""
+    row_hash = 0
+    for row in rows:
+        row_hash += _row_digest(row)
+
+    return ResultFingerprint(
+        column_signature=tuple(sorted(columns)),
+        row_count=len(rows),
+        row_hash=row_hash % _HASH_MODULUS,
+    )
+
+
+def _row_digest(row: list[Any]) -> int:
+    digest = hashlib.blake2b(digest_size=16)
+    for value in row:
+        encoded = _canonical_value(normalize_value(value))
+        digest.update(len(encoded).to_bytes(4, "little"))
+        digest.update(encoded)
+    return int.from_bytes(digest.digest(), "little")
+
+
+def _canonical_value(value: Any) -> bytes:
+    """
+    Encode a normalised value so that values comparing equal encode identically.
+    Numbers are encoded as exact fractions because Python compares int, float,
+    Decimal and bool by value (1 == 1.0 == Decimal("1.0")).
+    """
+    if value is None:
+        return b"z"
+
+    if isinstance(value, str):
+        return b"s" + value.encode("utf-8", errors="surrogatepass")
+
+    if type(value) is int:
+        return b"n%d/1" % value
+
+    if isinstance(value, int | float | Decimal):
+        try:
+            fraction = Fraction(value)
+        except (ValueError, OverflowError):
+            # NaN and infinity
+            pass
+        else:
+            return b"n%d/%d" % (fraction.numerator, fraction.denominator)
+
+    return f"{type(value).__name__}:{value!r}".encode()
+
+
+class ExpectedResultCache:
+    """
+    Expected results keyed by lesson, canonicalised once per lesson version.
+
+    The version is the lesson's updated_at, so editing a lesson invalidates its entry.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[int, ExpectedResult] = {}
+
+    def get(self, lesson_id: int, version: datetime | None) -> ExpectedResult | None:
+        entry = self._entries.get(lesson_id)
+        if entry is None or entry.version != version:
+            return None
+        return entry
+
+    def put(
+        self, lesson_id: int, version: datetime | None, expected_result: dict[str, Any]
+    ) -> ExpectedResult:
+        entry = ExpectedResult(
+            version=version,
+            result=expected_result,
+            fingerprint=fingerprint_result(
+                expected_result.get("columns", []), expected_result.get("rows", [])
+            ),
+        )
+        self._entries[lesson_id] = entry
+        return entry
+
+    def invalidate(self, lesson_id: int) -> None:
+        self._entries.pop(lesson_id, None)
@@ -0,0 +1,233 @@
+"""
+Disk-backed store for large query results.
+
+Results above result_spill_threshold_rows are written to a temp file, one JSON
+array per row, and read back page by page through a memory map. Row offsets are
+kept in memory so any page is a single slice of the map.
+"""
+
+import mmap
+import os
+import secrets
+import tempfile
+from array import array
+from collections.abc import Sequence
+from datetime import UTC, datetime
+from typing import Any
+
+from pydantic_core import from_json, to_json
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import QueryResultPage, ResultStoreStats
+from app.services.sandbox import Sandbox
+
+
+class SpilledResult:
+    """A query result written to disk and addressable by row offset."""
+
+    def __init__(
+        self,
+        handle: str,
+        sandbox_id: str,
+        columns: list[str],
+        path: str,
+        offsets: array,
+        expires_at: datetime,
+    ):
+        self.handle = handle
+        self.sandbox_id = sandbox_id
+        self.columns = columns
+        self.path = path
+        self.offsets = offsets
+        self.expires_at = expires_at
+
+        self._file = open(path, "rb")  # noqa: SIM115 - kept open for the lifetime of the map
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def size_bytes(self) -> int:
+        return self.offsets[-1]
+
+    def is_expired(self) -> bool:
+        return datetime.now(UTC) >= self.expires_at
+
+    def read_rows(self, offset: int, limit: int) -> list[list[Any]]:
+        end = min(offset + limit, self.row_count)
+        if offset >= end:
+            return []
+
+        data = self._map[self.offsets[offset] : self.offsets[end]]
+        return [from_json(line) for line in data.splitlines()]
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SpillWriter:
+    """Appends rows of one result to its spill file."""
+
+    def __init__(self, store: "ResultStore", sandbox: Sandbox, columns: list[str]):
+        self.store = store
+        self.sandbox = sandbox
+        self.columns = columns
+
+        fd, self.path = tempfile.mkstemp(
+            prefix="sandbox_result_", suffix=".ndjson", dir=store.spill_dir
+        )
+        self._file = os.fdopen(fd, "wb")
+        self._offsets = array("Q", [0])
+
+    def write(self, rows: Sequence[Sequence[Any]]) -> None:
+        """
+        Append rows to the spill file.
+
+        Raises:
+            RuntimeError: If the result alone would exceed the disk budget
+        """
+        position = self._offsets[-1]
+        for row in rows:
+            line = to_json(list(row)) + b"\n"
+            self._file.write(line)
+            position += len(line)
+            self._offsets.append(position)
+
+        if position > self.store.budget_bytes:
+            raise RuntimeError(
+                f"Query result exceeds the result disk budget of "
+                f"{self.store.config.result_disk_budget_mb} MB"
+            )
+
+    def commit(self) -> SpilledResult:
+        """Finish writing and register the result with the store."""
+        self._file.close()
+        result = SpilledResult(
+            handle=secrets.token_urlsafe(16),
+            sandbox_id=self.sandbox.sandbox_id,
+            columns=self.columns,
+            path=self.path,
+            offsets=self._offsets,
+            expires_at=self.sandbox.expires_at,
+        )
+        self.store._add(result)
+        return result
+
+    def abort(self) -> None:
+        """Discard a partially written result."""
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class ResultStore:
+    """
+    Spilled query results for all sandboxes on this node.
+
+    - Results expire with the sandbox that produced them
+    - Total size is kept under result_disk_budget_mb by evicting the oldest results
+    """
+
+    def __init__(self, config: SandboxConfig):
+        self.config = config
+        self.spill_dir = config.result_spill_dir or None
+        self.budget_bytes = config.result_disk_budget_mb * 1024 * 1024
+
+        self._results: dict[str, SpilledResult] = {}
+        self._used_bytes = 0
+        self._evicted = 0
+
+    def open_writer(self, sandbox: Sandbox, columns: list[str]) -> SpillWriter:
+        """Start spilling a result produced by the sandbox."""
+        return SpillWriter(self, sandbox, columns)
+
+    def get_page(
+        self, sandbox_id: str, handle: str, offset: int = 0, limit: int | None = None
+    ) -> QueryResultPage:
+        """
+        Read a page of a spilled result.
+
+        Raises:
+            ValueError: If the handle is unknown, expired or belongs to another sandbox
+        """
+        result = self._results.get(handle)
+        if result is None or result.sandbox_id != sandbox_id:
+            raise ValueError(f"Result {handle} not found")
+
+        if result.is_expired():
+            self.discard(handle)
+            raise ValueError(f"Result {handle} has expired")
+
+        limit = limit or self.config.result_page_size
+        rows = result.read_rows(offset, limit)
+        next_offset = offset + len(rows)
+
+        return QueryResultPage(
+            result_handle=handle,
+            columns=result.columns,
+            rows=rows,
+            offset=offset,
+            row_count=result.row_count,
+            next_offset=next_offset if next_offset < result.row_count else None,
+        )
+
+    def get_rows(self, sandbox_id: str, handle: str) -> list[list[Any]]:
+        """Read every row of a spilled result."""
+        result = self._results.get(handle)
+        if result is None or result.sandbox_id != sandbox_id:
+            raise ValueError(f"Result {handle} not found")
+        return result.read_rows(0, result.row_count)
+
+    def discard(self, handle: str) -> None:
+        result = self._results.pop(handle, None)
+        if result is not None:
+            self._used_bytes -= result.size_bytes
+            result.close()
+
+    def discard_sandbox(self, sandbox_id: str) -> int:
+        """Drop all results of a sandbox. Returns the number of results dropped."""
+        handles = [h for h, result in self._results.items() if result.sandbox_id == sandbox_id]
+        for handle in handles:
+            self.discard(handle)
+        return len(handles)
+
+    def discard_expired(self) -> int:
+        """Drop results whose sandbox has expired. Returns the number of results dropped."""
+        handles = [h for h, result in self._results.items() if result.is_expired()]
+        for handle in handles:
+            self.discard(handle)
+        return len(handles)
+
+    def get_stats(self) -> ResultStoreStats:
+        """Get spilled result count and disk usage."""
+        return ResultStoreStats(
+            results=len(self._results),
+            used_bytes=self._used_bytes,
+            budget_bytes=self.budget_bytes,
+            evicted=self._evicted,
+        )
+
+    def close(self) -> None:
+        """Drop all spilled results."""
+        for handle in list(self._results):
+            self.discard(handle)
+
+    def _add(self, result: SpilledResult) -> None:
+        self.discard_expired()
+
+        # Results are kept in insertion order, so the first ones are the oldest
+        while self._results and self._used_bytes + result.size_bytes > self.budget_bytes:
+            self.discard(next(iter(self._results)))
+            self._evicted += 1
+
+        self._results[result.handle] = result
+        self._used_bytes += result.size_bytes
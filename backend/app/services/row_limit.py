@@ -0,0 +1,78 @@
+"""
+Row limit injection for SELECT queries.
+
+The executor only returns the first max_result_rows rows of a result. Adding a
+LIMIT to the query lets MySQL stop producing rows there instead of computing and
+sending the whole result for the executor to throw away.
+
+The rewrite works on tokens, so LIMITs in subqueries, CTE bodies and
+parenthesised UNION members are left alone, and comments and string literals
+cannot be mistaken for clauses. Only the top-level LIMIT is added or lowered; a
+smaller LIMIT from the learner is kept as is. Appending LIMIT at the end keeps
+ORDER BY semantics, since LIMIT applies after ordering.
+"""
+
+from app.services.sql_lexer import COMMENT, LPAREN, NUMBER, RPAREN, SEMICOLON, tokenize
+
+# LIMIT cannot simply be appended after these top-level clauses
+_TRAILING_CLAUSES = frozenset({"INTO", "FOR", "LOCK", "PROCEDURE"})
+
+_SET_OPERATORS = frozenset({"UNION", "EXCEPT", "INTERSECT"})
+
+# Main statements a WITH clause can lead into besides SELECT
+_WRITE_STATEMENTS = frozenset({"INSERT", "REPLACE", "UPDATE", "DELETE"})
+
+
+def apply_row_limit(query: str, limit: int) -> str | None:
+    """
+    Rewrite a SELECT query so that it returns at most limit rows.
+
+    Returns:
+        The query to run, unchanged if it already has a LIMIT no larger than limit,
+        or None if the query cannot be limited safely and must run as is
+    """
+    code = [token for token in tokenize(query) if token.kind != COMMENT]
+    while code and code[-1].kind == SEMICOLON:
+        code.pop()
+    if not code or code[0].keyword not in ("SELECT", "WITH"):
+        return None
+
+    depth = 0
+    limit_index = None
+    for index, token in enumerate(code):
+        if token.kind == LPAREN:
+            depth += 1
+        elif token.kind == RPAREN:
+            depth -= 1
+        elif token.kind == SEMICOLON:
+            # More than one statement
+            return None
+        elif depth == 0:
+            if token.keyword in _TRAILING_CLAUSES or token.keyword in _WRITE_STATEMENTS:
+                return None
+            if token.keyword in _SET_OPERATORS:
+                limit_index = None
+            elif token.keyword == "LIMIT":
+                limit_index = index
+
+    if limit_index is None:
+        end = code[-1].position + len(code[-1].value)
+        return f"{query[:end]} LIMIT {limit}{query[end:]}"
+
+    # LIMIT count | LIMIT offset, count | LIMIT count OFFSET offset
+    arguments = code[limit_index + 1 :]
+    if len(arguments) == 1 and arguments[0].kind == NUMBER:
+        count = arguments[0]
+    elif len(arguments) == 3 and arguments[0].kind == NUMBER and arguments[2].kind == NUMBER:
+        if arguments[1].value == ",":
+            count = arguments[2]
+        elif arguments[1].keyword == "OFFSET":
+            count = arguments[0]
+        else:
+            return None
+    else:
+        return None
+
+    if int(count.value) <= limit:
+        return query
+    return f"{query[: count.position]}{limit}{query[count.position + len(count.value) :]}"
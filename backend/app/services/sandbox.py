@@ -1,19 +1,52 @@
+import asyncio
 import time
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from contextlib import AbstractAsyncContextManager, AbstractContextManager, nullcontext
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from app.core.sandbox_config import SandboxConfig
 from app.schemas.sandbox import (
     CleanupResult,
     QueryExecuteResponse,
+    QueryStreamFrame,
+    QueryStreamHeader,
+    QueryStreamRows,
+    QueryStreamTrailer,
     QueryValidationResult,
     SandboxStatus,
 )
-from app.services.query_validator import QueryValidator
+from app.services.admission import SandboxAdmission
+from app.services.expiry_index import ExpiryIndex
+from app.services.metrics import SandboxMetricsCollector
+from app.services.query_validator import ValidatorRegistry
+from app.services.rate_limiter import RateLimiter
+from app.services.verdict_cache import is_deterministic
+
+if TYPE_CHECKING:
+    from app.services.result_store import ResultStore
+    from app.services.verdict_cache import VerdictCache, VerdictCacheKey
+    from app.services.warm_pool import WarmSandboxPool
 
 
 class Sandbox:
+    # Slots keep per-sandbox memory small and fixed with many live sandboxes
+    __slots__ = (
+        "sandbox_id",
+        "user_id",
+        "lesson_id",
+        "schema_name",
+        "status",
+        "created_at",
+        "_expires_at",
+        "last_accessed_at",
+        "query_count",
+        "is_dirty",
+        "expiry_index",
+    )
+
     def __init__(
         self,
         sandbox_id: str,
@@ -25,6 +58,8 @@ class Sandbox:
         expires_at: datetime,
         last_accessed_at: datetime,
         query_count: int = 0,
+        is_dirty: bool = False,
+        expiry_index: ExpiryIndex | None = None,
     ):
         self.sandbox_id = sandbox_id
         self.user_id = user_id
@@ -32,9 +67,23 @@ class Sandbox:
         self.schema_name = schema_name
         self.status = status
         self.created_at = created_at
-        self.expires_at = expires_at
         self.last_accessed_at = last_accessed_at
         self.query_count = query_count
+        # Set once DML has run, after which results may differ from the lesson template
+        self.is_dirty = is_dirty
+        # Index notified whenever expires_at changes
+        self.expiry_index = expiry_index
+        self.expires_at = expires_at
+
+    @property
+    def expires_at(self) -> datetime:
+        return self._expires_at
+
+    @expires_at.setter
+    def expires_at(self, value: datetime) -> None:
+        self._expires_at = value
+        if self.expiry_index is not None:
+            self.expiry_index.schedule(self.sandbox_id, value)
 
     def is_expired(self, now: datetime | None = None) -> bool:
         if now is None:
@@ -56,12 +105,25 @@ class Sandbox:
             "expires_at": self.expires_at.isoformat(),
             "last_accessed_at": self.last_accessed_at.isoformat(),
             "query_count": self.query_count,
+            "is_dirty": self.is_dirty,
         }
 
 
+@dataclass(frozen=True)
+class SchemaInfo:
+    """A sandbox schema found on the MySQL server."""
+
+    schema_name: str
+    size_bytes: int
+    # Seconds since the schema's oldest table was created; None for empty schemas
+    age_seconds: int | None
+
+
 class ISandboxManager(ABC):
     @abstractmethod
-    async def create_sandbox(self, user_id: int, lesson_id: int) -> Sandbox:
+    async def create_sandbox(
+        self, user_id: int, lesson_id: int, schema_name: str | None = None
+    ) -> Sandbox:
         pass
 
     @abstractmethod
@@ -72,6 +134,16 @@ class ISandboxManager(ABC):
     async def get_user_sandboxes(self, user_id: int) -> list[Sandbox]:
         pass
 
+    @abstractmethod
+    async def get_schema_names(self) -> set[str]:
+        """Schema names of all sandboxes in the registry."""
+        pass
+
+    @abstractmethod
+    async def count_sandboxes(self) -> int:
+        """Number of sandboxes in the registry, in any status."""
+        pass
+
     @abstractmethod
     async def destroy_sandbox(self, sandbox_id: str) -> None:
         pass
@@ -84,8 +156,37 @@ class ISandboxManager(ABC):
     async def update_sandbox_access(self, sandbox_id: str) -> None:
         pass
 
+    @abstractmethod
+    async def set_sandbox_status(self, sandbox_id: str, status: SandboxStatus) -> None:
+        pass
+
+    @abstractmethod
+    async def claim_expired_sandboxes(self, limit: int, lease_seconds: float) -> list[Sandbox]:
+        """
+        Claim up to limit expired sandboxes for teardown, earliest expiry first.
+
+        Claimed sandboxes are marked EXPIRED and their expiry is pushed out by
+        lease_seconds, so no other reaper claims them meanwhile and they are claimed
+        again if teardown never completes.
+        """
+        pass
+
+    @abstractmethod
+    async def mark_sandbox_dirty(self, sandbox_id: str) -> None:
+        pass
+
+    def get_shared_schema(self, lesson_id: int) -> str | None:
+        """Schema shared by all of a lesson's sandboxes, or None if each gets its own."""
+        return None
+
+    def is_shared(self) -> bool:
+        """Whether all workers register sandboxes here, so it knows every live schema."""
+        return False
+
 
 class ISchemaManager(ABC):
+    config: SandboxConfig
+
     @abstractmethod
     async def create_schema(self, schema_name: str) -> None:
         pass
@@ -114,24 +215,74 @@ class ISchemaManager(ABC):
     async def drop_sandbox_user(self, username: str) -> None:
         pass
 
+    @abstractmethod
+    async def list_sandbox_schemas(self) -> list[SchemaInfo]:
+        """List all schemas named with the sandbox schema prefix."""
+        pass
+
+    async def provision_schema(
+        self, schema_name: str, lesson_id: int, username: str, password: str
+    ) -> None:
+        """Create schema, sandbox user and seed data. Implementations may pipeline these."""
+        await self.create_schema(schema_name)
+        await self.create_sandbox_user(username, password, schema_name)
+        await self.seed_data(schema_name, lesson_id)
+
+    async def ensure_template(self, lesson_id: int) -> None:
+        """Create and seed the lesson's template schema unless it already exists."""
+        template_name = self.config.get_template_schema_name(lesson_id)
+        if not await self.schema_exists(template_name):
+            await self.create_schema(template_name)
+            await self.seed_data(template_name, lesson_id)
+
+    def get_template_version(self, lesson_id: int) -> str | None:
+        """Identify the data a lesson's sandboxes are seeded with, or None if unknown."""
+        return None
+
 
 class IQueryExecutor(ABC):
+    config: SandboxConfig
+    validator_registry: ValidatorRegistry
+
     @abstractmethod
     async def execute_query(self, sandbox: Sandbox, query: str) -> QueryExecuteResponse:
         pass
 
     @abstractmethod
-    async def validate_query(self, query: str) -> QueryValidationResult:
+    async def validate_query(
+        self, query: str, lesson_id: int | None = None
+    ) -> QueryValidationResult:
         pass
 
+    async def stream_query(self, sandbox: Sandbox, query: str) -> AsyncIterator[QueryStreamFrame]:
+        """
+        Stream a result as a header frame, row chunks and a trailer.
+        Buffers the full result by default; executors with server-side cursors override this.
+        """
+        result = await self.execute_query(sandbox, query)
+        chunk_size = self.config.stream_chunk_rows
+
+        yield QueryStreamHeader(columns=result.columns)
+        for start in range(0, len(result.rows), chunk_size):
+            yield QueryStreamRows(rows=result.rows[start : start + chunk_size])
+        yield QueryStreamTrailer(
+            row_count=result.row_count,
+            execution_time=result.execution_time,
+            affected_rows=result.affected_rows,
+            truncated=result.truncated,
+        )
+
 
 class InMemorySandboxManager(ISandboxManager):
     def __init__(self, config: SandboxConfig):
         self.config = config
         self._sandboxes: dict[str, Sandbox] = {}
         self._user_sandbox_ids: dict[int, list[str]] = {}
+        self._expiry_index = ExpiryIndex()
 
-    async def create_sandbox(self, user_id: int, lesson_id: int) -> Sandbox:
+    async def create_sandbox(
+        self, user_id: int, lesson_id: int, schema_name: str | None = None
+    ) -> Sandbox:
         user_sandboxes = await self.get_user_sandboxes(user_id)
         active_count = sum(1 for s in user_sandboxes if s.status == SandboxStatus.ACTIVE)
 
@@ -148,7 +299,8 @@ class InMemorySandboxManager(ISandboxManager):
         now = datetime.now(UTC)
         timestamp = int(time.time())
         sandbox_id = f"{user_id}_{lesson_id}_{timestamp}"
-        schema_name = self.config.get_schema_name(user_id, timestamp)
+        if schema_name is None:
+            schema_name = self.config.get_schema_name(user_id, timestamp)
 
         expires_at = now + timedelta(hours=self.config.max_lifetime_hours)
 
@@ -162,6 +314,7 @@ class InMemorySandboxManager(ISandboxManager):
             expires_at=expires_at,
             last_accessed_at=now,
             query_count=0,
+            expiry_index=self._expiry_index,
         )
 
         self._sandboxes[sandbox_id] = sandbox
@@ -179,11 +332,19 @@ class InMemorySandboxManager(ISandboxManager):
         sandbox_ids = self._user_sandbox_ids.get(user_id, [])
         return [self._sandboxes[sid] for sid in sandbox_ids if sid in self._sandboxes]
 
+    async def get_schema_names(self) -> set[str]:
+        return {sandbox.schema_name for sandbox in self._sandboxes.values()}
+
+    async def count_sandboxes(self) -> int:
+        return len(self._sandboxes)
+
     async def destroy_sandbox(self, sandbox_id: str) -> None:
         sandbox = self._sandboxes.get(sandbox_id)
         if sandbox:
             sandbox.status = SandboxStatus.DESTROYED
             del self._sandboxes[sandbox_id]
+            self._expiry_index.discard(sandbox_id)
+            sandbox.expiry_index = None
 
             if sandbox.user_id in self._user_sandbox_ids:
                 self._user_sandbox_ids[sandbox.user_id] = [
@@ -194,23 +355,25 @@ class InMemorySandboxManager(ISandboxManager):
         start_time = time.time()
         now = datetime.now(UTC)
 
-        expired_ids = [
-            sid
-            for sid, sandbox in self._sandboxes.items()
-            if sandbox.is_expired(now) and sandbox.status == SandboxStatus.ACTIVE
-        ]
+        # Expired sandboxes that are not active stay indexed until they become active
+        batch_ids = self._expiry_index.pop_expired(
+            now,
+            limit=self.config.cleanup_batch_size,
+            accept=lambda sid: self._sandboxes[sid].status == SandboxStatus.ACTIVE,
+        )
 
         cleaned_ids = []
         failed_count = 0
 
-        batch_ids = expired_ids[: self.config.cleanup_batch_size]
-
         for sandbox_id in batch_ids:
             try:
                 await self.destroy_sandbox(sandbox_id)
                 cleaned_ids.append(sandbox_id)
             except Exception:
                 failed_count += 1
+                sandbox = self._sandboxes.get(sandbox_id)
+                if sandbox is not None:
+                    self._expiry_index.schedule(sandbox_id, sandbox.expires_at)
 
         duration = time.time() - start_time
 
@@ -232,17 +395,41 @@ class InMemorySandboxManager(ISandboxManager):
             if new_expires < sandbox.expires_at:
                 sandbox.expires_at = new_expires
 
+    async def set_sandbox_status(self, sandbox_id: str, status: SandboxStatus) -> None:
+        sandbox = await self.get_sandbox(sandbox_id)
+        if sandbox:
+            sandbox.status = status
+
+    async def claim_expired_sandboxes(self, limit: int, lease_seconds: float) -> list[Sandbox]:
+        now = datetime.now(UTC)
+        lease_until = now + timedelta(seconds=lease_seconds)
+
+        claimed = []
+        for sandbox_id in self._expiry_index.pop_expired(now, limit=limit):
+            sandbox = self._sandboxes[sandbox_id]
+            sandbox.status = SandboxStatus.EXPIRED
+            sandbox.expires_at = lease_until
+            claimed.append(sandbox)
+        return claimed
+
+    async def mark_sandbox_dirty(self, sandbox_id: str) -> None:
+        sandbox = await self.get_sandbox(sandbox_id)
+        if sandbox:
+            sandbox.is_dirty = True
+
 
 class MockSchemaManager(ISchemaManager):
     def __init__(self, config: SandboxConfig):
         self.config = config
         self._schemas: set[str] = set()
         self._users: set[str] = set()
+        self._created_at: dict[str, float] = {}
 
     async def create_schema(self, schema_name: str) -> None:
         if schema_name in self._schemas:
             raise ValueError(f"Schema {schema_name} already exists")
         self._schemas.add(schema_name)
+        self._created_at[schema_name] = time.time()
 
     async def seed_data(self, schema_name: str, lesson_id: int) -> None:
         if schema_name not in self._schemas:
@@ -250,6 +437,7 @@ class MockSchemaManager(ISchemaManager):
 
     async def drop_schema(self, schema_name: str) -> None:
         self._schemas.discard(schema_name)
+        self._created_at.pop(schema_name, None)
 
     async def schema_exists(self, schema_name: str) -> bool:
         return schema_name in self._schemas
@@ -263,14 +451,28 @@ class MockSchemaManager(ISchemaManager):
     async def drop_sandbox_user(self, username: str) -> None:
         self._users.discard(username)
 
+    async def list_sandbox_schemas(self) -> list[SchemaInfo]:
+        return [
+            SchemaInfo(
+                schema_name=name,
+                size_bytes=0,
+                age_seconds=int(time.time() - self._created_at.get(name, time.time())),
+            )
+            for name in sorted(self._schemas)
+            if self.config.is_sandbox_schema(name)
+        ]
+
+    def get_template_version(self, lesson_id: int) -> str | None:
+        return f"mock_{lesson_id}"
+
 
 class MockQueryExecutor(IQueryExecutor):
-    def __init__(self, config: SandboxConfig):
+    def __init__(self, config: SandboxConfig, validator_registry: ValidatorRegistry | None = None):
         self.config = config
-        self.validator = QueryValidator(config)
+        self.validator_registry = validator_registry or ValidatorRegistry(config)
 
     async def execute_query(self, sandbox: Sandbox, query: str) -> QueryExecuteResponse:
-        validation = await self.validate_query(query)
+        validation = await self.validate_query(query, sandbox.lesson_id)
 
         if not validation.is_valid:
             raise ValueError(f"Invalid query: {', '.join(validation.errors)}")
@@ -293,8 +495,10 @@ class MockQueryExecutor(IQueryExecutor):
             affected_rows=None if validation.query_type == "SELECT" else 0,
         )
 
-    async def validate_query(self, query: str) -> QueryValidationResult:
-        return self.validator.validate(query)
+    async def validate_query(
+        self, query: str, lesson_id: int | None = None
+    ) -> QueryValidationResult:
+        return self.validator_registry.validate(query, lesson_id)
 
 
 class SandboxService:
@@ -304,31 +508,67 @@ class SandboxService:
         sandbox_manager: ISandboxManager,
         schema_manager: ISchemaManager,
         query_executor: IQueryExecutor,
+        warm_pool: "WarmSandboxPool | None" = None,
+        result_store: "ResultStore | None" = None,
+        verdict_cache: "VerdictCache | None" = None,
+        rate_limiter: RateLimiter | None = None,
+        admission: SandboxAdmission | None = None,
+        metrics: SandboxMetricsCollector | None = None,
     ):
         self.config = config
         self.sandbox_manager = sandbox_manager
         self.schema_manager = schema_manager
         self.query_executor = query_executor
+        self.warm_pool = warm_pool
+        self.result_store = result_store
+        self.verdict_cache = verdict_cache
+        self.rate_limiter = rate_limiter
+        self.admission = admission
+        self.metrics = metrics
 
     async def create_sandbox(self, user_id: int, lesson_id: int) -> Sandbox:
+        start_time = time.perf_counter()
+        sandbox = await self._create_sandbox(user_id, lesson_id)
+        if self.metrics is not None:
+            self.metrics.observe("create", time.perf_counter() - start_time)
+            self.metrics.record_sandbox_created()
+        return sandbox
+
+    async def _create_sandbox(self, user_id: int, lesson_id: int) -> Sandbox:
         if not self.config.enabled:
             raise RuntimeError("Sandbox functionality is not enabled")
 
+        # Sandboxes on a shared schema cost nothing to create; keep warm schemas for others
+        if (
+            self.warm_pool is not None
+            and self.warm_pool.serves(lesson_id)
+            and self.sandbox_manager.get_shared_schema(lesson_id) is None
+        ):
+            warm_schema = self.warm_pool.claim(lesson_id)
+            if warm_schema is not None:
+                try:
+                    sandbox = await self.sandbox_manager.create_sandbox(
+                        user_id, lesson_id, schema_name=warm_schema.schema_name
+                    )
+                except Exception:
+                    self.warm_pool.restore(warm_schema)
+                    raise
+
+                await self._set_status(sandbox, SandboxStatus.ACTIVE)
+                return sandbox
+
         sandbox = await self.sandbox_manager.create_sandbox(user_id, lesson_id)
 
         try:
-            await self.schema_manager.create_schema(sandbox.schema_name)
+            with self._timed("seed"):
+                await self.schema_manager.provision_schema(
+                    schema_name=sandbox.schema_name,
+                    lesson_id=lesson_id,
+                    username=self._get_sandbox_username(sandbox),
+                    password=self._generate_password(),
+                )
 
-            password = self._generate_password()
-            await self.schema_manager.create_sandbox_user(
-                username=self.config.get_sandbox_user(user_id, int(time.time())),
-                password=password,
-                schema_name=sandbox.schema_name,
-            )
-
-            await self.schema_manager.seed_data(sandbox.schema_name, lesson_id)
-
-            sandbox.status = SandboxStatus.ACTIVE
+            await self._set_status(sandbox, SandboxStatus.ACTIVE)
 
         except Exception as e:
             sandbox.status = SandboxStatus.ERROR
@@ -338,6 +578,98 @@ class SandboxService:
         return sandbox
 
     async def execute_query(self, sandbox_id: str, query: str) -> QueryExecuteResponse:
+        result, _ = await self.execute_query_with_cache_key(sandbox_id, query)
+        return result
+
+    async def execute_query_with_cache_key(
+        self, sandbox_id: str, query: str
+    ) -> tuple[QueryExecuteResponse, "VerdictCacheKey | None"]:
+        """
+        Execute the query, also returning the key its result is cached under.
+
+        The key is computed before execution, as a data-modifying query marks the
+        sandbox dirty. It is None when the result cannot be shared (see get_cache_key).
+        """
+        start_time = time.perf_counter()
+        result, cache_key = await self._execute_query(sandbox_id, query)
+        if self.metrics is not None:
+            self.metrics.record_query(time.perf_counter() - start_time)
+        return result, cache_key
+
+    async def _execute_query(
+        self, sandbox_id: str, query: str
+    ) -> tuple[QueryExecuteResponse, "VerdictCacheKey | None"]:
+        sandbox = await self._get_active_sandbox(sandbox_id)
+        await self._check_rate_limit(sandbox)
+        cache_key = await self.get_cache_key(sandbox, query)
+
+        if cache_key is not None and self.verdict_cache is not None:
+            cached = self.verdict_cache.get(cache_key)
+            if cached is not None:
+                await self.sandbox_manager.update_sandbox_access(sandbox_id)
+                return cached.result, cache_key
+
+        async with self._admit(sandbox):
+            result = await self.query_executor.execute_query(sandbox, query)
+
+        if cache_key is not None and self.verdict_cache is not None:
+            self.verdict_cache.put(cache_key, result)
+
+        await self.sandbox_manager.update_sandbox_access(sandbox_id)
+
+        return result, cache_key
+
+    async def get_cache_key(self, sandbox: Sandbox, query: str) -> "VerdictCacheKey | None":
+        """
+        Key under which the query's result is shared between sandboxes of the lesson.
+
+        Marks the sandbox dirty when the query may modify data, which is any statement
+        but a plain SELECT (MySQL allows WITH ... UPDATE), unless the lesson rolls the
+        statement back. Returns None when the result cannot be shared: caching is off,
+        the sandbox has modified its data, the query is not a plain SELECT or calls a
+        non-deterministic function such as NOW(), or the lesson's template version is
+        unknown.
+        """
+        validation = await self.query_executor.validate_query(query, sandbox.lesson_id)
+        policy = self.query_executor.validator_registry.get_policy(sandbox.lesson_id)
+        rolled_back = (
+            policy.rollback_dml and validation.query_type in ValidatorRegistry.ROLLED_BACK_TYPES
+        )
+        if (
+            validation.is_valid
+            and validation.query_type != "SELECT"
+            and not rolled_back
+            and not sandbox.is_dirty
+        ):
+            sandbox.is_dirty = True
+            await self.sandbox_manager.mark_sandbox_dirty(sandbox.sandbox_id)
+
+        if self.verdict_cache is None or sandbox.is_dirty:
+            return None
+        if not validation.is_valid or validation.query_type != "SELECT":
+            return None
+        if not is_deterministic(query):
+            return None
+
+        template_version = self.schema_manager.get_template_version(sandbox.lesson_id)
+        if template_version is None:
+            return None
+
+        return self.verdict_cache.make_key(sandbox.lesson_id, template_version, query)
+
+    async def stream_query(self, sandbox_id: str, query: str) -> AsyncIterator[QueryStreamFrame]:
+        sandbox = await self._get_active_sandbox(sandbox_id)
+        await self._check_rate_limit(sandbox)
+        # Streamed results are not cached, but DML still marks the sandbox dirty
+        await self.get_cache_key(sandbox, query)
+
+        async with self._admit(sandbox):
+            async for frame in self.query_executor.stream_query(sandbox, query):
+                yield frame
+
+        await self.sandbox_manager.update_sandbox_access(sandbox_id)
+
+    async def _get_active_sandbox(self, sandbox_id: str) -> Sandbox:
         if not self.config.enabled:
             raise RuntimeError("Sandbox functionality is not enabled")
 
@@ -349,14 +681,27 @@ class SandboxService:
             raise ValueError(f"Sandbox {sandbox_id} is not active (status: {sandbox.status})")
 
         if sandbox.is_expired():
-            sandbox.status = SandboxStatus.EXPIRED
+            await self._set_status(sandbox, SandboxStatus.EXPIRED)
             raise ValueError(f"Sandbox {sandbox_id} has expired")
 
-        result = await self.query_executor.execute_query(sandbox, query)
+        return sandbox
 
-        await self.sandbox_manager.update_sandbox_access(sandbox_id)
+    async def _check_rate_limit(self, sandbox: Sandbox) -> None:
+        """Raise RateLimitExceeded if the sandbox owner is over their query rate."""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(sandbox.user_id)
 
-        return result
+    def _timed(self, phase: str) -> AbstractContextManager[None]:
+        """Record the block's duration for a metrics phase, if metrics are collected."""
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.time(phase)
+
+    def _admit(self, sandbox: Sandbox) -> AbstractAsyncContextManager[None]:
+        """Hold one of the sandbox's query slots; raises SandboxBusy when it is saturated."""
+        if self.admission is None:
+            return nullcontext()
+        return self.admission.admit(sandbox.sandbox_id)
 
     async def destroy_sandbox(self, sandbox_id: str) -> None:
         if not self.config.enabled:
@@ -367,19 +712,94 @@ class SandboxService:
             raise ValueError(f"Sandbox {sandbox_id} not found")
 
         try:
-            await self.schema_manager.drop_schema(sandbox.schema_name)
+            with self._timed("destroy"):
+                await self.schema_manager.drop_schema(sandbox.schema_name)
 
-            username = self.config.get_sandbox_user(sandbox.user_id, int(time.time()))
-            await self.schema_manager.drop_sandbox_user(username)
+                await self.schema_manager.drop_sandbox_user(self._get_sandbox_username(sandbox))
 
         finally:
+            if self.result_store is not None:
+                self.result_store.discard_sandbox(sandbox_id)
             await self.sandbox_manager.destroy_sandbox(sandbox_id)
+            if self.metrics is not None:
+                self.metrics.record_sandbox_removed(sandbox.created_at)
 
     async def cleanup_expired(self) -> CleanupResult:
+        """
+        Tear down one batch of expired sandboxes: drop their schemas and users, then
+        remove them from the registry.
+
+        Up to cleanup_concurrency sandboxes are torn down at once. Failed drops are
+        retried with exponential backoff; sandboxes that still fail stay claimed until
+        their lease runs out and are then picked up by a later run.
+        """
         if not self.config.enabled:
             raise RuntimeError("Sandbox functionality is not enabled")
 
-        return await self.sandbox_manager.cleanup_expired_sandboxes()
+        start_time = time.time()
+
+        if self.result_store is not None:
+            self.result_store.discard_expired()
+        if self.rate_limiter is not None:
+            await self.rate_limiter.prune()
+
+        sandboxes = await self.sandbox_manager.claim_expired_sandboxes(
+            limit=self.config.cleanup_batch_size,
+            lease_seconds=self.config.cleanup_lease_seconds,
+        )
+
+        semaphore = asyncio.Semaphore(self.config.cleanup_concurrency)
+
+        async def reap(sandbox: Sandbox) -> tuple[bool, int]:
+            async with semaphore:
+                return await self._teardown(sandbox)
+
+        outcomes = await asyncio.gather(*(reap(sandbox) for sandbox in sandboxes))
+
+        cleaned_ids = [
+            sandbox.sandbox_id
+            for sandbox, (cleaned, _) in zip(sandboxes, outcomes, strict=True)
+            if cleaned
+        ]
+        duration = time.time() - start_time
+
+        return CleanupResult(
+            cleaned_count=len(cleaned_ids),
+            failed_count=len(sandboxes) - len(cleaned_ids),
+            duration=duration,
+            cleaned_sandbox_ids=cleaned_ids,
+            retried_count=sum(retries for _, retries in outcomes),
+            throughput=len(cleaned_ids) / duration if duration > 0 else 0.0,
+        )
+
+    async def _teardown(self, sandbox: Sandbox) -> tuple[bool, int]:
+        """Drop a claimed sandbox's schema, user and record. Returns (success, retries)."""
+        retries = 0
+        while True:
+            try:
+                with self._timed("destroy"):
+                    await self.schema_manager.drop_schema(sandbox.schema_name)
+                    await self.schema_manager.drop_sandbox_user(self._get_sandbox_username(sandbox))
+                if self.result_store is not None:
+                    self.result_store.discard_sandbox(sandbox.sandbox_id)
+                await self.sandbox_manager.destroy_sandbox(sandbox.sandbox_id)
+                if self.metrics is not None:
+                    self.metrics.record_sandbox_removed(sandbox.created_at, expired=True)
+                return True, retries
+            except Exception:
+                if retries + 1 >= self.config.cleanup_max_attempts:
+                    return False, retries
+                await asyncio.sleep(self.config.cleanup_retry_backoff_seconds * 2**retries)
+                retries += 1
+
+    async def _set_status(self, sandbox: Sandbox, status: SandboxStatus) -> None:
+        sandbox.status = status
+        await self.sandbox_manager.set_sandbox_status(sandbox.sandbox_id, status)
+
+    def _get_sandbox_username(self, sandbox: Sandbox) -> str:
+        # Sandbox users share their schema's name (see SandboxConfig.get_sandbox_user), so the
+        # same user is found again on destroy regardless of when it was created.
+        return sandbox.schema_name
 
     def _generate_password(self, length: int = 32) -> str:
         import secrets
@@ -0,0 +1,345 @@
+"""
+Sandbox registry shared across worker processes.
+
+SQLSandboxManager keeps sandbox records in a SQL table instead of process memory,
+so every uvicorn worker sees the same sandboxes and quotas hold across workers.
+Any SQLAlchemy async URL works: a MySQL table in production, or a local SQLite file
+for single-host deployments and tests.
+
+Quota checks are folded into the INSERT (INSERT ... SELECT ... WHERE count < limit),
+so two workers cannot both take the last free slot.
+"""
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from typing import Any, TypeVar
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    case,
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+    update,
+)
+from sqlalchemy.dialects import mysql
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import CleanupResult, SandboxStatus
+from app.services.sandbox import ISandboxManager, Sandbox
+
+T = TypeVar("T")
+
+# Microsecond precision on MySQL, where DATETIME defaults to whole seconds
+_Timestamp = DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+
+metadata = MetaData()
+
+sandboxes_table = Table(
+    "sandbox_registry",
+    metadata,
+    Column("sandbox_id", String(64), primary_key=True),
+    Column("user_id", Integer, nullable=False, index=True),
+    Column("lesson_id", Integer, nullable=False),
+    Column("schema_name", String(64), nullable=False),
+    Column("status", String(16), nullable=False),
+    Column("created_at", _Timestamp, nullable=False),
+    Column("expires_at", _Timestamp, nullable=False, index=True),
+    Column("last_accessed_at", _Timestamp, nullable=False),
+    Column("query_count", Integer, nullable=False, default=0),
+    Column("is_dirty", Boolean, nullable=False, default=False),
+)
+
+# Sandboxes that count towards a user's quota
+_QUOTA_STATUSES = (SandboxStatus.CREATING.value, SandboxStatus.ACTIVE.value)
+
+
+class SQLSandboxManager(ISandboxManager):
+    """
+    ISandboxManager backed by a shared SQL table.
+
+    Returned Sandbox objects are snapshots; changes go through the manager methods.
+    """
+
+    # Attempts for statements that fail on lock contention (MySQL deadlocks,
+    # SQLite "database is locked")
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, config: SandboxConfig, engine: AsyncEngine | None = None):
+        self.config = config
+        self.engine = engine or create_async_engine(config.registry_url, pool_pre_ping=True)
+
+    def is_shared(self) -> bool:
+        return True
+
+    async def initialize(self) -> None:
+        """Create the registry table and its indexes if they do not exist."""
+        async with self.engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+
+    async def close(self) -> None:
+        await self.engine.dispose()
+
+    async def create_sandbox(
+        self, user_id: int, lesson_id: int, schema_name: str | None = None
+    ) -> Sandbox:
+        now = datetime.now(UTC)
+        timestamp = int(time.time())
+        sandbox_id = f"{user_id}_{lesson_id}_{timestamp}"
+        if schema_name is None:
+            schema_name = self.config.get_schema_name(user_id, timestamp)
+
+        sandbox = Sandbox(
+            sandbox_id=sandbox_id,
+            user_id=user_id,
+            lesson_id=lesson_id,
+            schema_name=schema_name,
+            status=SandboxStatus.CREATING,
+            created_at=now,
+            expires_at=now + timedelta(hours=self.config.max_lifetime_hours),
+            last_accessed_at=now,
+            query_count=0,
+        )
+
+        values = _to_row(sandbox)
+        user_count = (
+            select(func.count())
+            .select_from(sandboxes_table)
+            .where(
+                sandboxes_table.c.user_id == user_id,
+                sandboxes_table.c.status.in_(_QUOTA_STATUSES),
+            )
+            .scalar_subquery()
+        )
+        total_count = select(func.count()).select_from(sandboxes_table).scalar_subquery()
+
+        # Insert only if both quotas still have room when the row is written
+        statement = insert(sandboxes_table).from_select(
+            list(values),
+            select(
+                *(literal(value, sandboxes_table.c[name].type) for name, value in values.items())
+            )
+            .where(user_count < self.config.max_sandboxes_per_user)
+            .where(total_count < self.config.max_active_sandboxes),
+        )
+
+        result = await self._execute(statement)
+        if result.rowcount != 1:
+            await self._raise_quota_error(user_id)
+
+        return sandbox
+
+    async def get_sandbox(self, sandbox_id: str) -> Sandbox | None:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(sandboxes_table).where(sandboxes_table.c.sandbox_id == sandbox_id)
+            )
+            row = result.mappings().first()
+        return _from_row(row) if row is not None else None
+
+    async def get_user_sandboxes(self, user_id: int) -> list[Sandbox]:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(sandboxes_table)
+                .where(sandboxes_table.c.user_id == user_id)
+                .order_by(sandboxes_table.c.created_at)
+            )
+            return [_from_row(row) for row in result.mappings()]
+
+    async def get_schema_names(self) -> set[str]:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(select(sandboxes_table.c.schema_name))
+            return set(result.scalars())
+
+    async def count_sandboxes(self) -> int:
+        async with self.engine.connect() as conn:
+            count = await conn.scalar(select(func.count()).select_from(sandboxes_table))
+        return count or 0
+
+    async def destroy_sandbox(self, sandbox_id: str) -> None:
+        await self._execute(
+            delete(sandboxes_table).where(sandboxes_table.c.sandbox_id == sandbox_id)
+        )
+
+    async def cleanup_expired_sandboxes(self) -> CleanupResult:
+        start_time = time.time()
+        now = datetime.now(UTC)
+
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(sandboxes_table.c.sandbox_id)
+                .where(
+                    sandboxes_table.c.expires_at <= _to_db_time(now),
+                    sandboxes_table.c.status == SandboxStatus.ACTIVE.value,
+                )
+                .order_by(sandboxes_table.c.expires_at)
+                .limit(self.config.cleanup_batch_size)
+            )
+            expired_ids = list(result.scalars())
+
+        cleaned_ids = []
+        failed_count = 0
+
+        for sandbox_id in expired_ids:
+            try:
+                await self.destroy_sandbox(sandbox_id)
+                cleaned_ids.append(sandbox_id)
+            except Exception:
+                failed_count += 1
+
+        duration = time.time() - start_time
+
+        return CleanupResult(
+            cleaned_count=len(cleaned_ids),
+            failed_count=failed_count,
+            duration=duration,
+            cleaned_sandbox_ids=cleaned_ids,
+        )
+
+    async def update_sandbox_access(self, sandbox_id: str) -> None:
+        now = datetime.now(UTC)
+        new_expires = _to_db_time(now + timedelta(minutes=self.config.idle_timeout_minutes))
+        expires_at = sandboxes_table.c.expires_at
+
+        await self._execute(
+            update(sandboxes_table)
+            .where(sandboxes_table.c.sandbox_id == sandbox_id)
+            .values(
+                last_accessed_at=_to_db_time(now),
+                query_count=sandboxes_table.c.query_count + 1,
+                expires_at=case((expires_at > new_expires, new_expires), else_=expires_at),
+            )
+        )
+
+    async def set_sandbox_status(self, sandbox_id: str, status: SandboxStatus) -> None:
+        await self._execute(
+            update(sandboxes_table)
+            .where(sandboxes_table.c.sandbox_id == sandbox_id)
+            .values(status=status.value)
+        )
+
+    async def claim_expired_sandboxes(self, limit: int, lease_seconds: float) -> list[Sandbox]:
+        now = _to_db_time(datetime.now(UTC))
+        lease_until = _to_db_time(datetime.now(UTC) + timedelta(seconds=lease_seconds))
+
+        async def claim(conn: AsyncConnection) -> list[Sandbox]:
+            result = await conn.execute(
+                select(sandboxes_table.c.sandbox_id)
+                .where(sandboxes_table.c.expires_at <= now)
+                .order_by(sandboxes_table.c.expires_at)
+                .limit(limit)
+            )
+            candidate_ids = list(result.scalars())
+
+            # The expiry condition is re-checked per row, so a sandbox another worker
+            # claimed in the meantime is skipped
+            claimed_ids = []
+            for sandbox_id in candidate_ids:
+                result = await conn.execute(
+                    update(sandboxes_table)
+                    .where(
+                        sandboxes_table.c.sandbox_id == sandbox_id,
+                        sandboxes_table.c.expires_at <= now,
+                    )
+                    .values(status=SandboxStatus.EXPIRED.value, expires_at=lease_until)
+                )
+                if result.rowcount == 1:
+                    claimed_ids.append(sandbox_id)
+
+            if not claimed_ids:
+                return []
+            result = await conn.execute(
+                select(sandboxes_table).where(sandboxes_table.c.sandbox_id.in_(claimed_ids))
+            )
+            by_id = {row["sandbox_id"]: _from_row(row) for row in result.mappings()}
+            return [by_id[sandbox_id] for sandbox_id in claimed_ids]
+
+        return await self._in_transaction(claim)
+
+    async def mark_sandbox_dirty(self, sandbox_id: str) -> None:
+        await self._execute(
+            update(sandboxes_table)
+            .where(sandboxes_table.c.sandbox_id == sandbox_id)
+            .values(is_dirty=True)
+        )
+
+    async def _execute(self, statement: Any) -> Any:
+        return await self._in_transaction(lambda conn: conn.execute(statement))
+
+    async def _in_transaction(self, work: Callable[[AsyncConnection], Awaitable[T]]) -> T:
+        attempt = 1
+        while True:
+            try:
+                async with self.engine.begin() as conn:
+                    return await work(conn)
+            except OperationalError:
+                if attempt >= self.MAX_ATTEMPTS:
+                    raise
+                await asyncio.sleep(0.01 * attempt)
+                attempt += 1
+
+    async def _raise_quota_error(self, user_id: int) -> None:
+        async with self.engine.connect() as conn:
+            user_count = await conn.scalar(
+                select(func.count())
+                .select_from(sandboxes_table)
+                .where(
+                    sandboxes_table.c.user_id == user_id,
+                    sandboxes_table.c.status.in_(_QUOTA_STATUSES),
+                )
+            )
+
+        if user_count >= self.config.max_sandboxes_per_user:
+            raise ValueError(
+                f"User has reached maximum of {self.config.max_sandboxes_per_user} active sandboxes"
+            )
+        raise ValueError(
+            f"System has reached maximum of {self.config.max_active_sandboxes} active sandboxes"
+        )
+
+
+def _to_db_time(value: datetime) -> datetime:
+    """Store timestamps as naive UTC, which both MySQL DATETIME and SQLite accept."""
+    return value.astimezone(UTC).replace(tzinfo=None)
+
+
+def _to_row(sandbox: Sandbox) -> dict[str, Any]:
+    return {
+        "sandbox_id": sandbox.sandbox_id,
+        "user_id": sandbox.user_id,
+        "lesson_id": sandbox.lesson_id,
+        "schema_name": sandbox.schema_name,
+        "status": sandbox.status.value,
+        "created_at": _to_db_time(sandbox.created_at),
+        "expires_at": _to_db_time(sandbox.expires_at),
+        "last_accessed_at": _to_db_time(sandbox.last_accessed_at),
+        "query_count": sandbox.query_count,
+        "is_dirty": sandbox.is_dirty,
+    }
+
+
+def _from_row(row: Any) -> Sandbox:
+    return Sandbox(
+        sandbox_id=row["sandbox_id"],
+        user_id=row["user_id"],
+        lesson_id=row["lesson_id"],
+        schema_name=row["schema_name"],
+        status=SandboxStatus(row["status"]),
+        created_at=row["created_at"].replace(tzinfo=UTC),
+        expires_at=row["expires_at"].replace(tzinfo=UTC),
+        last_accessed_at=row["last_accessed_at"].replace(tzinfo=UTC),
+        query_count=row["query_count"],
+        is_dirty=bool(row["is_dirty"]),
+    )
@@ -2,12 +2,73 @@
 MySQL Schema Manager for sandbox database operations.
 """
 
-from typing import Any
+import asyncio
+import hashlib
 
 import aiomysql
+from pymysql.constants import CLIENT
 
 from app.core.sandbox_config import SandboxConfig
-from app.services.sandbox import ISchemaManager
+from app.services.connection_pool import SandboxConnectionPool
+from app.services.sandbox import ISchemaManager, SchemaInfo
+
+# Fixture SQL per lesson, used to build lesson template schemas
+LESSON_FIXTURES: dict[int, str] = {
+    1: """
+        CREATE TABLE IF NOT EXISTS employees (
+            id INT PRIMARY KEY,
+            name VARCHAR(100),
+            department VARCHAR(50),
+            salary DECIMAL(10, 2)
+        );
+
+        INSERT INTO employees (id, name, department, salary) VALUES
+        (1, 'John Doe', 'Engineering', 75000.00),
+        (2, 'Jane Smith', 'Marketing', 65000.00),
+        (3, 'Bob Johnson', 'Engineering', 80000.00),
+        (4, 'Alice Brown', 'HR', 60000.00),
+        (5, 'Charlie Wilson', 'Engineering', 90000.00);
+    """,
+    2: """
+        CREATE TABLE IF NOT EXISTS products (
+            id INT PRIMARY KEY,
+            name VARCHAR(100),
+            category VARCHAR(50),
+            price DECIMAL(10, 2),
+            stock INT
+        );
+
+        INSERT INTO products (id, name, category, price, stock) VALUES
+        (1, 'Laptop', 'Electronics', 999.99, 50),
+        (2, 'Mouse', 'Electronics', 29.99, 200),
+        (3, 'Desk', 'Furniture', 299.99, 30),
+        (4, 'Chair', 'Furniture', 199.99, 45),
+        (5, 'Monitor', 'Electronics', 399.99, 75);
+    """,
+}
+
+
+def get_fixture_version(lesson_id: int) -> str | None:
+    """Version of a lesson's fixture data: a digest of its fixture SQL."""
+    fixture_sql = LESSON_FIXTURES.get(lesson_id)
+    if fixture_sql is None:
+        return None
+    return hashlib.blake2b(fixture_sql.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def create_admin_pool(config: SandboxConfig) -> SandboxConnectionPool:
+    """
+    Create the pool used for schema management.
+
+    Admin connections allow multi-statement batches so that provisioning can be
+    sent in a single round-trip. Learner queries never run on this pool.
+    """
+    return SandboxConnectionPool(
+        config,
+        min_size=config.admin_pool_min_size,
+        max_size=config.admin_pool_max_size,
+        client_flag=CLIENT.MULTI_STATEMENTS,
+    )
 
 
 class MySQLSchemaManager(ISchemaManager):
@@ -18,52 +79,243 @@ class MySQLSchemaManager(ISchemaManager):
     - Managing sandbox users
     """
 
-    def __init__(self, config: SandboxConfig):
+    def __init__(self, config: SandboxConfig, pool: SandboxConnectionPool | None = None):
         self.config = config
+        self.pool = pool or create_admin_pool(config)
+        self._template_tables: dict[int, list[str]] = {}
+        self._template_locks: dict[int, asyncio.Lock] = {}
 
     async def create_schema(self, schema_name: str) -> None:
         """Create a new sandbox schema."""
-        conn = await self._get_admin_connection()
-        try:
+        async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
-                # Create schema
                 await cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{schema_name}`")
-        finally:
-            conn.close()
 
     async def seed_data(self, schema_name: str, lesson_id: int) -> None:
         """
         Seed fixture data for a specific lesson.
-        Looks for fixture SQL in lesson_fixtures table or uses template schemas.
+        Clones the lesson template schema when available, otherwise replays the fixture SQL.
+        """
+        statements = await self._get_seed_statements(schema_name, lesson_id)
+        if not statements:
+            return
+
+        async with self.pool.acquire(schema_name) as conn:
+            await self._execute_batch(conn, statements)
+
+    async def provision_schema(
+        self, schema_name: str, lesson_id: int, username: str, password: str
+    ) -> None:
+        """
+        Create schema, sandbox user, grants and fixture data in one round-trip
+        on a single admin connection.
+        """
+        seed_statements = await self._get_seed_statements(schema_name, lesson_id)
+
+        async with self.pool.acquire() as conn:
+            await self._execute_batch(
+                conn,
+                [
+                    f"CREATE DATABASE IF NOT EXISTS `{schema_name}`",
+                    *self._sandbox_user_statements(conn, username, password, schema_name),
+                    f"USE `{schema_name}`",
+                    *seed_statements,
+                ],
+            )
+
+    async def build_template(self, lesson_id: int, force: bool = True) -> list[str]:
         """
-        conn = await self._get_admin_connection(database=schema_name)
+        (Re)build the template schema for a lesson from its fixture SQL.
+
+        The fixture is loaded into a staging schema whose tables then replace the
+        template's in a single RENAME TABLE, so sandboxes cloning or sharing the
+        template never see it half-built. Builds of a template are serialised across
+        workers with GET_LOCK.
+
+        Args:
+            lesson_id: Lesson whose template to build
+            force: Rebuild even if the template matches the current fixture version
+
+        Returns:
+            Names of the tables in the template schema
+        """
+        template_name = self.config.get_template_schema_name(lesson_id)
+        version = self.get_template_version(lesson_id)
+
+        async with self.pool.acquire() as conn:
+            await self._lock_template(conn, template_name)
+            try:
+                if not force:
+                    # Another worker may have built it while this one waited
+                    tables = await self._get_template_tables(conn, template_name)
+                    if tables and await self._get_built_version(conn, template_name) == version:
+                        self._template_tables[lesson_id] = tables
+                        return tables
+
+                tables = await self._swap_in_template(conn, lesson_id, template_name, version)
+            finally:
+                await self._unlock_template(conn, template_name)
+
+        self._template_tables[lesson_id] = tables
+        return tables
+
+    async def _swap_in_template(
+        self,
+        conn: aiomysql.Connection,
+        lesson_id: int,
+        template_name: str,
+        version: str | None,
+    ) -> list[str]:
+        """Load the fixture into a staging schema, then move its tables into the template."""
+        fixture_sql = await self._get_lesson_fixture(lesson_id)
+        staging_name = f"{template_name}_staging"
+        retired_name = f"{template_name}_retired"
+
+        statements = [
+            f"DROP DATABASE IF EXISTS `{staging_name}`",
+            f"CREATE DATABASE `{staging_name}`",
+        ]
+        if fixture_sql:
+            statements.append(f"USE `{staging_name}`")
+            statements.extend(self._split_sql_statements(fixture_sql))
+        await self._execute_batch(conn, statements)
+
+        tables = await self._get_template_tables(conn, staging_name)
+        renames = [
+            f"`{template_name}`.`{table}` TO `{retired_name}`.`{table}`"
+            for table in await self._get_template_tables(conn, template_name)
+        ] + [f"`{staging_name}`.`{table}` TO `{template_name}`.`{table}`" for table in tables]
+
+        # The template schema itself stays, so shared sandboxes keep their schema
+        statements = [
+            f"CREATE DATABASE IF NOT EXISTS `{template_name}`",
+            f"DROP DATABASE IF EXISTS `{retired_name}`",
+            f"CREATE DATABASE `{retired_name}`",
+        ]
+        if renames:
+            statements.append("RENAME TABLE " + ", ".join(renames))
+        statements += [
+            f"DROP DATABASE `{retired_name}`",
+            f"DROP DATABASE `{staging_name}`",
+        ]
+        if version is not None:
+            versions_schema = self.config.template_versions_schema
+            statements += [
+                f"CREATE DATABASE IF NOT EXISTS `{versions_schema}`",
+                f"CREATE TABLE IF NOT EXISTS `{versions_schema}`.`template_versions` ("
+                "template_name VARCHAR(64) PRIMARY KEY, fixture_version VARCHAR(32) NOT NULL)",
+                f"INSERT INTO `{versions_schema}`.`template_versions` VALUES "
+                f"({conn.escape(template_name)}, {conn.escape(version)}) "
+                "ON DUPLICATE KEY UPDATE fixture_version = VALUES(fixture_version)",
+            ]
+        await self._execute_batch(conn, statements)
+        return tables
+
+    async def _lock_template(self, conn: aiomysql.Connection, template_name: str) -> None:
+        timeout = self.config.template_build_lock_timeout_seconds
+        async with conn.cursor() as cursor:
+            await cursor.execute("SELECT GET_LOCK(%s, %s)", (f"template:{template_name}", timeout))
+            (acquired,) = await cursor.fetchone()
+        if acquired != 1:
+            raise TimeoutError(
+                f"Template {template_name} is still being built by another worker after "
+                f"{timeout} seconds"
+            )
+
+    async def _unlock_template(self, conn: aiomysql.Connection, template_name: str) -> None:
+        async with conn.cursor() as cursor:
+            await cursor.execute("DO RELEASE_LOCK(%s)", (f"template:{template_name}",))
+
+    async def ensure_template(self, lesson_id: int) -> None:
+        """Build the lesson's template schema unless an up-to-date one already exists."""
+        await self._ensure_template(lesson_id)
+
+    async def _ensure_template(self, lesson_id: int) -> list[str]:
+        """Get the template's tables, (re)building the template on first use."""
+        if lesson_id in self._template_tables:
+            return self._template_tables[lesson_id]
+
+        lock = self._template_locks.setdefault(lesson_id, asyncio.Lock())
+        async with lock:
+            if lesson_id in self._template_tables:
+                return self._template_tables[lesson_id]
+
+            template_name = self.config.get_template_schema_name(lesson_id)
+            async with self.pool.acquire() as conn:
+                tables = await self._get_template_tables(conn, template_name)
+                version = await self._get_built_version(conn, template_name)
+
+            # Missing, or built from an older version of the fixture
+            if not tables or version != self.get_template_version(lesson_id):
+                return await self.build_template(lesson_id, force=False)
+
+            self._template_tables[lesson_id] = tables
+            return tables
+
+    async def _get_template_tables(
+        self, conn: aiomysql.Connection, template_name: str
+    ) -> list[str]:
+        async with conn.cursor() as cursor:
+            await cursor.execute(
+                """
+                SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES
+                WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'
+                ORDER BY TABLE_NAME
+                """,
+                (template_name,),
+            )
+            return [row[0] for row in await cursor.fetchall()]
+
+    async def _get_built_version(self, conn: aiomysql.Connection, template_name: str) -> str | None:
+        """Fixture version the template was last built from, or None if not recorded."""
         try:
-            # Get fixture data for the lesson
-            fixture_sql = await self._get_lesson_fixture(lesson_id)
-
-            if fixture_sql:
-                async with conn.cursor() as cursor:
-                    # Execute fixture SQL (can contain multiple statements)
-                    statements = self._split_sql_statements(fixture_sql)
-                    for statement in statements:
-                        if statement.strip():
-                            await cursor.execute(statement)
-        finally:
-            conn.close()
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    f"SELECT fixture_version FROM "
+                    f"`{self.config.template_versions_schema}`.`template_versions` "
+                    "WHERE template_name = %s",
+                    (template_name,),
+                )
+                row = await cursor.fetchone()
+        except aiomysql.ProgrammingError:
+            # No template has been built with a recorded version yet
+            return None
+        return row[0] if row else None
+
+    async def _get_seed_statements(self, schema_name: str, lesson_id: int) -> list[str]:
+        """
+        Statements that seed a schema for a lesson.
+
+        With templates enabled this is two statements per table (CREATE TABLE ... LIKE and
+        INSERT ... SELECT), independent of how many statements the fixture contains.
+        """
+        fixture_sql = await self._get_lesson_fixture(lesson_id)
+        if not fixture_sql:
+            return []
+
+        if not self.config.use_template_schemas:
+            return self._split_sql_statements(fixture_sql)
+
+        template_name = self.config.get_template_schema_name(lesson_id)
+        statements = []
+        for table in await self._ensure_template(lesson_id):
+            statements.append(
+                f"CREATE TABLE `{schema_name}`.`{table}` LIKE `{template_name}`.`{table}`"
+            )
+            statements.append(
+                f"INSERT INTO `{schema_name}`.`{table}` SELECT * FROM `{template_name}`.`{table}`"
+            )
+        return statements
 
     async def drop_schema(self, schema_name: str) -> None:
         """Drop a sandbox schema."""
-        conn = await self._get_admin_connection()
-        try:
+        async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
                 await cursor.execute(f"DROP DATABASE IF EXISTS `{schema_name}`")
-        finally:
-            conn.close()
 
     async def schema_exists(self, schema_name: str) -> bool:
         """Check if a schema exists."""
-        conn = await self._get_admin_connection()
-        try:
+        async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
                 await cursor.execute(
                     "SELECT SCHEMA_NAME FROM INFORMATION_SCHEMA.SCHEMATA WHERE SCHEMA_NAME = %s",
@@ -71,13 +323,10 @@ class MySQLSchemaManager(ISchemaManager):
                 )
                 result = await cursor.fetchone()
                 return result is not None
-        finally:
-            conn.close()
 
     async def get_schema_size(self, schema_name: str) -> int:
         """Get the size of a schema in bytes."""
-        conn = await self._get_admin_connection()
-        try:
+        async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
                 await cursor.execute(
                     """
@@ -89,48 +338,84 @@ class MySQLSchemaManager(ISchemaManager):
                 )
                 result = await cursor.fetchone()
                 return int(result[0]) if result and result[0] else 0
-        finally:
-            conn.close()
 
-    async def create_sandbox_user(self, username: str, password: str, schema_name: str) -> None:
-        """Create a sandbox user with limited privileges."""
-        conn = await self._get_admin_connection()
-        try:
+    async def list_sandbox_schemas(self) -> list[SchemaInfo]:
+        """List sandbox schemas with their size and age in a single query."""
+        # Escape LIKE wildcards; the default prefix contains underscores
+        pattern = (
+            self.config.schema_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            + "%"
+        )
+        async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
-                # Create user
                 await cursor.execute(
-                    f"CREATE USER IF NOT EXISTS '{username}'@'%' IDENTIFIED BY %s", (password,)
+                    """
+                    SELECT s.SCHEMA_NAME,
+                           COALESCE(SUM(t.DATA_LENGTH + t.INDEX_LENGTH), 0) AS size,
+                           TIMESTAMPDIFF(SECOND, MIN(t.CREATE_TIME), NOW()) AS age
+                    FROM INFORMATION_SCHEMA.SCHEMATA s
+                    LEFT JOIN INFORMATION_SCHEMA.TABLES t ON t.TABLE_SCHEMA = s.SCHEMA_NAME
+                    WHERE s.SCHEMA_NAME LIKE %s
+                    GROUP BY s.SCHEMA_NAME
+                    """,
+                    (pattern,),
                 )
+                rows = await cursor.fetchall()
 
-                # Grant privileges only on the sandbox schema
-                await cursor.execute(
-                    f"GRANT SELECT, INSERT, UPDATE, DELETE ON `{schema_name}`.* TO '{username}'@'%'"
-                )
+        return [
+            SchemaInfo(
+                schema_name=name,
+                size_bytes=int(size),
+                age_seconds=int(age) if age is not None else None,
+            )
+            for name, size, age in rows
+        ]
 
-                await cursor.execute("FLUSH PRIVILEGES")
-        finally:
-            conn.close()
+    async def create_sandbox_user(self, username: str, password: str, schema_name: str) -> None:
+        """Create a sandbox user with limited privileges."""
+        async with self.pool.acquire() as conn:
+            await self._execute_batch(
+                conn, self._sandbox_user_statements(conn, username, password, schema_name)
+            )
 
     async def drop_sandbox_user(self, username: str) -> None:
         """Drop a sandbox user."""
-        conn = await self._get_admin_connection()
-        try:
+        async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
                 await cursor.execute(f"DROP USER IF EXISTS '{username}'@'%'")
-                await cursor.execute("FLUSH PRIVILEGES")
-        finally:
-            conn.close()
-
-    async def _get_admin_connection(self, database: str | None = None) -> aiomysql.Connection:
-        """Get admin connection to MySQL."""
-        return await aiomysql.connect(
-            host=self.config.mysql_host,
-            port=self.config.mysql_port,
-            user=self.config.mysql_admin_user,
-            password=self.config.mysql_admin_password,
-            db=database,
-            autocommit=True,
+
+    async def close(self) -> None:
+        """Close the admin connection pool."""
+        await self.pool.close()
+
+    def _sandbox_user_statements(
+        self, conn: aiomysql.Connection, username: str, password: str, schema_name: str
+    ) -> list[str]:
+        """
+        Build statements creating a sandbox user limited to its own schema.
+        CREATE USER and GRANT take effect immediately, so no FLUSH PRIVILEGES is needed.
+        """
+        return [
+            f"CREATE USER IF NOT EXISTS '{username}'@'%' IDENTIFIED BY {conn.escape(password)}",
+            f"GRANT SELECT, INSERT, UPDATE, DELETE ON `{schema_name}`.* TO '{username}'@'%'",
+        ]
+
+    async def _execute_batch(self, conn: aiomysql.Connection, statements: list[str]) -> None:
+        """Send statements as one multi-statement batch and drain every result set."""
+        batch = ";\n".join(
+            statement.strip().rstrip(";") for statement in statements if statement.strip()
         )
+        if not batch:
+            return
+
+        async with conn.cursor() as cursor:
+            await cursor.execute(batch)
+            while await cursor.nextset():
+                pass
+
+    def get_template_version(self, lesson_id: int) -> str | None:
+        """Version of a lesson's template data: a digest of its fixture SQL."""
+        return get_fixture_version(lesson_id)
 
     async def _get_lesson_fixture(self, lesson_id: int) -> str | None:
         """
@@ -139,41 +424,7 @@ class MySQLSchemaManager(ISchemaManager):
         """
         # For now, return basic fixture data
         # In production, this would query a lesson_fixtures table
-        fixtures = {
-            1: """
-                CREATE TABLE IF NOT EXISTS employees (
-                    id INT PRIMARY KEY,
-                    name VARCHAR(100),
-                    department VARCHAR(50),
-                    salary DECIMAL(10, 2)
-                );
-
-                INSERT INTO employees (id, name, department, salary) VALUES
-                (1, 'John Doe', 'Engineering', 75000.00),
-                (2, 'Jane Smith', 'Marketing', 65000.00),
-                (3, 'Bob Johnson', 'Engineering', 80000.00),
-                (4, 'Alice Brown', 'HR', 60000.00),
-                (5, 'Charlie Wilson', 'Engineering', 90000.00);
-            """,
-            2: """
-                CREATE TABLE IF NOT EXISTS products (
-                    id INT PRIMARY KEY,
-                    name VARCHAR(100),
-                    category VARCHAR(50),
-                    price DECIMAL(10, 2),
-                    stock INT
-                );
-
-                INSERT INTO products (id, name, category, price, stock) VALUES
-                (1, 'Laptop', 'Electronics', 999.99, 50),
-                (2, 'Mouse', 'Electronics', 29.99, 200),
-                (3, 'Desk', 'Furniture', 299.99, 30),
-                (4, 'Chair', 'Furniture', 199.99, 45),
-                (5, 'Monitor', 'Electronics', 399.99, 75);
-            """,
-        }
-
-        return fixtures.get(lesson_id)
+        return LESSON_FIXTURES.get(lesson_id)
 
     def _split_sql_statements(self, sql: str) -> list[str]:
         """Split SQL into individual statements."""
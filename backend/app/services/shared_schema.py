@@ -0,0 +1,149 @@
+"""
+Shared schemas for lessons whose queries cannot change the lesson data.
+
+A lesson whose query policy allows nothing but SELECT, or rolls back every data
+modification (LessonQueryPolicy.rollback_dml), leaves its data as seeded, so its
+learners do not need private copies of it. SharedSchemaSandboxManager places
+the sandboxes of such lessons on the lesson's template schema, and
+SharedSchemaManager turns provisioning and teardown of that schema into no-ops
+beyond building the template once. Creating a sandbox for these lessons then
+only writes a registry record.
+
+Queries on a shared schema run inside START TRANSACTION READ ONLY (see
+MySQLQueryExecutor), so MySQL rejects row changes even if a policy changes while
+sandboxes are live. Data modification in rollback lessons runs in a read-write
+transaction instead, which is rolled back without ever committing.
+
+Neither transaction stops a statement that commits implicitly (RENAME TABLE,
+LOCK TABLES, DDL) or a stacked COMMIT. The validator therefore rejects stacked
+and unclassified statements, the executor refuses anything but SELECT and
+rolled-back data modification on a template schema, and the connection is
+switched to single-statement mode for the checkout (see
+SandboxConnectionPool.acquire).
+
+Both classes wrap the regular managers and are enabled together with
+SANDBOX_SHARED_SCHEMAS_ENABLED.
+"""
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import CleanupResult, SandboxStatus
+from app.services.query_validator import ValidatorRegistry
+from app.services.sandbox import ISandboxManager, ISchemaManager, Sandbox, SchemaInfo
+
+
+class SharedSchemaSandboxManager(ISandboxManager):
+    """Registers sandboxes of lessons that leave their data unchanged on the template schema."""
+
+    def __init__(
+        self,
+        config: SandboxConfig,
+        sandbox_manager: ISandboxManager,
+        validator_registry: ValidatorRegistry,
+    ):
+        self.config = config
+        self.sandbox_manager = sandbox_manager
+        self.validator_registry = validator_registry
+
+    def get_shared_schema(self, lesson_id: int) -> str | None:
+        if not self.validator_registry.leaves_data_unchanged(lesson_id):
+            return None
+        return self.config.get_template_schema_name(lesson_id)
+
+    def is_shared(self) -> bool:
+        return self.sandbox_manager.is_shared()
+
+    async def create_sandbox(
+        self, user_id: int, lesson_id: int, schema_name: str | None = None
+    ) -> Sandbox:
+        if schema_name is None:
+            schema_name = self.get_shared_schema(lesson_id)
+        return await self.sandbox_manager.create_sandbox(user_id, lesson_id, schema_name)
+
+    async def get_sandbox(self, sandbox_id: str) -> Sandbox | None:
+        return await self.sandbox_manager.get_sandbox(sandbox_id)
+
+    async def get_user_sandboxes(self, user_id: int) -> list[Sandbox]:
+        return await self.sandbox_manager.get_user_sandboxes(user_id)
+
+    async def get_schema_names(self) -> set[str]:
+        return await self.sandbox_manager.get_schema_names()
+
+    async def count_sandboxes(self) -> int:
+        return await self.sandbox_manager.count_sandboxes()
+
+    async def destroy_sandbox(self, sandbox_id: str) -> None:
+        await self.sandbox_manager.destroy_sandbox(sandbox_id)
+
+    async def cleanup_expired_sandboxes(self) -> CleanupResult:
+        return await self.sandbox_manager.cleanup_expired_sandboxes()
+
+    async def update_sandbox_access(self, sandbox_id: str) -> None:
+        await self.sandbox_manager.update_sandbox_access(sandbox_id)
+
+    async def set_sandbox_status(self, sandbox_id: str, status: SandboxStatus) -> None:
+        await self.sandbox_manager.set_sandbox_status(sandbox_id, status)
+
+    async def claim_expired_sandboxes(self, limit: int, lease_seconds: float) -> list[Sandbox]:
+        return await self.sandbox_manager.claim_expired_sandboxes(limit, lease_seconds)
+
+    async def mark_sandbox_dirty(self, sandbox_id: str) -> None:
+        await self.sandbox_manager.mark_sandbox_dirty(sandbox_id)
+
+
+class SharedSchemaManager(ISchemaManager):
+    """
+    Provisions shared template schemas once and never drops them on sandbox teardown.
+
+    Sandboxes on a shared schema have no user of their own: the sandbox username is
+    the schema name, so dropping it is skipped along with the schema.
+    """
+
+    def __init__(self, config: SandboxConfig, schema_manager: ISchemaManager):
+        self.config = config
+        self.schema_manager = schema_manager
+        # Lessons whose template schema is known to exist
+        self._ready: set[int] = set()
+
+    async def provision_schema(
+        self, schema_name: str, lesson_id: int, username: str, password: str
+    ) -> None:
+        if not self.config.is_template_schema(schema_name):
+            await self.schema_manager.provision_schema(schema_name, lesson_id, username, password)
+            return
+
+        if lesson_id not in self._ready:
+            await self.schema_manager.ensure_template(lesson_id)
+            self._ready.add(lesson_id)
+
+    async def ensure_template(self, lesson_id: int) -> None:
+        await self.schema_manager.ensure_template(lesson_id)
+        self._ready.add(lesson_id)
+
+    async def create_schema(self, schema_name: str) -> None:
+        await self.schema_manager.create_schema(schema_name)
+
+    async def seed_data(self, schema_name: str, lesson_id: int) -> None:
+        await self.schema_manager.seed_data(schema_name, lesson_id)
+
+    async def drop_schema(self, schema_name: str) -> None:
+        if not self.config.is_template_schema(schema_name):
+            await self.schema_manager.drop_schema(schema_name)
+
+    async def schema_exists(self, schema_name: str) -> bool:
+        return await self.schema_manager.schema_exists(schema_name)
+
+    async def get_schema_size(self, schema_name: str) -> int:
+        return await self.schema_manager.get_schema_size(schema_name)
+
+    async def create_sandbox_user(self, username: str, password: str, schema_name: str) -> None:
+        await self.schema_manager.create_sandbox_user(username, password, schema_name)
+
+    async def drop_sandbox_user(self, username: str) -> None:
+        if not self.config.is_template_schema(username):
+            await self.schema_manager.drop_sandbox_user(username)
+
+    async def list_sandbox_schemas(self) -> list[SchemaInfo]:
+        return await self.schema_manager.list_sandbox_schemas()
+
+    def get_template_version(self, lesson_id: int) -> str | None:
+        return self.schema_manager.get_template_version(lesson_id)
@@ -0,0 +1,86 @@
+"""
+Single-pass SQL tokenizer for query validation.
+
+Splits a query into words, literals, comments and punctuation using one master
+pattern. Every alternative is anchored on its first character and cannot fail once
+started (unterminated strings and comments run to the end of the query), so the
+scan never backtracks and takes time linear in the query length.
+"""
+
+import re
+from dataclasses import dataclass
+
+WORD = "WORD"
+NUMBER = "NUMBER"
+STRING = "STRING"
+QUOTED_IDENTIFIER = "QUOTED_IDENTIFIER"
+VARIABLE = "VARIABLE"
+COMMENT = "COMMENT"
+SEMICOLON = "SEMICOLON"
+DOT = "DOT"
+LPAREN = "LPAREN"
+RPAREN = "RPAREN"
+OPERATOR = "OPERATOR"
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    \s*+
+    (?:
+      (?P<COMMENT>
+        \#[^\n]*
+        | --(?=\s|\Z)[^\n]*
+        | /\*(?:[^*]+|\*(?!/))*(?:\*/|\Z)
+      )
+    | (?P<STRING>
+        '(?:[^'\\]+|\\.|'')*(?:'|\\?\Z)
+        | "(?:[^"\\]+|\\.|"")*(?:"|\\?\Z)
+      )
+    | (?P<QUOTED_IDENTIFIER>`(?:[^`]+|``)*(?:`|\Z))
+    | (?P<VARIABLE>@@?[\w$]*)
+    | (?P<WORD>[\w$]+)
+    | (?P<SEMICOLON>;)
+    | (?P<DOT>\.)
+    | (?P<LPAREN>\()
+    | (?P<RPAREN>\))
+    | (?P<OPERATOR>\S)
+    )
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+
+@dataclass(slots=True)
+class Token:
+    kind: str
+    value: str
+    position: int
+    # Upper-cased word, or an empty string for other tokens
+    keyword: str = ""
+
+    @property
+    def identifier(self) -> str:
+        """Lower-cased name of a bare or backtick-quoted identifier."""
+        if self.kind == WORD:
+            return self.value.lower()
+        if self.kind == QUOTED_IDENTIFIER:
+            return self.value.strip("`").replace("``", "`").lower()
+        return ""
+
+
+def tokenize(query: str) -> list[Token]:
+    """Split a query into tokens, dropping whitespace."""
+    tokens = []
+    # Every non-space character starts a token, so only trailing whitespace could
+    # fail to match
+    for match in _TOKEN_PATTERN.finditer(query.rstrip()):
+        kind = match.lastgroup
+        value = match.group(kind)  # type: ignore[arg-type]
+        position = match.start(kind)  # type: ignore[arg-type]
+
+        if kind != WORD:
+            tokens.append(Token(kind, value, position))  # type: ignore[arg-type]
+        elif value.isdigit():
+            tokens.append(Token(NUMBER, value, position))
+        else:
+            tokens.append(Token(WORD, value, position, value.upper()))
+    return tokens
@@ -0,0 +1,356 @@
+"""
+In-process SQLite engine for lessons that do not need MySQL.
+
+Beginner lessons query a handful of fixture rows, so on MySQL most of their
+execution time is the network round-trip. SQLiteSchemaManager builds an
+in-memory SQLite template per lesson from its fixture SQL and gives each
+sandbox a copy through SQLite's backup API. SQLiteQueryExecutor runs queries on
+those copies in a thread pool; a progress handler aborts queries that run past
+the timeout or whose caller has gone away.
+
+Lessons opt in with LessonQueryPolicy(engine="sqlite"). Both classes wrap the
+MySQL implementations and hand every other lesson to them. Without a fallback,
+every lesson runs on SQLite, which gives tests a path without a database server.
+
+Databases live in process memory: they do not survive a restart and are not
+visible to other workers sharing the sandbox registry.
+"""
+
+import asyncio
+import functools
+import sqlite3
+import threading
+import time
+from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import QueryExecuteResponse, QueryStreamFrame, QueryValidationResult
+from app.services.query_validator import ValidatorRegistry
+from app.services.sandbox import IQueryExecutor, ISchemaManager, Sandbox, SchemaInfo
+from app.services.schema_manager import LESSON_FIXTURES, get_fixture_version
+
+
+@dataclass
+class SQLiteDatabase:
+    """An in-memory database holding one sandbox schema."""
+
+    connection: sqlite3.Connection
+    # A connection runs one statement at a time
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    # Shared by all sandboxes of a lesson; every query on it is rolled back
+    shared: bool = False
+
+
+# Authorizer actions a learner's statement may use: reading and changing rows.
+# Everything else (ATTACH, which VACUUM INTO also needs, PRAGMA, DDL,
+# transaction control) is refused while the statement is prepared.
+_ALLOWED_ACTIONS = frozenset(
+    {
+        sqlite3.SQLITE_SELECT,
+        sqlite3.SQLITE_READ,
+        sqlite3.SQLITE_INSERT,
+        sqlite3.SQLITE_UPDATE,
+        sqlite3.SQLITE_DELETE,
+        sqlite3.SQLITE_FUNCTION,
+        sqlite3.SQLITE_RECURSIVE,
+    }
+)
+
+# Statement types the engine runs; anything the validator cannot classify is refused
+_QUERY_TYPES = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"})
+
+
+def _authorize(
+    action: int, arg1: str | None, arg2: str | None, database: str | None, trigger: str | None
+) -> int:
+    if action in _ALLOWED_ACTIONS and database in (None, "main"):
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+def _connect() -> sqlite3.Connection:
+    # Autocommit mode: the executor opens transactions explicitly
+    connection = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+    connection.setlimit(sqlite3.SQLITE_LIMIT_ATTACHED, 0)
+    return connection
+
+
+class SQLiteSchemaManager(ISchemaManager):
+    """
+    Keeps in-memory SQLite templates and sandbox databases for SQLite lessons.
+
+    Templates and copies are a few pages of memory, so they are built on the event
+    loop. Sandboxes have no database user; the sandbox username is only tracked.
+    """
+
+    def __init__(
+        self,
+        config: SandboxConfig,
+        validator_registry: ValidatorRegistry,
+        fallback: ISchemaManager | None = None,
+    ):
+        self.config = config
+        self.validator_registry = validator_registry
+        self.fallback = fallback
+        self._templates: dict[int, sqlite3.Connection] = {}
+        self._databases: dict[str, SQLiteDatabase] = {}
+        self._users: set[str] = set()
+
+    def handles(self, lesson_id: int) -> bool:
+        """Whether the lesson's sandboxes run on SQLite."""
+        if self.fallback is None:
+            return True
+        return self.validator_registry.get_policy(lesson_id).engine == "sqlite"
+
+    def get_database(self, schema_name: str) -> SQLiteDatabase | None:
+        """Get the SQLite database of a schema, or None if it is not on SQLite."""
+        return self._databases.get(schema_name)
+
+    async def provision_schema(
+        self, schema_name: str, lesson_id: int, username: str, password: str
+    ) -> None:
+        if self.fallback is not None and not self.handles(lesson_id):
+            await self.fallback.provision_schema(schema_name, lesson_id, username, password)
+            return
+
+        if self.config.is_template_schema(schema_name):
+            await self.ensure_template(lesson_id)
+            return
+
+        self._databases[schema_name] = SQLiteDatabase(self._copy_template(lesson_id))
+        self._users.add(username)
+
+    async def ensure_template(self, lesson_id: int) -> None:
+        """Register the lesson's shared database, a copy of its template."""
+        if self.fallback is not None and not self.handles(lesson_id):
+            await self.fallback.ensure_template(lesson_id)
+            return
+
+        template_name = self.config.get_template_schema_name(lesson_id)
+        if template_name not in self._databases:
+            # Queries never run on the template itself, so copies can be taken any time
+            self._databases[template_name] = SQLiteDatabase(
+                self._copy_template(lesson_id), shared=True
+            )
+
+    async def create_schema(self, schema_name: str) -> None:
+        if self.fallback is not None:
+            await self.fallback.create_schema(schema_name)
+            return
+        self._databases[schema_name] = SQLiteDatabase(_connect())
+
+    async def seed_data(self, schema_name: str, lesson_id: int) -> None:
+        database = self._databases.get(schema_name)
+        if database is None:
+            if self.fallback is not None:
+                await self.fallback.seed_data(schema_name, lesson_id)
+            return
+        self._get_template(lesson_id).backup(database.connection)
+
+    async def drop_schema(self, schema_name: str) -> None:
+        database = self._databases.pop(schema_name, None)
+        if database is not None:
+            database.connection.close()
+        elif self.fallback is not None:
+            await self.fallback.drop_schema(schema_name)
+
+    async def schema_exists(self, schema_name: str) -> bool:
+        if schema_name in self._databases:
+            return True
+        return self.fallback is not None and await self.fallback.schema_exists(schema_name)
+
+    async def get_schema_size(self, schema_name: str) -> int:
+        database = self._databases.get(schema_name)
+        if database is None:
+            return await self.fallback.get_schema_size(schema_name) if self.fallback else 0
+        (pages,) = database.connection.execute("PRAGMA page_count").fetchone()
+        (page_size,) = database.connection.execute("PRAGMA page_size").fetchone()
+        return int(pages * page_size)
+
+    async def create_sandbox_user(self, username: str, password: str, schema_name: str) -> None:
+        if schema_name in self._databases:
+            self._users.add(username)
+        elif self.fallback is not None:
+            await self.fallback.create_sandbox_user(username, password, schema_name)
+
+    async def drop_sandbox_user(self, username: str) -> None:
+        if username in self._users:
+            self._users.discard(username)
+        elif self.fallback is not None:
+            await self.fallback.drop_sandbox_user(username)
+
+    async def list_sandbox_schemas(self) -> list[SchemaInfo]:
+        # Only schemas on the MySQL server can be orphaned
+        return await self.fallback.list_sandbox_schemas() if self.fallback else []
+
+    def get_template_version(self, lesson_id: int) -> str | None:
+        if self.fallback is not None and not self.handles(lesson_id):
+            return self.fallback.get_template_version(lesson_id)
+        # Same fixtures, but values may come back typed differently than from MySQL
+        version = get_fixture_version(lesson_id)
+        return f"sqlite-{version}" if version is not None else None
+
+    def _get_template(self, lesson_id: int) -> sqlite3.Connection:
+        """Get the lesson's template database, building it from the fixture on first use."""
+        template = self._templates.get(lesson_id)
+        if template is None:
+            template = _connect()
+            fixture_sql = LESSON_FIXTURES.get(lesson_id)
+            if fixture_sql:
+                template.executescript(fixture_sql)
+            self._templates[lesson_id] = template
+        return template
+
+    def _copy_template(self, lesson_id: int) -> sqlite3.Connection:
+        """Copy the lesson's template into a new in-memory database."""
+        connection = _connect()
+        self._get_template(lesson_id).backup(connection)
+        return connection
+
+
+class SQLiteQueryExecutor(IQueryExecutor):
+    """
+    Runs queries of SQLite sandboxes in a thread pool, others on the fallback.
+
+    - Timeout enforced by a progress handler instead of a server-side limit
+    - Only max_result_rows + 1 rows are produced; SQLite computes rows on demand
+    - DML of rollback lessons and every query on a shared database run inside a
+      transaction that is rolled back
+    """
+
+    def __init__(
+        self,
+        config: SandboxConfig,
+        schema_manager: SQLiteSchemaManager,
+        fallback: IQueryExecutor | None = None,
+    ):
+        self.config = config
+        self.schema_manager = schema_manager
+        self.validator_registry = schema_manager.validator_registry
+        self.fallback = fallback
+        self._threads = ThreadPoolExecutor(
+            max_workers=config.sqlite_threads, thread_name_prefix="sqlite-sandbox"
+        )
+
+    async def execute_query(self, sandbox: Sandbox, query: str) -> QueryExecuteResponse:
+        database = self.schema_manager.get_database(sandbox.schema_name)
+        if database is None:
+            if self.fallback is None:
+                raise ValueError(f"Sandbox schema {sandbox.schema_name} not found")
+            return await self.fallback.execute_query(sandbox, query)
+
+        validation = await self.validate_query(query, sandbox.lesson_id)
+        if not validation.is_valid:
+            raise ValueError(f"Invalid query: {', '.join(validation.errors)}")
+        if validation.query_type not in _QUERY_TYPES:
+            raise ValueError(
+                "Invalid query: only SELECT, INSERT, UPDATE and DELETE statements can run here"
+            )
+
+        policy = self.validator_registry.get_policy(sandbox.lesson_id)
+        rolls_back_dml = (
+            policy.rollback_dml and validation.query_type in ValidatorRegistry.ROLLED_BACK_TYPES
+        )
+        verification_query = policy.verification_query if rolls_back_dml else None
+        timeout = self.config.query_timeout_seconds
+        cancelled = threading.Event()
+
+        run = functools.partial(
+            self._run,
+            database,
+            query,
+            verification_query,
+            rollback=database.shared or rolls_back_dml,
+            deadline=time.monotonic() + timeout,
+            cancelled=cancelled,
+        )
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._threads, run)
+        except asyncio.CancelledError:
+            # Stops the statement at the progress handler's next check
+            cancelled.set()
+            raise
+        except TimeoutError as e:
+            raise TimeoutError(f"Query execution exceeded timeout of {timeout} seconds") from e
+        except sqlite3.Error as e:
+            if str(e) == "interrupted":
+                raise TimeoutError(f"Query execution exceeded timeout of {timeout} seconds") from e
+            raise RuntimeError(f"Query execution failed: {e}") from e
+
+    async def stream_query(self, sandbox: Sandbox, query: str) -> AsyncIterator[QueryStreamFrame]:
+        """Stream from the fallback, or buffer the SQLite result; it is at most a few pages."""
+        if (
+            self.fallback is not None
+            and self.schema_manager.get_database(sandbox.schema_name) is None
+        ):
+            async for frame in self.fallback.stream_query(sandbox, query):
+                yield frame
+            return
+
+        async for frame in super().stream_query(sandbox, query):
+            yield frame
+
+    async def validate_query(
+        self, query: str, lesson_id: int | None = None
+    ) -> QueryValidationResult:
+        return self.validator_registry.validate(query, lesson_id)
+
+    def close(self) -> None:
+        """Stop the query threads once running queries finish."""
+        self._threads.shutdown(wait=False, cancel_futures=True)
+
+    def _run(
+        self,
+        database: SQLiteDatabase,
+        query: str,
+        verification_query: str | None,
+        rollback: bool,
+        deadline: float,
+        cancelled: threading.Event,
+    ) -> QueryExecuteResponse:
+        """Execute a query on a worker thread."""
+        start_time = time.time()
+        if not database.lock.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            raise TimeoutError
+
+        connection = database.connection
+        try:
+            # A nonzero return value aborts the running statement
+            connection.set_progress_handler(
+                lambda: cancelled.is_set() or time.monotonic() > deadline,
+                self.config.sqlite_progress_steps,
+            )
+            if rollback:
+                connection.execute("BEGIN")
+
+            # Only while learner and lesson statements run; BEGIN and ROLLBACK are ours
+            connection.set_authorizer(_authorize)
+            cursor = connection.execute(query)
+            affected_rows = None if cursor.description else cursor.rowcount
+            if verification_query is not None:
+                cursor.close()
+                cursor = connection.execute(verification_query)
+
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            rows: list[Any] = cursor.fetchmany(self.config.max_result_rows + 1) if columns else []
+            cursor.close()
+        finally:
+            connection.set_authorizer(None)
+            connection.set_progress_handler(None, 0)
+            if rollback and connection.in_transaction:
+                connection.execute("ROLLBACK")
+            database.lock.release()
+
+        max_rows = self.config.max_result_rows
+        return QueryExecuteResponse.model_construct(
+            columns=columns,
+            rows=[list(row) for row in rows[:max_rows]],
+            row_count=min(len(rows), max_rows),
+            execution_time=time.time() - start_time,
+            affected_rows=affected_rows,
+            result_handle=None,
+            truncated=len(rows) > max_rows,
+        )
@@ -0,0 +1,202 @@
+"""
+Shared cache of query results and verdicts for unmodified lesson data.
+
+Every sandbox of a lesson starts from the same template data, so a read-only query
+returns the same result in any sandbox that has not run DML since seeding. Entries
+are keyed by (lesson, template version, normalised query) and hold the result plus
+the pass/fail verdict per expected-result version. Queries calling functions whose
+result changes between runs (NOW(), RAND(), ...) are not cached.
+"""
+
+import hashlib
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import QueryExecuteResponse, VerdictCacheStats
+from app.services.sql_lexer import LPAREN, WORD, tokenize
+
+# String literals and quoted identifiers are kept verbatim; everything else is
+# whitespace-collapsed
+_QUERY_TOKEN_PATTERN = re.compile(
+    r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`(?:[^`]|``)*`)|(\s+)""",
+    re.DOTALL,
+)
+
+VerdictCacheKey = tuple[int, str, str]
+
+# Functions whose result differs between runs or connections
+NONDETERMINISTIC_FUNCTIONS = frozenset(
+    {
+        "BENCHMARK",
+        "CONNECTION_ID",
+        "CURDATE",
+        "CURTIME",
+        "DATABASE",
+        "FOUND_ROWS",
+        "LAST_INSERT_ID",
+        "NOW",
+        "RAND",
+        "RANDOM_BYTES",
+        "ROW_COUNT",
+        "SCHEMA",
+        "SESSION_USER",
+        "SLEEP",
+        "SYSDATE",
+        "SYSTEM_USER",
+        "UNIX_TIMESTAMP",
+        "USER",
+        "UUID",
+        "UUID_SHORT",
+    }
+)
+
+# Non-deterministic functions that may also be written without parentheses
+NONDETERMINISTIC_KEYWORDS = frozenset(
+    {
+        "CURRENT_DATE",
+        "CURRENT_TIME",
+        "CURRENT_TIMESTAMP",
+        "CURRENT_USER",
+        "LOCALTIME",
+        "LOCALTIMESTAMP",
+        "UTC_DATE",
+        "UTC_TIME",
+        "UTC_TIMESTAMP",
+    }
+)
+
+
+@dataclass
+class CachedExecution:
+    result: QueryExecuteResponse
+    verdicts: dict[Any, tuple[bool, list[str]]] = field(default_factory=dict)
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace outside literals and drop trailing semicolons."""
+
+    def replace(match: re.Match[str]) -> str:
+        return match.group(1) if match.group(1) is not None else " "
+
+    return _QUERY_TOKEN_PATTERN.sub(replace, query).strip().rstrip(";").rstrip()
+
+
+def is_deterministic(query: str) -> bool:
+    """Whether the query calls no function whose result changes between runs."""
+    tokens = tokenize(query)
+    for index, token in enumerate(tokens):
+        if token.kind != WORD:
+            continue
+        if token.keyword in NONDETERMINISTIC_KEYWORDS:
+            return False
+        if (
+            token.keyword in NONDETERMINISTIC_FUNCTIONS
+            and index + 1 < len(tokens)
+            and tokens[index + 1].kind == LPAREN
+        ):
+            return False
+    return True
+
+
+def query_fingerprint(query: str) -> str:
+    return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    """
+    LRU cache of read-only query results and their verdicts.
+
+    - At most verdict_cache_max_entries entries
+    - Results above verdict_cache_max_result_rows rows are not cached
+    - Total cached rows are kept under verdict_cache_max_total_rows
+    """
+
+    def __init__(self, config: SandboxConfig):
+        self.config = config
+        self._entries: OrderedDict[VerdictCacheKey, CachedExecution] = OrderedDict()
+        self._cached_rows = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._verdict_hits = 0
+        self._evictions = 0
+
+    def make_key(self, lesson_id: int, template_version: str, query: str) -> VerdictCacheKey:
+        return (lesson_id, template_version, query_fingerprint(query))
+
+    def get(self, key: VerdictCacheKey) -> CachedExecution | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry
+
+    def put(self, key: VerdictCacheKey, result: QueryExecuteResponse) -> None:
+        # Spilled results belong to a single sandbox
+        if result.result_handle is not None:
+            return
+        if len(result.rows) > self.config.verdict_cache_max_result_rows:
+            return
+
+        self._remove(key)
+        self._entries[key] = CachedExecution(result=result)
+        self._cached_rows += len(result.rows)
+
+        while self._entries and (
+            len(self._entries) > self.config.verdict_cache_max_entries
+            or self._cached_rows > self.config.verdict_cache_max_total_rows
+        ):
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+
+    def get_verdict(
+        self, key: VerdictCacheKey, expected_version: Any
+    ) -> tuple[bool, list[str]] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        verdict = entry.verdicts.get(expected_version)
+        if verdict is not None:
+            self._verdict_hits += 1
+        return verdict
+
+    def put_verdict(
+        self,
+        key: VerdictCacheKey,
+        expected_version: Any,
+        passed: bool,
+        differences: list[str],
+    ) -> None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.verdicts[expected_version] = (passed, differences)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._cached_rows = 0
+
+    def get_stats(self) -> VerdictCacheStats:
+        """Get hit rate and cache occupancy."""
+        lookups = self._hits + self._misses
+        return VerdictCacheStats(
+            entries=len(self._entries),
+            max_entries=self.config.verdict_cache_max_entries,
+            cached_rows=self._cached_rows,
+            hits=self._hits,
+            misses=self._misses,
+            hit_rate=self._hits / lookups if lookups else 0.0,
+            verdict_hits=self._verdict_hits,
+            evictions=self._evictions,
+        )
+
+    def _remove(self, key: VerdictCacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._cached_rows -= len(entry.result.rows)
@@ -0,0 +1,240 @@
+"""
+Warm pool of pre-provisioned sandbox schemas.
+
+A background task keeps a number of seeded schemas ready for lessons that are in
+demand, so SandboxService.create_sandbox can claim one instead of provisioning inline.
+"""
+
+import asyncio
+import secrets
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import WarmPoolStats
+from app.services.sandbox import ISchemaManager
+
+
+@dataclass
+class WarmSchema:
+    """A provisioned and seeded schema waiting to be claimed."""
+
+    schema_name: str
+    username: str
+    lesson_id: int
+    provisioned_at: float = field(default_factory=time.time)
+
+
+class WarmSandboxPool:
+    """
+    Keeps ready-to-use schemas per lesson.
+
+    - Per-lesson target = max(configured minimum, recent demand), capped per lesson
+      and across all lessons
+    - Each refill run provisions at most warm_pool_refill_batch schemas
+    - Schemas above target are dropped once demand goes away
+    - Lessons outside lesson_filter (e.g. lessons on another engine) get no schemas
+    """
+
+    def __init__(
+        self,
+        config: SandboxConfig,
+        schema_manager: ISchemaManager,
+        lesson_filter: Callable[[int], bool] | None = None,
+    ):
+        self.config = config
+        self.schema_manager = schema_manager
+        self.lesson_filter = lesson_filter
+
+        self._ready: dict[int, deque[WarmSchema]] = {}
+        self._pending: dict[str, int] = {}
+        self._demand: dict[int, deque[float]] = {}
+
+        self._hits = 0
+        self._misses = 0
+        self._provisioned = 0
+        self._failures = 0
+
+        self._task: asyncio.Task[None] | None = None
+
+    def serves(self, lesson_id: int) -> bool:
+        """Whether the pool keeps schemas for the lesson."""
+        return self.lesson_filter is None or self.lesson_filter(lesson_id)
+
+    def claim(self, lesson_id: int) -> WarmSchema | None:
+        """Take a ready schema for the lesson, recording the request as demand."""
+        self._demand.setdefault(lesson_id, deque()).append(time.monotonic())
+
+        ready = self._ready.get(lesson_id)
+        if ready:
+            self._hits += 1
+            return ready.popleft()
+
+        self._misses += 1
+        return None
+
+    def restore(self, warm_schema: WarmSchema) -> None:
+        """Return a claimed schema that could not be used."""
+        self._ready.setdefault(warm_schema.lesson_id, deque()).appendleft(warm_schema)
+
+    def get_target(self, lesson_id: int) -> int:
+        """Number of ready schemas to keep for a lesson."""
+        recent_demand = self._count_recent_demand(lesson_id)
+        minimum = self.config.warm_pool_lesson_targets.get(lesson_id, 0)
+        return min(max(minimum, recent_demand), self.config.warm_pool_max_per_lesson)
+
+    def owned_schema_names(self) -> set[str]:
+        """Schemas that belong to the pool (ready or being provisioned)."""
+        names = set(self._pending)
+        for ready in self._ready.values():
+            names.update(warm.schema_name for warm in ready)
+        return names
+
+    async def refill(self) -> int:
+        """
+        Provision missing schemas for lessons below target.
+
+        Returns:
+            Number of schemas provisioned in this run
+        """
+        await self._trim_excess()
+
+        total = sum(len(ready) for ready in self._ready.values()) + len(self._pending)
+        budget = min(
+            self.config.warm_pool_refill_batch,
+            max(self.config.warm_pool_max_total - total, 0),
+        )
+
+        lessons: list[int] = []
+        for lesson_id, missing in self._get_deficits():
+            take = min(missing, budget - len(lessons))
+            lessons.extend([lesson_id] * take)
+            if len(lessons) >= budget:
+                break
+
+        if not lessons:
+            return 0
+
+        results = await asyncio.gather(*(self._provision(lesson_id) for lesson_id in lessons))
+        return sum(1 for provisioned in results if provisioned)
+
+    async def _provision(self, lesson_id: int) -> bool:
+        schema_name = self.config.get_warm_schema_name(lesson_id, secrets.token_hex(4))
+        self._pending[schema_name] = lesson_id
+
+        try:
+            await self.schema_manager.provision_schema(
+                schema_name=schema_name,
+                lesson_id=lesson_id,
+                username=schema_name,
+                password=secrets.token_urlsafe(24),
+            )
+        except Exception:
+            self._failures += 1
+            await self._drop_quietly(schema_name)
+            return False
+        finally:
+            self._pending.pop(schema_name, None)
+
+        self._ready.setdefault(lesson_id, deque()).append(
+            WarmSchema(schema_name=schema_name, username=schema_name, lesson_id=lesson_id)
+        )
+        self._provisioned += 1
+        return True
+
+    def _get_deficits(self) -> list[tuple[int, int]]:
+        """Lessons below target, most under-provisioned first."""
+        pending_by_lesson: dict[int, int] = {}
+        for lesson_id in self._pending.values():
+            pending_by_lesson[lesson_id] = pending_by_lesson.get(lesson_id, 0) + 1
+
+        lesson_ids = set(self._demand) | set(self.config.warm_pool_lesson_targets)
+        deficits = []
+        for lesson_id in lesson_ids:
+            if not self.serves(lesson_id):
+                continue
+            have = len(self._ready.get(lesson_id, ())) + pending_by_lesson.get(lesson_id, 0)
+            missing = self.get_target(lesson_id) - have
+            if missing > 0:
+                deficits.append((lesson_id, missing))
+
+        deficits.sort(key=lambda item: item[1], reverse=True)
+        return deficits
+
+    async def _trim_excess(self) -> None:
+        for lesson_id, ready in list(self._ready.items()):
+            excess = len(ready) - self.get_target(lesson_id)
+            for _ in range(max(excess, 0)):
+                await self._drop_quietly(ready.popleft().schema_name)
+
+    def _count_recent_demand(self, lesson_id: int) -> int:
+        demand = self._demand.get(lesson_id)
+        if not demand:
+            return 0
+
+        cutoff = time.monotonic() - self.config.warm_pool_demand_window_minutes * 60
+        while demand and demand[0] < cutoff:
+            demand.popleft()
+        return len(demand)
+
+    async def _drop_quietly(self, schema_name: str) -> None:
+        try:
+            await self.schema_manager.drop_schema(schema_name)
+            await self.schema_manager.drop_sandbox_user(schema_name)
+        except Exception:
+            # Left for the orphan schema collector
+            pass
+
+    def get_stats(self) -> WarmPoolStats:
+        """Get hit rate and pool occupancy."""
+        requests = self._hits + self._misses
+        lesson_ids = (
+            set(self._ready) | set(self._demand) | set(self.config.warm_pool_lesson_targets)
+        )
+        return WarmPoolStats(
+            hits=self._hits,
+            misses=self._misses,
+            hit_rate=self._hits / requests if requests else 0.0,
+            ready=sum(len(ready) for ready in self._ready.values()),
+            pending=len(self._pending),
+            provisioned=self._provisioned,
+            failures=self._failures,
+            ready_by_lesson={
+                lesson_id: len(ready) for lesson_id, ready in self._ready.items() if ready
+            },
+            targets_by_lesson={
+                lesson_id: target
+                for lesson_id in lesson_ids
+                if (target := self.get_target(lesson_id)) > 0
+            },
+        )
+
+    def start(self) -> None:
+        """Start the background refill loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, drop_ready: bool = True) -> None:
+        """Stop the refill loop and optionally drop schemas that were never claimed."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if drop_ready:
+            for ready in list(self._ready.values()):
+                while ready:
+                    await self._drop_quietly(ready.popleft().schema_name)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refill()
+            except Exception:
+                self._failures += 1
+            await asyncio.sleep(self.config.warm_pool_refill_interval_seconds)
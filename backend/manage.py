@@ -4,6 +4,7 @@ Management CLI for database operations.
 """
 import sys
 
+from app.cli.build_templates import main as build_templates_main
 from app.cli.refresh_leaderboard import main as refresh_leaderboard_main
 from app.cli.seed import main as seed_main
 
@@ -18,11 +19,13 @@ Usage:
 Commands:
     seed                  Load seed data into the database (idempotent)
     refresh-leaderboard   Refresh the leaderboard cache from users' XP data
+    build-templates       Build sandbox lesson template schemas [lesson_id ...]
     help                  Show this help message
 
 Examples:
     python manage.py seed
     python manage.py refresh-leaderboard
+    python manage.py build-templates 1 2
     """)
 
 
@@ -38,6 +41,8 @@ def main() -> None:
         seed_main()
     elif command == "refresh-leaderboard":
         refresh_leaderboard_main()
+    elif command == "build-templates":
+        build_templates_main(sys.argv[2:])
     elif command == "help" or command == "--help" or command == "-h":
         print_help()
     else:
@@ -0,0 +1,76 @@
+"""
+Benchmark the lexer-based QueryValidator against the previous regex implementation.
+
+Usage (from the backend directory):
+    python scripts/benchmark_query_validator.py
+"""
+
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.sandbox_config import SandboxConfig  # noqa: E402
+from app.services.query_validator import QueryValidator  # noqa: E402
+
+# Regex checks of the previous implementation, kept here for comparison
+LEGACY_PATTERNS = [
+    r"^\s*(?:WITH\s+.+\s+AS\s+.+\s+)?SELECT\b",
+    r"\bUNION\s+(?:ALL\s+)?SELECT\b",
+    r";\s*(?:SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER)\b",
+    r"--\s*$|/\*.*?\*/|#",
+    r"@@\w+",
+    r"\bINTO\s+(?:OUT|DUMP)FILE\b",
+    r"\bLOAD\s+DATA\b",
+    r"\b(?:LOAD_FILE|SYSTEM|EXEC)\s*\(",
+    r"\binformation_schema\.",
+    r"\bmysql\.",
+    r"\bperformance_schema\.",
+    r"\bsys\.",
+    r"\bDELETE\s+FROM\s+\w+\s*(?:;|$)",
+    r"\bUPDATE\s+\w+\s+SET\s+.+?(?:;|$)(?!.*WHERE)",
+]
+
+
+def legacy_validate(config: SandboxConfig, query: str) -> None:
+    query_upper = query.strip().upper()
+    for pattern in config.blocked_patterns:
+        re.search(pattern, query, re.IGNORECASE)
+    for pattern in LEGACY_PATTERNS:
+        re.search(pattern, query_upper if pattern.startswith("^") else query, re.IGNORECASE)
+
+
+def build_queries() -> dict[str, str]:
+    assignments = ", ".join(f"col{i} = col{i} + {i}" for i in range(800))
+    ctes = ",\n".join(f"c{i} AS (SELECT id FROM employees)" for i in range(200))
+    return {
+        "simple select": "SELECT name, salary FROM employees WHERE department_id = 3",
+        "join": (
+            "SELECT e.name, d.name FROM employees e "
+            "JOIN departments d ON e.department_id = d.id ORDER BY e.name"
+        ),
+        "long update without where": f"UPDATE employees SET {assignments}",
+        "many ctes": f"WITH {ctes}\nSELECT * FROM c0",
+        "long literal": "SELECT '" + "x " * 5000 + "'",
+        # Inputs that make the previous patterns backtrack
+        "with chain, no select": "WITH " + "a AS b " * 1500,
+        "repeated update set": "UPDATE t SET a = 1 " * 500,
+    }
+
+
+def main() -> None:
+    config = SandboxConfig(mysql_admin_password="benchmark")
+    validator = QueryValidator(config)
+
+    print(f"{'query':<28}{'chars':>8}{'regex ms':>12}{'lexer ms':>12}")
+    for name, query in build_queries().items():
+        runs = 20
+        legacy = timeit.timeit(lambda q=query: legacy_validate(config, q), number=runs) / runs
+        lexer = timeit.timeit(lambda q=query: validator.validate(q), number=runs) / runs
+        print(f"{name:<28}{len(query):>8}{legacy * 1000:>12.3f}{lexer * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
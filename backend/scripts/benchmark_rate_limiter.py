@@ -0,0 +1,42 @@
+"""
+Benchmark the per-request cost of the in-process query rate limiter.
+
+Usage (from the backend directory):
+    python scripts/benchmark_rate_limiter.py
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.sandbox_config import SandboxConfig  # noqa: E402
+from app.services.rate_limiter import RateLimiter, RateLimitExceeded  # noqa: E402
+
+
+async def run(limiter: RateLimiter, user_ids: list[int]) -> float:
+    start = time.perf_counter()
+    for user_id in user_ids:
+        try:
+            await limiter.acquire(user_id)
+        except RateLimitExceeded:
+            pass
+    return (time.perf_counter() - start) / len(user_ids)
+
+
+async def main() -> None:
+    config = SandboxConfig(mysql_admin_password="benchmark")
+    requests = 200_000
+
+    print(f"{'scenario':<28}{'users':>10}{'us/request':>12}{'tracked':>10}")
+    for name, users in [("one hot user", 1), ("1k users", 1_000), ("100k users", 100_000)]:
+        limiter = RateLimiter(config)
+        per_request = await run(limiter, [i % users for i in range(requests)])
+        tracked = limiter.get_stats().tracked_users
+        print(f"{name:<28}{users:>10}{per_request * 1e6:>12.2f}{tracked:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
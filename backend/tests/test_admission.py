@@ -0,0 +1,124 @@
+"""
+Tests for per-sandbox admission control.
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.sandbox_config import SandboxConfig
+from app.services.admission import SandboxAdmission, SandboxBusy
+from app.services.sandbox import (
+    InMemorySandboxManager,
+    MockQueryExecutor,
+    MockSchemaManager,
+    SandboxService,
+)
+
+
+@pytest.fixture
+def config() -> SandboxConfig:
+    return SandboxConfig(
+        enabled=True,
+        mysql_admin_password="test_password",
+        max_connections_per_sandbox=2,
+        sandbox_queue_size=1,
+        sandbox_queue_timeout_seconds=0.05,
+    )
+
+
+@pytest.fixture
+def admission(config: SandboxConfig) -> SandboxAdmission:
+    return SandboxAdmission(config)
+
+
+async def hold(admission: SandboxAdmission, sandbox_id: str, release: asyncio.Event) -> None:
+    async with admission.admit(sandbox_id):
+        await release.wait()
+
+
+class TestSandboxAdmission:
+    async def test_waiter_admitted_when_slot_frees(self, admission: SandboxAdmission) -> None:
+        release = asyncio.Event()
+        holders = [asyncio.create_task(hold(admission, "a", release)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        waiter = asyncio.create_task(hold(admission, "a", asyncio.Event()))
+        await asyncio.sleep(0)
+        stats = admission.get_stats()
+        assert (stats.active, stats.queued) == (2, 1)
+
+        release.set()
+        await asyncio.gather(*holders)
+        stats = admission.get_stats()
+        assert (stats.active, stats.queued, stats.admitted) == (1, 0, 3)
+        assert stats.max_queue_depth == 1
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert admission.get_stats().active == 0
+        assert admission._gates == {}
+
+    async def test_full_queue_rejected_immediately(self, admission: SandboxAdmission) -> None:
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(hold(admission, "a", release)) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(SandboxBusy):
+            async with admission.admit("a"):
+                pass
+        # Other sandboxes are unaffected
+        async with admission.admit("b"):
+            pass
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert admission.get_stats().rejected == 1
+
+    async def test_wait_times_out(self, admission: SandboxAdmission) -> None:
+        release = asyncio.Event()
+        holders = [asyncio.create_task(hold(admission, "a", release)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(SandboxBusy):
+            async with admission.admit("a"):
+                pass
+
+        stats = admission.get_stats()
+        assert (stats.queued, stats.rejected) == (0, 1)
+        release.set()
+        await asyncio.gather(*holders)
+        assert admission._gates == {}
+
+
+async def test_sandbox_service_limits_concurrent_queries(config: SandboxConfig) -> None:
+    admission = SandboxAdmission(config)
+    executor = MockQueryExecutor(config)
+    service = SandboxService(
+        config=config,
+        sandbox_manager=InMemorySandboxManager(config),
+        schema_manager=MockSchemaManager(config),
+        query_executor=executor,
+        admission=admission,
+    )
+    sandbox = await service.create_sandbox(user_id=1, lesson_id=1)
+    release = asyncio.Event()
+    execute_query = executor.execute_query
+
+    async def slow_execute(*args: object) -> object:
+        await release.wait()
+        return await execute_query(*args)  # type: ignore[arg-type]
+
+    executor.execute_query = slow_execute  # type: ignore[method-assign,assignment]
+
+    running = [
+        asyncio.create_task(service.execute_query(sandbox.sandbox_id, "SELECT 1")) for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    with pytest.raises(SandboxBusy):
+        await service.execute_query(sandbox.sandbox_id, "SELECT 1")
+
+    release.set()
+    await asyncio.gather(*running)
+    assert admission.get_stats().admitted == 3
@@ -0,0 +1,270 @@
+"""
+Tests for the shared sandbox connection pool.
+"""
+
+import asyncio
+import struct
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+
+import aiomysql
+import pytest
+from pydantic import ValidationError
+from pymysql.constants import COMMAND
+
+from app.core.sandbox_config import SandboxConfig
+from app.services.connection_pool import (
+    COM_RESET_CONNECTION,
+    MYSQL_OPTION_MULTI_STATEMENTS_OFF,
+    SandboxConnectionPool,
+)
+
+
+@pytest.fixture
+def config() -> SandboxConfig:
+    return SandboxConfig(
+        enabled=True,
+        mysql_admin_password="test_password",
+        pool_min_size=2,
+        pool_max_size=8,
+        pool_idle_recycle_seconds=120,
+    )
+
+
+def make_connection() -> Mock:
+    conn = Mock()
+    conn.closed = False
+    conn.select_db = AsyncMock()
+    conn._execute_command = AsyncMock()
+    conn._read_ok_packet = AsyncMock()
+    conn._read_packet = AsyncMock()
+    conn.autocommit = AsyncMock()
+
+    def close() -> None:
+        conn.closed = True
+
+    conn.close = Mock(side_effect=close)
+    return conn
+
+
+def make_pool(conn: Mock) -> Mock:
+    pool = Mock()
+    pool.acquire = AsyncMock(return_value=conn)
+    pool.release = AsyncMock()
+    pool.size = 2
+    pool.freesize = 1
+    pool.wait_closed = AsyncMock()
+    return pool
+
+
+class TestSandboxConnectionPool:
+    async def test_pool_created_once_with_config(self, config: SandboxConfig) -> None:
+        conn = make_connection()
+        mock_pool = make_pool(conn)
+
+        with patch(
+            "app.services.connection_pool.aiomysql.create_pool",
+            AsyncMock(return_value=mock_pool),
+        ) as create_pool:
+            pool = SandboxConnectionPool(config)
+            async with pool.acquire("schema_a"):
+                pass
+            async with pool.acquire("schema_b"):
+                pass
+
+        create_pool.assert_awaited_once()
+        kwargs = create_pool.call_args.kwargs
+        assert kwargs["minsize"] == 2
+        assert kwargs["maxsize"] == 8
+        assert kwargs["pool_recycle"] == 120
+        assert "db" not in kwargs
+
+    async def test_checkout_switches_schema(self, config: SandboxConfig) -> None:
+        conn = make_connection()
+        pool = SandboxConnectionPool(config)
+        pool._pool = make_pool(conn)
+
+        async with pool.acquire("sandbox_user_1_123") as acquired:
+            assert acquired is conn
+
+        conn.select_db.assert_awaited_once_with("sandbox_user_1_123")
+
+    async def test_release_resets_session(self, config: SandboxConfig) -> None:
+        conn = make_connection()
+        pool = SandboxConnectionPool(config)
+        pool._pool = make_pool(conn)
+
+        async with pool.acquire("sandbox_user_1_123"):
+            pass
+
+        conn._execute_command.assert_awaited_once_with(COM_RESET_CONNECTION, b"")
+        pool._pool.release.assert_awaited_once_with(conn)
+        assert conn.closed is False
+
+    async def test_read_only_checkout(self, config: SandboxConfig) -> None:
+        conn = make_connection()
+        conn.query = AsyncMock()
+        conn.rollback = AsyncMock()
+        pool = SandboxConnectionPool(config)
+        pool._pool = make_pool(conn)
+
+        async with pool.acquire("lesson_1_template", read_only=True):
+            conn.query.assert_awaited_once_with("START TRANSACTION READ ONLY")
+            conn.rollback.assert_not_awaited()
+            # A stacked COMMIT must not be able to end the transaction
+            conn._execute_command.assert_awaited_once_with(
+                COMMAND.COM_SET_OPTION, struct.pack("<H", MYSQL_OPTION_MULTI_STATEMENTS_OFF)
+            )
+
+        conn.rollback.assert_awaited_once()
+        pool._pool.release.assert_awaited_once_with(conn)
+        assert conn.closed is False
+
+    async def test_rollback_checkout(self, config: SandboxConfig) -> None:
+        conn = make_connection()
+        conn.query = AsyncMock()
+        conn.rollback = AsyncMock()
+        pool = SandboxConnectionPool(config)
+        pool._pool = make_pool(conn)
+
+        with pytest.raises(aiomysql.IntegrityError):
+            async with pool.acquire("sandbox_user_1_123", rollback=True):
+                conn.query.assert_awaited_once_with("START TRANSACTION")
+                raise aiomysql.IntegrityError(1062, "Duplicate entry")
+
+        # Rolled back even though the statement failed, and the connection is kept
+        conn.rollback.assert_awaited_once()
+        pool._pool.release.assert_awaited_once_with(conn)
+        assert conn.closed is False
+
+    async def test_failed_reset_discards_connection(self, config: SandboxConfig) -> None:
+        conn = make_connection()
+        conn._read_ok_packet.side_effect = aiomysql.OperationalError(2014, "Out of sync")
+        pool = SandboxConnectionPool(config)
+        pool._pool = make_pool(conn)
+
+        async with pool.acquire("sandbox_user_1_123"):
+            pass
+
+        assert conn.closed is True
+        assert pool.get_stats().discarded_connections == 1
+        pool._pool.release.assert_awaited_once_with(conn)
+
+    async def test_statement_error_keeps_connection(self, config: SandboxConfig) -> None:
+        conn = make_connection()
+        pool = SandboxConnectionPool(config)
+        pool._pool = make_pool(conn)
+
+        with pytest.raises(aiomysql.ProgrammingError):
+            async with pool.acquire("sandbox_user_1_123"):
+                raise aiomysql.ProgrammingError(1064, "syntax error")
+
+        assert conn.closed is False
+
+    async def test_client_error_discards_connection(self, config: SandboxConfig) -> None:
+        conn = make_connection()
+        pool = SandboxConnectionPool(config)
+        pool._pool = make_pool(conn)
+
+        with pytest.raises(RuntimeError):
+            async with pool.acquire("sandbox_user_1_123"):
+                raise RuntimeError("boom")
+
+        assert conn.closed is True
+
+    async def test_cancelled_statement_killed(self, config: SandboxConfig) -> None:
+        conn = make_connection()
+        conn.thread_id = Mock(return_value=42)
+        pool = SandboxConnectionPool(config)
+        pool._pool = make_pool(conn)
+
+        side_cursor = AsyncMock()
+        side_conn = MagicMock()
+        side_conn.cursor.return_value.__aenter__ = AsyncMock(return_value=side_cursor)
+        side_conn.cursor.return_value.__aexit__ = AsyncMock(return_value=None)
+
+        async def run_forever() -> None:
+            async with pool.acquire("sandbox_user_1_123"):
+                await asyncio.sleep(10)
+
+        with patch(
+            "app.services.connection_pool.aiomysql.connect", AsyncMock(return_value=side_conn)
+        ):
+            with pytest.raises(TimeoutError):
+                await asyncio.wait_for(run_forever(), timeout=0.01)
+
+        side_cursor.execute.assert_awaited_once_with("KILL QUERY %s", (42,))
+        side_conn.close.assert_called_once()
+        assert conn.closed is True
+        assert pool.get_stats().killed_queries == 1
+
+    async def test_deadline_inside_checkout_kills_statement(self, config: SandboxConfig) -> None:
+        conn = make_connection()
+        conn.thread_id = Mock(return_value=42)
+        pool = SandboxConnectionPool(config)
+        pool._pool = make_pool(conn)
+        side_conn = MagicMock()
+        side_conn.cursor.return_value.__aenter__ = AsyncMock(return_value=AsyncMock())
+        side_conn.cursor.return_value.__aexit__ = AsyncMock(return_value=None)
+
+        # Streaming times out each fetch inside the checkout, so acquire() sees a
+        # TimeoutError rather than a cancellation
+        with patch(
+            "app.services.connection_pool.aiomysql.connect", AsyncMock(return_value=side_conn)
+        ):
+            with pytest.raises(TimeoutError):
+                async with pool.acquire("sandbox_user_1_123"):
+                    await asyncio.wait_for(asyncio.sleep(10), timeout=0.01)
+
+        assert conn.closed is True
+        assert pool.get_stats().killed_queries == 1
+
+    async def test_failed_kill_still_discards(self, config: SandboxConfig) -> None:
+        conn = make_connection()
+        conn.thread_id = Mock(return_value=42)
+        pool = SandboxConnectionPool(config)
+        pool._pool = make_pool(conn)
+
+        async def run_forever() -> None:
+            async with pool.acquire("sandbox_user_1_123"):
+                await asyncio.sleep(10)
+
+        with patch(
+            "app.services.connection_pool.aiomysql.connect",
+            AsyncMock(side_effect=OSError("connection refused")),
+        ):
+            with pytest.raises(TimeoutError):
+                await asyncio.wait_for(run_forever(), timeout=0.01)
+
+        assert conn.closed is True
+        assert pool.get_stats().killed_queries == 0
+
+    async def test_stats_track_waits(self, config: SandboxConfig) -> None:
+        pool = SandboxConnectionPool(config)
+        pool._pool = make_pool(make_connection())
+
+        for _ in range(3):
+            async with pool.acquire():
+                pass
+
+        stats = pool.get_stats()
+        assert stats.acquisitions == 3
+        assert stats.min_size == 2
+        assert stats.max_size == 8
+        assert stats.size == 2
+        assert stats.free == 1
+        assert stats.average_wait_time >= 0
+        assert stats.max_wait_time >= stats.average_wait_time
+
+    async def test_close(self, config: SandboxConfig) -> None:
+        pool = SandboxConnectionPool(config)
+        underlying = make_pool(make_connection())
+        pool._pool = underlying
+
+        await pool.close()
+
+        underlying.close.assert_called_once()
+        assert pool.get_stats().size == 0
+
+    def test_min_size_cannot_exceed_max_size(self) -> None:
+        with pytest.raises(ValidationError):
+            SandboxConfig(pool_min_size=10, pool_max_size=5)
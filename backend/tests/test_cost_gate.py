@@ -0,0 +1,220 @@
+"""
+Tests for the EXPLAIN-based query cost gate.
+"""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import QueryExecuteResponse, SandboxStatus
+from app.services.cost_gate import (
+    QueryCostGate,
+    QueryTooExpensive,
+    estimate_rows_examined,
+    explain_statement,
+)
+from app.services.query_executor import MySQLQueryExecutor
+from app.services.query_scheduler import QueryScheduler
+from app.services.sandbox import Sandbox
+
+
+def table(name: str, examined: int, produced: int, **extra: Any) -> dict[str, Any]:
+    return {
+        "table": {
+            "table_name": name,
+            "access_type": "ALL",
+            "rows_examined_per_scan": examined,
+            "rows_produced_per_join": produced,
+            "cost_info": {"read_cost": "1.00", "eval_cost": "1.00"},
+            **extra,
+        }
+    }
+
+
+SINGLE_TABLE_PLAN = {"query_block": {"select_id": 1, **table("users", 500, 50)}}
+
+CROSS_JOIN_PLAN = {
+    "query_block": {
+        "select_id": 1,
+        "nested_loop": [table("a", 1000, 1000), table("b", 2000, 2000000)],
+    }
+}
+
+DERIVED_TABLE_PLAN = {
+    "query_block": {
+        "select_id": 1,
+        "ordering_operation": {
+            "using_filesort": True,
+            **table(
+                "totals",
+                10,
+                10,
+                materialized_from_subquery={
+                    "query_block": {"select_id": 2, **table("orders", 300, 300)}
+                },
+            ),
+        },
+    }
+}
+
+
+@pytest.fixture
+def config() -> SandboxConfig:
+    return SandboxConfig(
+        enabled=True,
+        mysql_admin_password="test_password",
+        cost_gate_enabled=True,
+        cost_gate_max_rows_examined=100000,
+    )
+
+
+@pytest.fixture
+def gate(config: SandboxConfig) -> QueryCostGate:
+    return QueryCostGate(config)
+
+
+def make_sandbox(user_id: int = 1, lesson_id: int = 1) -> Sandbox:
+    now = datetime.now(UTC)
+    return Sandbox(
+        sandbox_id=f"{user_id}_{lesson_id}_1",
+        user_id=user_id,
+        lesson_id=lesson_id,
+        schema_name=f"sandbox_user_{user_id}_1",
+        status=SandboxStatus.ACTIVE,
+        created_at=now,
+        expires_at=now + timedelta(hours=1),
+        last_accessed_at=now,
+    )
+
+
+def explainer(plan: Any) -> tuple[list[str], Any]:
+    calls: list[str] = []
+
+    async def explain() -> Any:
+        calls.append("explain")
+        if isinstance(plan, Exception):
+            raise plan
+        return plan
+
+    return calls, explain
+
+
+class TestEstimateRowsExamined:
+    def test_single_table(self) -> None:
+        assert estimate_rows_examined(SINGLE_TABLE_PLAN) == 500
+
+    def test_nested_loop_scans_each_table_once_per_prefix_row(self) -> None:
+        assert estimate_rows_examined(CROSS_JOIN_PLAN) == 1000 + 1000 * 2000
+
+    def test_derived_tables_add_their_own_rows(self) -> None:
+        assert estimate_rows_examined(DERIVED_TABLE_PLAN) == 10 + 300
+
+    def test_plan_without_tables(self) -> None:
+        plan = {"query_block": {"select_id": 1, "message": "No tables used"}}
+        assert estimate_rows_examined(plan) == 0
+
+
+class TestExplainStatement:
+    def test_single_statement(self) -> None:
+        assert (
+            explain_statement("SELECT * FROM t;  -- done") == "EXPLAIN FORMAT=JSON SELECT * FROM t"
+        )
+        assert explain_statement("SELECT ';' FROM t") == "EXPLAIN FORMAT=JSON SELECT ';' FROM t"
+
+    def test_stacked_statements_not_explained(self) -> None:
+        assert explain_statement("SELECT 1; DELETE FROM t") is None
+        assert explain_statement(";") is None
+
+
+class TestQueryCostGate:
+    async def test_cheap_query_passes_and_estimate_is_cached(self, gate: QueryCostGate) -> None:
+        calls, explain = explainer(SINGLE_TABLE_PLAN)
+
+        assert await gate.check(make_sandbox(), "SELECT * FROM users", explain) is False
+        # Same fingerprint: whitespace and trailing semicolons do not matter
+        assert await gate.check(make_sandbox(2), "SELECT *\n  FROM users;", explain) is False
+
+        assert calls == ["explain"]
+        stats = gate.get_stats()
+        assert (stats.entries, stats.hits, stats.misses) == (1, 1, 1)
+
+    async def test_expensive_query_rejected_with_hint(self, gate: QueryCostGate) -> None:
+        _, explain = explainer(CROSS_JOIN_PLAN)
+
+        with pytest.raises(QueryTooExpensive, match="about 2,001,000 rows") as excinfo:
+            await gate.check(make_sandbox(), "SELECT * FROM a, b", explain)
+
+        assert "join condition" in str(excinfo.value)
+        assert gate.get_stats().rejected == 1
+
+    async def test_expensive_query_downgraded(self, config: SandboxConfig) -> None:
+        config.cost_gate_action = "downgrade"
+        gate = QueryCostGate(config)
+        _, explain = explainer(CROSS_JOIN_PLAN)
+
+        assert await gate.check(make_sandbox(), "SELECT * FROM a, b", explain) is True
+        assert gate.get_stats().downgraded == 1
+
+    async def test_failed_explain_lets_query_through(self, gate: QueryCostGate) -> None:
+        calls, explain = explainer(RuntimeError("Table 'nope' doesn't exist"))
+
+        assert await gate.check(make_sandbox(), "SELECT * FROM nope", explain) is False
+        assert await gate.check(make_sandbox(), "SELECT * FROM nope", explain) is False
+
+        # Failures are not cached
+        assert len(calls) == 2
+        assert gate.get_stats().explain_failures == 2
+
+
+class TestExecutorCostGate:
+    async def test_stacked_statement_never_sent_to_explain(self, config: SandboxConfig) -> None:
+        executor = MySQLQueryExecutor(config)
+        executor.pool = MagicMock()
+
+        with pytest.raises(ValueError, match="single statement"):
+            await executor._explain(make_sandbox(), "SELECT 1; DELETE FROM users")
+        executor.pool.acquire.assert_not_called()
+
+    async def test_rejected_query_never_executes(self, config: SandboxConfig) -> None:
+        executor = MySQLQueryExecutor(config, cost_gate=QueryCostGate(config))
+        executed: list[str] = []
+
+        async def explain(sandbox: Sandbox, query: str) -> Any:
+            return CROSS_JOIN_PLAN
+
+        async def execute(sandbox: Sandbox, query: str, query_type: str | None) -> Any:
+            executed.append(query)
+
+        executor._explain = explain  # type: ignore[method-assign]
+        executor._execute_with_connection = execute  # type: ignore[method-assign]
+
+        with pytest.raises(QueryTooExpensive):
+            await executor.execute_query(make_sandbox(), "SELECT * FROM a, b")
+        assert executed == []
+
+    async def test_downgraded_query_runs_in_long_lane(self, config: SandboxConfig) -> None:
+        config.cost_gate_action = "downgrade"
+        scheduler = QueryScheduler(config)
+        executor = MySQLQueryExecutor(config, scheduler=scheduler, cost_gate=QueryCostGate(config))
+        running_long: list[int] = []
+
+        async def explain(sandbox: Sandbox, query: str) -> Any:
+            return CROSS_JOIN_PLAN
+
+        async def execute(
+            sandbox: Sandbox, query: str, query_type: str | None
+        ) -> QueryExecuteResponse:
+            running_long.append(scheduler.get_stats().running_long)
+            await asyncio.sleep(0)
+            return QueryExecuteResponse(columns=["1"], rows=[], row_count=0, execution_time=0.0)
+
+        executor._explain = explain  # type: ignore[method-assign]
+        executor._execute_with_connection = execute  # type: ignore[method-assign]
+
+        await executor.execute_query(make_sandbox(), "SELECT * FROM a, b")
+
+        assert running_long == [1]
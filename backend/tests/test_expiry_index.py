@@ -0,0 +1,118 @@
+"""
+Tests for the sandbox expiry index.
+"""
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import SandboxStatus
+from app.services.expiry_index import ExpiryIndex
+from app.services.sandbox import InMemorySandboxManager
+
+NOW = datetime(2024, 1, 1, 12, 0, tzinfo=UTC)
+
+
+def minutes(offset: int) -> datetime:
+    return NOW + timedelta(minutes=offset)
+
+
+class TestExpiryIndex:
+    def test_pop_expired_in_deadline_order(self) -> None:
+        index = ExpiryIndex()
+        index.schedule("late", minutes(-1))
+        index.schedule("early", minutes(-10))
+        index.schedule("future", minutes(10))
+
+        assert index.pop_expired(NOW, limit=10) == ["early", "late"]
+        assert index.next_deadline() == minutes(10)
+        assert len(index) == 1
+
+    def test_limit(self) -> None:
+        index = ExpiryIndex()
+        for i in range(5):
+            index.schedule(f"s{i}", minutes(-i))
+
+        assert index.pop_expired(NOW, limit=2) == ["s4", "s3"]
+        assert len(index) == 3
+
+    def test_rescheduled_entries_are_lazily_skipped(self) -> None:
+        index = ExpiryIndex()
+        index.schedule("a", minutes(-5))
+        index.schedule("a", minutes(5))
+        index.schedule("b", minutes(10))
+        index.schedule("b", minutes(-1))
+
+        assert index.pop_expired(NOW, limit=10) == ["b"]
+        assert index.pop_expired(minutes(6), limit=10) == ["a"]
+
+    def test_discard(self) -> None:
+        index = ExpiryIndex()
+        index.schedule("a", minutes(-5))
+        index.discard("a")
+
+        assert index.pop_expired(NOW, limit=10) == []
+        assert index.next_deadline() is None
+
+    def test_rejected_keys_stay_tracked(self) -> None:
+        index = ExpiryIndex()
+        index.schedule("a", minutes(-5))
+        index.schedule("b", minutes(-1))
+
+        assert index.pop_expired(NOW, limit=10, accept=lambda key: key == "b") == ["b"]
+        assert index.pop_expired(NOW, limit=10) == ["a"]
+
+    def test_heap_compacted(self) -> None:
+        index = ExpiryIndex()
+        for i in range(1000):
+            index.schedule("a", minutes(i))
+
+        assert len(index._heap) <= index.COMPACT_RATIO * len(index) + 64
+        assert index.next_deadline() == minutes(999)
+
+
+class TestInMemorySandboxExpiry:
+    @pytest.fixture
+    def manager(self) -> InMemorySandboxManager:
+        return InMemorySandboxManager(
+            SandboxConfig(
+                enabled=True,
+                mysql_admin_password="test_password",
+                cleanup_batch_size=2,
+            )
+        )
+
+    async def test_cleanup_returns_batches_of_expired(
+        self, manager: InMemorySandboxManager
+    ) -> None:
+        sandboxes = [await manager.create_sandbox(user_id=i, lesson_id=1) for i in range(4)]
+        for i, sandbox in enumerate(sandboxes):
+            sandbox.status = SandboxStatus.ACTIVE
+            if i < 3:
+                sandbox.expires_at = datetime.now(UTC) - timedelta(minutes=i + 1)
+
+        first = await manager.cleanup_expired_sandboxes()
+        second = await manager.cleanup_expired_sandboxes()
+
+        assert first.cleaned_sandbox_ids == [sandboxes[2].sandbox_id, sandboxes[1].sandbox_id]
+        assert second.cleaned_sandbox_ids == [sandboxes[0].sandbox_id]
+        assert await manager.get_sandbox(sandboxes[3].sandbox_id) is not None
+
+    async def test_inactive_expired_sandbox_cleaned_once_active(
+        self, manager: InMemorySandboxManager
+    ) -> None:
+        sandbox = await manager.create_sandbox(user_id=1, lesson_id=1)
+        sandbox.expires_at = datetime.now(UTC) - timedelta(minutes=1)
+
+        assert (await manager.cleanup_expired_sandboxes()).cleaned_count == 0
+
+        sandbox.status = SandboxStatus.ACTIVE
+        assert (await manager.cleanup_expired_sandboxes()).cleaned_count == 1
+
+    async def test_sandbox_uses_slots(self, manager: InMemorySandboxManager) -> None:
+        sandbox = await manager.create_sandbox(user_id=1, lesson_id=1)
+
+        assert not hasattr(sandbox, "__dict__")
+        with pytest.raises(AttributeError):
+            sandbox.unknown = True  # type: ignore[attr-defined]
@@ -0,0 +1,152 @@
+"""
+Tests for sandbox metrics collection and Prometheus rendering.
+"""
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import SandboxMetricsReport
+from app.services.admission import SandboxAdmission
+from app.services.connection_pool import SandboxConnectionPool
+from app.services.metrics import LATENCY_BUCKETS, LatencyHistogram, SandboxMetricsCollector
+from app.services.query_validator import ValidatorRegistry
+from app.services.rate_limiter import RateLimiter
+from app.services.reaper import SandboxReaper
+from app.services.sandbox import (
+    InMemorySandboxManager,
+    MockQueryExecutor,
+    MockSchemaManager,
+    SandboxService,
+)
+
+
+@pytest.fixture
+def config() -> SandboxConfig:
+    return SandboxConfig(enabled=True, mysql_admin_password="test_password")
+
+
+@pytest.fixture
+def metrics(config: SandboxConfig) -> SandboxMetricsCollector:
+    return SandboxMetricsCollector(config)
+
+
+@pytest.fixture
+def sandbox_service(config: SandboxConfig, metrics: SandboxMetricsCollector) -> SandboxService:
+    return SandboxService(
+        config=config,
+        sandbox_manager=InMemorySandboxManager(config),
+        schema_manager=MockSchemaManager(config),
+        query_executor=MockQueryExecutor(config),
+        metrics=metrics,
+    )
+
+
+class TestLatencyHistogram:
+    def test_observations_fall_in_the_first_bucket_that_holds_them(self) -> None:
+        histogram = LatencyHistogram()
+        for seconds in (0.0005, 0.001, 0.002, 0.3, 60.0):
+            histogram.observe(seconds)
+
+        cumulative = histogram.cumulative_counts()
+        assert len(cumulative) == len(LATENCY_BUCKETS) + 1
+        # Bounds are inclusive, as Prometheus "le" buckets are
+        assert cumulative[LATENCY_BUCKETS.index(0.001)] == 2
+        assert cumulative[LATENCY_BUCKETS.index(0.005)] == 3
+        assert cumulative[LATENCY_BUCKETS.index(0.5)] == 4
+        assert cumulative[-1] == histogram.count == 5
+        assert histogram.total == pytest.approx(60.3035)
+
+
+class TestSandboxMetricsCollector:
+    def test_phase_timer_records_duration(self, metrics: SandboxMetricsCollector) -> None:
+        with metrics.time("compare"):
+            pass
+        metrics.observe("compare", 0.2)
+
+        stats = metrics.get_phase_stats()["compare"]
+        assert stats.count == 2
+        assert stats.buckets["0.25"] == 2
+        assert stats.buckets["+Inf"] == 2
+        assert stats.average_seconds == pytest.approx(stats.total_seconds / 2)
+
+    def test_disabled_collector_records_nothing(self, config: SandboxConfig) -> None:
+        config.enable_metrics = False
+        metrics = SandboxMetricsCollector(config)
+
+        with metrics.time("execute"):
+            pass
+        metrics.record_query(0.1)
+        metrics.record_sandbox_created()
+        metrics.record_sandbox_removed(datetime.now(UTC))
+
+        assert metrics.get_phase_stats()["execute"].count == 0
+        snapshot = metrics.get_metrics(active_sandboxes=0)
+        assert snapshot.total_sandboxes_created == 0
+        assert snapshot.total_queries_executed == 0
+
+    def test_sandbox_lifetimes_are_averaged(self, metrics: SandboxMetricsCollector) -> None:
+        now = datetime.now(UTC)
+        metrics.record_sandbox_removed(now - timedelta(seconds=10))
+        metrics.record_sandbox_removed(now - timedelta(seconds=30), expired=True)
+
+        snapshot = metrics.get_metrics(active_sandboxes=3)
+        assert snapshot.active_sandboxes == 3
+        assert snapshot.expired_sandboxes == 1
+        assert snapshot.average_sandbox_lifetime == pytest.approx(20.0, abs=1.0)
+
+
+async def test_sandbox_service_records_lifecycle(
+    sandbox_service: SandboxService, metrics: SandboxMetricsCollector
+) -> None:
+    kept = await sandbox_service.create_sandbox(user_id=1, lesson_id=1)
+    dropped = await sandbox_service.create_sandbox(user_id=2, lesson_id=1)
+    await sandbox_service.execute_query(kept.sandbox_id, "SELECT 1")
+    await sandbox_service.destroy_sandbox(dropped.sandbox_id)
+
+    expired = await sandbox_service.create_sandbox(user_id=3, lesson_id=1)
+    expired.expires_at = datetime.now(UTC) - timedelta(minutes=1)
+    await sandbox_service.cleanup_expired()
+
+    snapshot = metrics.get_metrics(await sandbox_service.sandbox_manager.count_sandboxes())
+    assert snapshot.total_sandboxes_created == 3
+    assert snapshot.active_sandboxes == 1
+    assert snapshot.expired_sandboxes == 1
+    assert snapshot.total_queries_executed == 1
+
+    phases = metrics.get_phase_stats()
+    assert phases["create"].count == 3
+    assert phases["seed"].count == 3
+    assert phases["destroy"].count == 2
+
+
+def test_render_prometheus(
+    config: SandboxConfig, metrics: SandboxMetricsCollector, sandbox_service: SandboxService
+) -> None:
+    metrics.observe("execute", 0.02)
+    metrics.record_query(0.02)
+    report = SandboxMetricsReport(
+        metrics=metrics.get_metrics(active_sandboxes=2),
+        phases=metrics.get_phase_stats(),
+        connection_pool=SandboxConnectionPool(config).get_stats(),
+        validation_cache=ValidatorRegistry(config).get_stats(),
+        rate_limiter=RateLimiter(config).get_stats(),
+        admission=SandboxAdmission(config).get_stats(),
+        reaper=SandboxReaper(config, sandbox_service).get_stats(),
+    )
+
+    text = metrics.render_prometheus(report)
+    lines = text.splitlines()
+
+    assert 'sandbox_phase_duration_seconds_bucket{phase="execute",le="0.01"} 0' in lines
+    assert 'sandbox_phase_duration_seconds_bucket{phase="execute",le="0.025"} 1' in lines
+    assert 'sandbox_phase_duration_seconds_bucket{phase="execute",le="+Inf"} 1' in lines
+    assert 'sandbox_phase_duration_seconds_sum{phase="execute"} 0.02' in lines
+    assert 'sandbox_phase_duration_seconds_count{phase="execute"} 1' in lines
+    assert "sandbox_active_sandboxes 2" in lines
+    assert "sandbox_total_queries_executed 1" in lines
+    assert "sandbox_connection_pool_size 0" in lines
+    assert "sandbox_admission_admitted 0" in lines
+    assert "# TYPE sandbox_reaper_runs untyped" in lines
+    assert text.endswith("\n")
@@ -0,0 +1,198 @@
+"""
+Tests for the orphan sandbox schema collector.
+"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core.sandbox_config import SandboxConfig
+from app.services.orphan_collector import OrphanSchemaCollector
+from app.services.sandbox import (
+    InMemorySandboxManager,
+    MockQueryExecutor,
+    MockSchemaManager,
+    SandboxService,
+    SchemaInfo,
+)
+from app.services.schema_manager import MySQLSchemaManager
+from app.services.warm_pool import WarmSandboxPool
+
+
+@pytest.fixture
+def config() -> SandboxConfig:
+    return SandboxConfig(
+        enabled=True,
+        mysql_admin_password="test_password",
+        orphan_gc_min_age_minutes=10,
+        orphan_gc_max_drops=2,
+    )
+
+
+@pytest.fixture
+def sandbox_manager(config: SandboxConfig) -> InMemorySandboxManager:
+    manager = InMemorySandboxManager(config)
+    # Stands in for a registry shared by all workers, so that orphans may be dropped
+    manager.is_shared = MagicMock(return_value=True)  # type: ignore[method-assign]
+    return manager
+
+
+@pytest.fixture
+def schema_manager(config: SandboxConfig) -> MockSchemaManager:
+    return MockSchemaManager(config)
+
+
+@pytest.fixture
+def collector(
+    config: SandboxConfig,
+    sandbox_manager: InMemorySandboxManager,
+    schema_manager: MockSchemaManager,
+) -> OrphanSchemaCollector:
+    return OrphanSchemaCollector(config, sandbox_manager, schema_manager)
+
+
+class TestOrphanSchemaCollector:
+    async def test_drops_only_unowned_schemas(
+        self,
+        config: SandboxConfig,
+        sandbox_manager: InMemorySandboxManager,
+        schema_manager: MockSchemaManager,
+        collector: OrphanSchemaCollector,
+    ) -> None:
+        config.orphan_gc_min_age_minutes = 0
+        service = SandboxService(
+            config=config,
+            sandbox_manager=sandbox_manager,
+            schema_manager=schema_manager,
+            query_executor=MockQueryExecutor(config),
+        )
+        live = await service.create_sandbox(user_id=1, lesson_id=1)
+        await schema_manager.create_schema("sandbox_user_7_100")
+        await schema_manager.create_sandbox_user("sandbox_user_7_100", "pw", "sandbox_user_7_100")
+        await schema_manager.create_schema("lesson_1_template")
+
+        result = await collector.collect(dry_run=False)
+
+        assert result.scanned_count == 2
+        assert result.orphan_schemas == ["sandbox_user_7_100"]
+        assert await schema_manager.schema_exists("sandbox_user_7_100") is False
+        assert "sandbox_user_7_100" not in schema_manager._users
+        assert await schema_manager.schema_exists(live.schema_name) is True
+        assert await schema_manager.schema_exists("lesson_1_template") is True
+
+    async def test_warm_pool_schemas_kept(
+        self,
+        config: SandboxConfig,
+        sandbox_manager: InMemorySandboxManager,
+        schema_manager: MockSchemaManager,
+    ) -> None:
+        warm_pool = WarmSandboxPool(config, schema_manager)
+        config.warm_pool_lesson_targets = {1: 1}
+        await warm_pool.refill()
+        collector = OrphanSchemaCollector(config, sandbox_manager, schema_manager, warm_pool)
+
+        result = await collector.collect()
+
+        assert result.scanned_count == 1
+        assert result.orphan_count == 0
+
+    async def test_other_workers_warm_schemas_kept(
+        self,
+        config: SandboxConfig,
+        collector: OrphanSchemaCollector,
+        schema_manager: MockSchemaManager,
+    ) -> None:
+        config.orphan_gc_min_age_minutes = 0
+        # Provisioned by another worker's warm pool, so in neither registry
+        warm_name = config.get_warm_schema_name(1, "abcd1234")
+        await schema_manager.create_schema(warm_name)
+
+        config.warm_pool_enabled = True
+        assert (await collector.collect(dry_run=False)).orphan_count == 0
+        assert await schema_manager.schema_exists(warm_name) is True
+
+        config.warm_pool_enabled = False
+        assert (await collector.collect(dry_run=False)).orphan_schemas == [warm_name]
+
+    async def test_young_schemas_kept_and_cap_applied(
+        self, collector: OrphanSchemaCollector, schema_manager: MockSchemaManager
+    ) -> None:
+        schemas = [
+            SchemaInfo("sandbox_user_1_1", size_bytes=100, age_seconds=60),
+            SchemaInfo("sandbox_user_2_1", size_bytes=200, age_seconds=3600),
+            SchemaInfo("sandbox_user_3_1", size_bytes=300, age_seconds=7200),
+            SchemaInfo("sandbox_user_4_1", size_bytes=400, age_seconds=None),
+        ]
+        schema_manager.list_sandbox_schemas = AsyncMock(  # type: ignore[method-assign]
+            return_value=schemas
+        )
+
+        result = await collector.collect(dry_run=False)
+
+        # The schema of unknown age is not an orphan
+        assert result.orphan_count == 2
+        assert result.orphan_schemas == ["sandbox_user_3_1", "sandbox_user_2_1"]
+        assert result.freed_bytes == 500
+
+    async def test_dry_run_by_default(
+        self,
+        config: SandboxConfig,
+        collector: OrphanSchemaCollector,
+        schema_manager: MockSchemaManager,
+    ) -> None:
+        config.orphan_gc_min_age_minutes = 0
+        await schema_manager.create_schema("sandbox_user_7_100")
+
+        result = await collector.collect()
+
+        assert result.dry_run is True
+        assert result.orphan_schemas == ["sandbox_user_7_100"]
+        assert result.dropped_count == 0
+        assert await schema_manager.schema_exists("sandbox_user_7_100") is True
+
+    async def test_failed_drop_counted(
+        self,
+        config: SandboxConfig,
+        collector: OrphanSchemaCollector,
+        schema_manager: MockSchemaManager,
+    ) -> None:
+        config.orphan_gc_min_age_minutes = 0
+        await schema_manager.create_schema("sandbox_user_7_100")
+        schema_manager.drop_schema = AsyncMock(  # type: ignore[method-assign]
+            side_effect=RuntimeError("lock wait timeout")
+        )
+
+        result = await collector.collect(dry_run=False)
+
+        assert result.failed_count == 1
+        assert result.dropped_count == 0
+
+    async def test_drop_refused_without_shared_registry(
+        self, config: SandboxConfig, schema_manager: MockSchemaManager
+    ) -> None:
+        collector = OrphanSchemaCollector(config, InMemorySandboxManager(config), schema_manager)
+        await schema_manager.create_schema("sandbox_user_7_100")
+
+        with pytest.raises(RuntimeError, match="shared by all workers"):
+            await collector.collect(dry_run=False)
+        assert await schema_manager.schema_exists("sandbox_user_7_100") is True
+
+
+async def test_mysql_lists_schemas_in_one_query(config: SandboxConfig) -> None:
+    schema_manager = MySQLSchemaManager(config)
+    cursor = AsyncMock()
+    cursor.fetchall = AsyncMock(return_value=[("sandbox_user_1_1", 16384, 120), ("x", 0, None)])
+    conn = MagicMock()
+    conn.cursor.return_value.__aenter__ = AsyncMock(return_value=cursor)
+    conn.cursor.return_value.__aexit__ = AsyncMock(return_value=None)
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+    schema_manager.pool = pool
+
+    schemas = await schema_manager.list_sandbox_schemas()
+
+    cursor.execute.assert_awaited_once()
+    assert cursor.execute.await_args.args[1] == ("sandbox\\_user\\_%",)
+    assert schemas[0] == SchemaInfo("sandbox_user_1_1", size_bytes=16384, age_seconds=120)
+    assert schemas[1].age_seconds is None
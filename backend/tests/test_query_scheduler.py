@@ -0,0 +1,142 @@
+"""
+Tests for fair-share query scheduling.
+"""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import QueryExecuteResponse, SandboxStatus
+from app.services.query_executor import MySQLQueryExecutor
+from app.services.query_scheduler import QueryScheduler
+from app.services.sandbox import Sandbox
+
+
+@pytest.fixture
+def config() -> SandboxConfig:
+    return SandboxConfig(
+        enabled=True,
+        mysql_admin_password="test_password",
+        scheduler_max_concurrency=1,
+        scheduler_long_lane_slots=1,
+        scheduler_long_query_seconds=0.02,
+    )
+
+
+@pytest.fixture
+def scheduler(config: SandboxConfig) -> QueryScheduler:
+    return QueryScheduler(config)
+
+
+def make_sandbox(user_id: int, lesson_id: int = 1) -> Sandbox:
+    now = datetime.now(UTC)
+    return Sandbox(
+        sandbox_id=f"{user_id}_{lesson_id}_1",
+        user_id=user_id,
+        lesson_id=lesson_id,
+        schema_name=f"sandbox_user_{user_id}_1",
+        status=SandboxStatus.ACTIVE,
+        created_at=now,
+        expires_at=now + timedelta(hours=1),
+        last_accessed_at=now,
+    )
+
+
+async def run(
+    scheduler: QueryScheduler,
+    sandbox: Sandbox,
+    query: str,
+    order: list[str],
+    label: str,
+    release: asyncio.Event | None = None,
+) -> None:
+    async with scheduler.slot(sandbox, query):
+        order.append(label)
+        if release is not None:
+            await release.wait()
+
+
+class TestQueryScheduler:
+    async def test_users_take_turns(self, scheduler: QueryScheduler) -> None:
+        order: list[str] = []
+        release = asyncio.Event()
+        alice, bob = make_sandbox(1), make_sandbox(2)
+
+        first = asyncio.create_task(run(scheduler, alice, "SELECT 1", order, "a1", release))
+        await asyncio.sleep(0)
+        queued = [
+            asyncio.create_task(run(scheduler, alice, "SELECT 1", order, f"a{i}")) for i in (2, 3)
+        ]
+        queued.append(asyncio.create_task(run(scheduler, bob, "SELECT 1", order, "b1")))
+        await asyncio.sleep(0)
+        assert scheduler.get_stats().queued == 3
+
+        release.set()
+        await asyncio.gather(first, *queued)
+
+        assert order == ["a1", "a2", "b1", "a3"]
+        stats = scheduler.get_stats()
+        assert (stats.running, stats.queued, stats.dispatched) == (0, 0, 4)
+
+    async def test_short_queries_pass_queued_long_ones(self, config: SandboxConfig) -> None:
+        config.scheduler_max_concurrency = 2
+        scheduler = QueryScheduler(config)
+        sandbox = make_sandbox(1)
+        slow = "SELECT * FROM a CROSS JOIN b"
+        async with scheduler.slot(sandbox, slow):
+            await asyncio.sleep(0.03)
+
+        order: list[str] = []
+        release = asyncio.Event()
+        running_long = asyncio.create_task(run(scheduler, sandbox, slow, order, "long1", release))
+        await asyncio.sleep(0)
+        queued_long = asyncio.create_task(run(scheduler, make_sandbox(2), slow, order, "long2"))
+        await asyncio.sleep(0)
+        await run(scheduler, make_sandbox(3), "SELECT 1", order, "short")
+
+        assert order == ["long1", "short"]
+        assert scheduler.get_stats().running_long == 1
+
+        release.set()
+        await asyncio.gather(running_long, queued_long)
+        assert order[-1] == "long2"
+
+    async def test_cancelled_waiter_leaves_queue(self, scheduler: QueryScheduler) -> None:
+        order: list[str] = []
+        release = asyncio.Event()
+        first = asyncio.create_task(
+            run(scheduler, make_sandbox(1), "SELECT 1", order, "a", release)
+        )
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(run(scheduler, make_sandbox(2), "SELECT 1", order, "b"))
+        await asyncio.sleep(0)
+
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert scheduler.get_stats().queued == 0
+
+        release.set()
+        await first
+        await run(scheduler, make_sandbox(3), "SELECT 1", order, "c")
+        assert order == ["a", "c"]
+        assert scheduler.get_stats().running == 0
+
+
+async def test_executor_runs_queries_in_scheduler_slots(config: SandboxConfig) -> None:
+    scheduler = QueryScheduler(config)
+    executor = MySQLQueryExecutor(config, scheduler=scheduler)
+    running: list[int] = []
+
+    async def execute(sandbox: Sandbox, query: str, query_type: str | None) -> QueryExecuteResponse:
+        running.append(scheduler.get_stats().running)
+        return QueryExecuteResponse(columns=["1"], rows=[[1]], row_count=1, execution_time=0.0)
+
+    executor._execute_with_connection = execute  # type: ignore[method-assign]
+
+    await executor.execute_query(make_sandbox(1), "SELECT 1")
+
+    assert running == [1]
+    assert scheduler.get_stats().tracked_fingerprints == 1
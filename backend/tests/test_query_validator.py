@@ -8,14 +8,18 @@ Tests cover:
 - SQL injection prevention
 - Lesson-specific query restrictions
 - Clear error messages
+- Validator registry and memoised results
 """
 
+from unittest.mock import patch
+
 import pytest
 
 from app.core.sandbox_config import SandboxConfig
 from app.services.query_validator import (
     LessonQueryPolicy,
     QueryValidator,
+    ValidatorRegistry,
     create_lesson_validator,
     create_module_validator,
 )
@@ -209,6 +213,23 @@ class TestSQLInjectionPrevention:
         # Should catch either stacked queries or DROP
         assert len(result.errors) >= 1
 
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "UPDATE users SET name = 'x'; COMMIT",
+            "SELECT 1; COMMIT; REPLACE INTO users VALUES (1, 'x')",
+            "SELECT 1; SET autocommit = 1",
+            "SELECT 1; START TRANSACTION",
+        ],
+    )
+    def test_any_stacked_statement_blocked(self, validator: QueryValidator, query: str) -> None:
+        result = validator.validate(query)
+        assert result.is_valid is False
+        assert any("Stacked queries" in error for error in result.errors)
+
+    def test_trailing_semicolons_allowed(self, validator: QueryValidator) -> None:
+        assert validator.validate("SELECT * FROM users;;").is_valid is True
+
     def test_comment_bypass_attempt(self, validator: QueryValidator) -> None:
         result = validator.validate("SELECT * FROM users WHERE 1=1 --")
         assert result.is_valid is False
@@ -256,6 +277,24 @@ class TestQueryTypeRestrictions:
         assert result.is_valid is False
         assert "SELECT" in result.errors[0]  # Should mention allowed type
 
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "RENAME TABLE employees TO x",
+            "LOCK TABLES employees WRITE",
+            "OPTIMIZE TABLE employees",
+            "SET autocommit = 1",
+        ],
+    )
+    def test_unclassified_statement_rejected(
+        self, select_only_config: SandboxConfig, query: str
+    ) -> None:
+        validator = QueryValidator(select_only_config)
+        result = validator.validate(query)
+        assert result.is_valid is False
+        assert result.query_type is None
+        assert any("not recognised" in error for error in result.errors)
+
 
 class TestLessonSpecificPolicies:
     """Test lesson-specific query restrictions."""
@@ -331,6 +370,24 @@ class TestWarnings:
         assert len(result.warnings) > 0
         assert any("without WHERE" in warning for warning in result.warnings)
 
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "SELECT * FROM users FOR UPDATE",
+            "INSERT INTO users (id, name) VALUES (1, 'a') ON DUPLICATE KEY UPDATE name = 'a'",
+        ],
+    )
+    def test_update_keyword_in_other_statements_not_warned(
+        self, validator: QueryValidator, query: str
+    ) -> None:
+        result = validator.validate(query)
+        assert result.is_valid is True
+        assert not any("without WHERE" in warning for warning in result.warnings)
+
+    def test_cte_leading_into_delete_warned(self, validator: QueryValidator) -> None:
+        result = validator.validate("WITH old AS (SELECT id FROM users) DELETE FROM users")
+        assert any("DELETE without WHERE" in warning for warning in result.warnings)
+
     def test_long_query_warning(self, validator: QueryValidator) -> None:
         long_query = "SELECT * FROM users" + (" " * 5000)
         result = validator.validate(long_query)
@@ -443,3 +500,69 @@ class TestMultipleErrors:
         result = validator.validate(query)
         assert result.is_valid is False
         assert len(result.errors) >= 2  # Multiple violations
+
+
+class TestValidatorRegistry:
+    """Test per-policy validators and memoised validation results."""
+
+    def test_repeated_query_skips_validation(self, default_config: SandboxConfig) -> None:
+        registry = ValidatorRegistry(default_config)
+        first = registry.validate("SELECT * FROM employees")
+
+        with patch.object(QueryValidator, "validate") as validate:
+            second = registry.validate("SELECT * FROM employees")
+
+        validate.assert_not_called()
+        assert second is first
+        assert registry.get_stats().hits == 1
+
+    def test_lesson_policy_applied(self, default_config: SandboxConfig) -> None:
+        registry = ValidatorRegistry(default_config)
+        registry.set_policy(LessonQueryPolicy(lesson_id=1, allowed_query_types=["SELECT"]))
+
+        assert registry.validate("DELETE FROM employees WHERE id = 1").is_valid is True
+        result = registry.validate("DELETE FROM employees WHERE id = 1", lesson_id=1)
+        assert result.is_valid is False
+        assert "not allowed for this lesson" in result.errors[0]
+
+    def test_module_policy_fallback(self, default_config: SandboxConfig) -> None:
+        registry = ValidatorRegistry(default_config)
+        registry.set_policy(LessonQueryPolicy(module_id=2, allowed_query_types=["SELECT"]))
+
+        validator = registry.get_validator(lesson_id=7, module_id=2)
+
+        assert validator.allowed_query_types == ["SELECT"]
+        assert registry.get_validator(lesson_id=7, module_id=2) is validator
+
+    def test_policy_change_invalidates(self, default_config: SandboxConfig) -> None:
+        registry = ValidatorRegistry(default_config)
+        query = "INSERT INTO employees (name) VALUES ('x')"
+        registry.set_policy(LessonQueryPolicy(lesson_id=1, allowed_query_types=["SELECT"]))
+        assert registry.validate(query, lesson_id=1).is_valid is False
+
+        registry.set_policy(
+            LessonQueryPolicy(lesson_id=1, allowed_query_types=["SELECT", "INSERT"])
+        )
+        assert registry.validate(query, lesson_id=1).is_valid is True
+
+        registry.remove_policy(lesson_id=1)
+        assert registry.get_validator(lesson_id=1) is registry.get_validator()
+
+    def test_policy_requires_target(self, default_config: SandboxConfig) -> None:
+        registry = ValidatorRegistry(default_config)
+
+        with pytest.raises(ValueError):
+            registry.set_policy(LessonQueryPolicy(allowed_query_types=["SELECT"]))
+
+    def test_lru_bounded(self) -> None:
+        config = SandboxConfig(
+            enabled=True, mysql_admin_password="test_password", validation_cache_max_entries=2
+        )
+        registry = ValidatorRegistry(config)
+
+        for i in range(3):
+            registry.validate(f"SELECT {i}")
+
+        assert registry.get_stats().entries == 2
+        registry.validate("SELECT 0")
+        assert registry.get_stats().misses == 4
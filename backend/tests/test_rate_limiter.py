@@ -0,0 +1,133 @@
+"""
+Tests for per-user query rate limiting.
+"""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.sandbox_config import SandboxConfig
+from app.services.rate_limiter import (
+    InMemoryRateLimitBackend,
+    RateLimiter,
+    RateLimitExceeded,
+    SQLRateLimitBackend,
+)
+from app.services.sandbox import (
+    InMemorySandboxManager,
+    MockQueryExecutor,
+    MockSchemaManager,
+    SandboxService,
+)
+
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture
+def config() -> SandboxConfig:
+    return SandboxConfig(
+        enabled=True,
+        mysql_admin_password="test_password",
+        rate_limit_queries_per_minute=60,
+        rate_limit_burst=3,
+    )
+
+
+class TestInMemoryRateLimitBackend:
+    async def test_burst_then_refill(self) -> None:
+        backend = InMemoryRateLimitBackend()
+
+        assert [await backend.acquire(1, NOW, 1.0, 3.0) for _ in range(3)] == [0.0] * 3
+        assert await backend.acquire(1, NOW, 1.0, 3.0) == pytest.approx(1.0)
+        assert await backend.acquire(1, NOW + 1.0, 1.0, 3.0) == 0.0
+        assert await backend.acquire(2, NOW, 1.0, 3.0) == 0.0
+
+    async def test_refilled_buckets_evicted(self) -> None:
+        backend = InMemoryRateLimitBackend()
+        for user_id in range(3):
+            await backend.acquire(user_id, NOW, 1.0, 3.0)
+
+        await backend.acquire(9, NOW + 2.0, 1.0, 3.0)
+        assert len(backend) == 2
+
+        await backend.prune(NOW + 10.0)
+        assert len(backend) == 0
+
+    async def test_prune_skips_past_drained_bucket(self) -> None:
+        backend = InMemoryRateLimitBackend()
+        for _ in range(3):
+            await backend.acquire(1, NOW, 1.0, 3.0)
+        await backend.acquire(2, NOW + 0.5, 1.0, 3.0)
+
+        # User 1 is least recently used but still refilling; user 2 is full again
+        await backend.prune(NOW + 2.0)
+        assert len(backend) == 1
+        # User 1 kept its bucket: two of three tokens back, not a fresh burst
+        retries = [await backend.acquire(1, NOW + 2.0, 1.0, 3.0) for _ in range(3)]
+        assert retries == [0.0, 0.0, pytest.approx(1.0)]
+
+    async def test_rejected_query_takes_no_token(self) -> None:
+        backend = InMemoryRateLimitBackend()
+        for _ in range(3):
+            await backend.acquire(1, NOW, 1.0, 3.0)
+
+        for _ in range(5):
+            assert await backend.acquire(1, NOW + 0.5, 1.0, 3.0) > 0
+        assert await backend.acquire(1, NOW + 1.0, 1.0, 3.0) == 0.0
+
+
+class TestSQLRateLimitBackend:
+    async def test_bucket_shared_across_workers(self, tmp_path: Path) -> None:
+        url = f"sqlite+aiosqlite:///{tmp_path / 'limits.db'}"
+        workers = [SQLRateLimitBackend(create_async_engine(url)) for _ in range(2)]
+        await workers[0].initialize()
+
+        try:
+            results = await asyncio.gather(
+                *(workers[i % 2].acquire(1, NOW, 1.0, 3.0) for i in range(5))
+            )
+            assert sorted(results)[:3] == [0.0] * 3
+            assert all(r > 0 for r in sorted(results)[3:])
+
+            assert await workers[1].acquire(1, NOW + 1.0, 1.0, 3.0) == 0.0
+            await workers[0].prune(NOW + 10.0)
+            assert [await workers[1].acquire(1, NOW + 10.0, 1.0, 3.0) for _ in range(3)] == [
+                0.0
+            ] * 3
+        finally:
+            for worker in workers:
+                await worker.engine.dispose()
+
+
+async def test_rate_limiter_counts_and_raises(config: SandboxConfig) -> None:
+    limiter = RateLimiter(config)
+
+    for _ in range(3):
+        await limiter.acquire(1)
+    with pytest.raises(RateLimitExceeded) as exc_info:
+        await limiter.acquire(1)
+
+    assert 0 < exc_info.value.retry_after <= 1.0
+    stats = limiter.get_stats()
+    assert (stats.allowed, stats.rejected, stats.tracked_users) == (3, 1, 1)
+
+
+async def test_sandbox_service_enforces_limit(config: SandboxConfig) -> None:
+    service = SandboxService(
+        config=config,
+        sandbox_manager=InMemorySandboxManager(config),
+        schema_manager=MockSchemaManager(config),
+        query_executor=MockQueryExecutor(config),
+        rate_limiter=RateLimiter(config),
+    )
+    sandbox = await service.create_sandbox(user_id=1, lesson_id=1)
+
+    for _ in range(3):
+        await service.execute_query(sandbox.sandbox_id, "SELECT * FROM employees")
+
+    with pytest.raises(RateLimitExceeded):
+        await service.execute_query(sandbox.sandbox_id, "SELECT * FROM employees")
+    with pytest.raises(RateLimitExceeded):
+        await anext(service.stream_query(sandbox.sandbox_id, "SELECT * FROM employees"))
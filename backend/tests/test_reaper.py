@@ -0,0 +1,180 @@
+"""
+Tests for expired sandbox teardown and the background reaper.
+"""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import SandboxStatus
+from app.services.reaper import SandboxReaper
+from app.services.sandbox import (
+    InMemorySandboxManager,
+    MockQueryExecutor,
+    MockSchemaManager,
+    Sandbox,
+    SandboxService,
+)
+
+
+@pytest.fixture
+def config() -> SandboxConfig:
+    return SandboxConfig(
+        enabled=True,
+        mysql_admin_password="test_password",
+        cleanup_batch_size=3,
+        cleanup_concurrency=2,
+        cleanup_max_attempts=3,
+        cleanup_retry_backoff_seconds=0,
+    )
+
+
+@pytest.fixture
+def sandbox_manager(config: SandboxConfig) -> InMemorySandboxManager:
+    return InMemorySandboxManager(config)
+
+
+@pytest.fixture
+def schema_manager(config: SandboxConfig) -> MockSchemaManager:
+    return MockSchemaManager(config)
+
+
+@pytest.fixture
+def sandbox_service(
+    config: SandboxConfig,
+    sandbox_manager: InMemorySandboxManager,
+    schema_manager: MockSchemaManager,
+) -> SandboxService:
+    return SandboxService(
+        config=config,
+        sandbox_manager=sandbox_manager,
+        schema_manager=schema_manager,
+        query_executor=MockQueryExecutor(config),
+    )
+
+
+async def create_expired(sandbox_service: SandboxService, count: int) -> list[Sandbox]:
+    sandboxes = []
+    for user_id in range(1, count + 1):
+        sandbox = await sandbox_service.create_sandbox(user_id=user_id, lesson_id=1)
+        sandbox.expires_at = datetime.now(UTC) - timedelta(minutes=user_id)
+        sandboxes.append(sandbox)
+    return sandboxes
+
+
+class TestCleanupExpired:
+    async def test_drops_schemas_and_users(
+        self,
+        sandbox_service: SandboxService,
+        sandbox_manager: InMemorySandboxManager,
+        schema_manager: MockSchemaManager,
+    ) -> None:
+        expired = await create_expired(sandbox_service, 2)
+        live = await sandbox_service.create_sandbox(user_id=99, lesson_id=1)
+
+        result = await sandbox_service.cleanup_expired()
+
+        assert sorted(result.cleaned_sandbox_ids) == sorted(s.sandbox_id for s in expired)
+        assert result.throughput > 0
+        for sandbox in expired:
+            assert await schema_manager.schema_exists(sandbox.schema_name) is False
+            assert await sandbox_manager.get_sandbox(sandbox.sandbox_id) is None
+        assert await schema_manager.schema_exists(live.schema_name) is True
+
+    async def test_batch_size_and_concurrency(
+        self, sandbox_service: SandboxService, schema_manager: MockSchemaManager
+    ) -> None:
+        await create_expired(sandbox_service, 5)
+        running = 0
+        peak = 0
+        drop_schema = schema_manager.drop_schema
+
+        async def slow_drop(schema_name: str) -> None:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            await drop_schema(schema_name)
+
+        schema_manager.drop_schema = slow_drop  # type: ignore[method-assign]
+
+        first = await sandbox_service.cleanup_expired()
+        second = await sandbox_service.cleanup_expired()
+
+        assert first.cleaned_count == 3
+        assert second.cleaned_count == 2
+        assert peak == 2
+
+    async def test_failed_drop_retried(
+        self, sandbox_service: SandboxService, schema_manager: MockSchemaManager
+    ) -> None:
+        await create_expired(sandbox_service, 1)
+        schema_manager.drop_sandbox_user = AsyncMock(  # type: ignore[method-assign]
+            side_effect=[RuntimeError("lock wait timeout"), None]
+        )
+
+        result = await sandbox_service.cleanup_expired()
+
+        assert result.cleaned_count == 1
+        assert result.retried_count == 1
+
+    async def test_failing_sandbox_leased_for_later_run(
+        self,
+        sandbox_service: SandboxService,
+        sandbox_manager: InMemorySandboxManager,
+        schema_manager: MockSchemaManager,
+    ) -> None:
+        [sandbox] = await create_expired(sandbox_service, 1)
+        schema_manager.drop_schema = AsyncMock(  # type: ignore[method-assign]
+            side_effect=RuntimeError("server has gone away")
+        )
+
+        result = await sandbox_service.cleanup_expired()
+
+        assert result.failed_count == 1
+        assert result.retried_count == 2
+        assert sandbox.status == SandboxStatus.EXPIRED
+        assert sandbox.expires_at > datetime.now(UTC)
+        assert (await sandbox_service.cleanup_expired()).failed_count == 0
+
+        sandbox.expires_at = datetime.now(UTC)
+        schema_manager.drop_schema = AsyncMock()  # type: ignore[method-assign]
+        assert (await sandbox_service.cleanup_expired()).cleaned_count == 1
+        assert await sandbox_manager.get_sandbox(sandbox.sandbox_id) is None
+
+
+class TestSandboxReaper:
+    async def test_run_once_records_stats(
+        self, config: SandboxConfig, sandbox_service: SandboxService
+    ) -> None:
+        await create_expired(sandbox_service, 2)
+        reaper = SandboxReaper(config, sandbox_service)
+
+        await reaper.run_once()
+        stats = reaper.get_stats()
+
+        assert stats.runs == 1
+        assert stats.cleaned == 2
+        assert stats.last_run is not None
+        assert stats.last_run.cleaned_count == 2
+
+    async def test_loop_drains_backlog(
+        self, config: SandboxConfig, sandbox_service: SandboxService
+    ) -> None:
+        await create_expired(sandbox_service, 5)
+        reaper = SandboxReaper(config, sandbox_service)
+
+        reaper.start()
+        for _ in range(100):
+            if reaper.get_stats().cleaned == 5:
+                break
+            await asyncio.sleep(0.01)
+        await reaper.stop()
+
+        stats = reaper.get_stats()
+        assert stats.cleaned == 5
+        assert stats.runs == 2
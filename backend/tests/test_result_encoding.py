@@ -0,0 +1,122 @@
+"""
+Tests for the columnar result encoding.
+"""
+
+import json
+from datetime import UTC, date, datetime
+from decimal import Decimal
+
+from pydantic_core import to_json
+
+from app.schemas.sandbox import QueryExecuteResponse
+from app.services.result_encoding import (
+    accepts_columnar,
+    decode_columns,
+    dumps,
+    encode_columns,
+    encode_result,
+)
+
+
+class TestColumnarEncoding:
+    def test_columns_typed(self) -> None:
+        data = encode_columns(
+            ["id", "active", "price", "joined", "born"],
+            [[1, True, Decimal("9.99"), datetime(2024, 1, 1, tzinfo=UTC), date(1990, 5, 1)]],
+        )
+
+        assert [column["type"] for column in data] == [
+            "int",
+            "bool",
+            "decimal",
+            "datetime",
+            "date",
+        ]
+
+    def test_nulls_bitmap(self) -> None:
+        (column,) = encode_columns(["score"], [[None], [10], [None], [30]])
+
+        assert column["type"] == "int"
+        assert column["values"] == [10, 30]
+        assert column["nulls"] == "BQ=="  # bits 0 and 2
+
+    def test_repeated_strings_dictionary_encoded(self) -> None:
+        rows = [["Berlin"], ["Paris"], ["Berlin"], ["Berlin"]]
+        (column,) = encode_columns(["city"], rows)
+
+        assert column["dictionary"] == ["Berlin", "Paris"]
+        assert column["values"] == [0, 1, 0, 0]
+
+    def test_distinct_strings_kept_plain(self) -> None:
+        (column,) = encode_columns(["name"], [["a"], ["b"], ["c"]])
+
+        assert "dictionary" not in column
+        assert column["values"] == ["a", "b", "c"]
+
+    def test_mixed_column(self) -> None:
+        (column,) = encode_columns(["value"], [[1], ["one"]])
+
+        assert column["type"] == "mixed"
+
+    def test_round_trip_matches_row_json(self) -> None:
+        rows = [
+            [1, "Engineering", None, Decimal("1.50")],
+            [2, "Engineering", 3.5, None],
+            [3, "Sales", 4.25, Decimal("2.00")],
+            [4, "Engineering", None, Decimal("3.10")],
+        ]
+        result = QueryExecuteResponse(
+            columns=["id", "department", "rating", "bonus"],
+            rows=rows,
+            row_count=len(rows),
+            execution_time=0.01,
+        )
+
+        payload = json.loads(dumps(encode_result(result)))
+
+        decoded = decode_columns(payload["data"], payload["row_count"])
+        assert decoded == json.loads(to_json(rows))
+
+    def test_spilled_result_reports_encoded_page(self) -> None:
+        rows = [[i, "Engineering"] for i in range(3)]
+        result = QueryExecuteResponse(
+            columns=["id", "department"],
+            rows=rows,
+            row_count=10,
+            execution_time=0.01,
+            result_handle="abc123",
+        )
+
+        payload = json.loads(dumps(encode_result(result)))
+
+        assert payload["row_count"] == 3
+        assert payload["total_rows"] == 10
+        assert payload["next_offset"] == 3
+        assert payload["result_handle"] == "abc123"
+        assert decode_columns(payload["data"], payload["row_count"]) == rows
+
+    def test_unspilled_result_has_no_paging_fields(self) -> None:
+        result = QueryExecuteResponse(columns=["id"], rows=[[1]], row_count=1, execution_time=0.01)
+
+        payload = encode_result(result)
+
+        assert payload["row_count"] == 1
+        assert "total_rows" not in payload
+        assert "next_offset" not in payload
+
+    def test_smaller_than_row_arrays(self) -> None:
+        rows = [[i, "Engineering" if i % 2 else "Sales", None] for i in range(1000)]
+        result = QueryExecuteResponse(
+            columns=["id", "department", "manager_id"],
+            rows=rows,
+            row_count=len(rows),
+            execution_time=0.01,
+        )
+
+        assert len(dumps(encode_result(result))) < len(result.model_dump_json())
+
+    def test_accept_negotiation(self) -> None:
+        assert accepts_columnar("application/vnd.sqlhero.columnar+json")
+        assert accepts_columnar("application/json;q=0.5, application/vnd.sqlhero.columnar+json")
+        assert not accepts_columnar("application/json")
+        assert not accepts_columnar(None)
@@ -0,0 +1,104 @@
+"""
+Tests for order-insensitive result fingerprints.
+"""
+
+from datetime import UTC, date, datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import QueryExecuteResponse
+from app.services.query_executor import MySQLQueryExecutor
+from app.services.result_fingerprint import ExpectedResultCache, fingerprint_result
+
+EXPECTED = {
+    "columns": ["id", "name", "salary"],
+    "rows": [[1, "Alice", 75000.0], [2, "Bob", 65000.0], [3, "Carol", 80000.0]],
+}
+
+
+def make_result(columns: list[str], rows: list[list]) -> QueryExecuteResponse:
+    return QueryExecuteResponse(
+        columns=columns, rows=rows, row_count=len(rows), execution_time=0.001
+    )
+
+
+class TestResultFingerprint:
+    def test_order_insensitive(self) -> None:
+        rows = EXPECTED["rows"]
+
+        assert fingerprint_result(EXPECTED["columns"], rows) == fingerprint_result(
+            ["salary", "id", "name"], list(reversed(rows))
+        )
+
+    def test_duplicates_counted(self) -> None:
+        assert fingerprint_result(["a"], [[1], [1], [2]]) != fingerprint_result(
+            ["a"], [[1], [2], [2]]
+        )
+
+    def test_numbers_equal_by_value(self) -> None:
+        assert fingerprint_result(["a"], [[1, Decimal("2.50")]]) == fingerprint_result(
+            ["a"], [[1.0, 2.5]]
+        )
+
+    def test_values_normalized(self) -> None:
+        assert fingerprint_result(
+            ["a"], [[datetime(2024, 1, 1, tzinfo=UTC), date(2024, 1, 2), b"x"]]
+        ) == fingerprint_result(["a"], [["2024-01-01T00:00:00+00:00", "2024-01-02", "x"]])
+
+    def test_types_not_confused(self) -> None:
+        assert fingerprint_result(["a"], [["1"]]) != fingerprint_result(["a"], [[1]])
+        assert fingerprint_result(["a"], [[None]]) != fingerprint_result(["a"], [["None"]])
+        assert fingerprint_result(["a", "b"], [["ab", ""]]) != fingerprint_result(
+            ["a", "b"], [["a", "b"]]
+        )
+
+
+class TestFingerprintComparison:
+    @pytest.fixture
+    def executor(self) -> MySQLQueryExecutor:
+        return MySQLQueryExecutor(SandboxConfig(mysql_admin_password="test_password"))
+
+    def test_match_skips_full_diff(self, executor: MySQLQueryExecutor) -> None:
+        expected = ExpectedResultCache().put(1, None, EXPECTED)
+        user_result = make_result(EXPECTED["columns"], list(reversed(EXPECTED["rows"])))
+
+        with patch.object(executor, "_normalize_rows") as normalize_rows:
+            matches, differences = executor.compare_results(
+                user_result, EXPECTED, expected_fingerprint=expected.fingerprint
+            )
+
+        assert matches is True
+        assert differences == []
+        normalize_rows.assert_not_called()
+
+    def test_mismatch_falls_back_to_diff(self, executor: MySQLQueryExecutor) -> None:
+        expected = ExpectedResultCache().put(1, None, EXPECTED)
+        rows = [[1, "Alice", 75000.0], [2, "Bob", 65000.0], [4, "Dave", 90000.0]]
+
+        matches, differences = executor.compare_results(
+            make_result(EXPECTED["columns"], rows),
+            EXPECTED,
+            expected_fingerprint=expected.fingerprint,
+        )
+
+        assert matches is False
+        assert any("mismatch" in difference for difference in differences)
+
+
+class TestExpectedResultCache:
+    def test_entry_reused_for_same_version(self) -> None:
+        cache = ExpectedResultCache()
+        version = datetime(2024, 1, 1)
+        entry = cache.put(1, version, EXPECTED)
+
+        assert cache.get(1, version) is entry
+
+    def test_new_version_misses(self) -> None:
+        cache = ExpectedResultCache()
+        cache.put(1, datetime(2024, 1, 1), EXPECTED)
+
+        assert cache.get(1, datetime(2024, 2, 1)) is None
+        assert cache.get(2, datetime(2024, 1, 1)) is None
@@ -0,0 +1,129 @@
+"""
+Tests for the disk-backed store of spilled query results.
+"""
+
+import os
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import SandboxStatus
+from app.services.result_store import ResultStore
+from app.services.sandbox import Sandbox
+
+
+@pytest.fixture
+def config(tmp_path: Path) -> SandboxConfig:
+    return SandboxConfig(
+        enabled=True,
+        mysql_admin_password="test_password",
+        result_spill_dir=str(tmp_path),
+        result_page_size=10,
+        result_disk_budget_mb=1,
+    )
+
+
+@pytest.fixture
+def store(config: SandboxConfig) -> ResultStore:
+    return ResultStore(config)
+
+
+def make_sandbox(sandbox_id: str = "1_1_12345", expires_in: timedelta = timedelta(hours=1)):
+    now = datetime.now(UTC)
+    return Sandbox(
+        sandbox_id=sandbox_id,
+        user_id=1,
+        lesson_id=1,
+        schema_name="sandbox_user_1_12345",
+        status=SandboxStatus.ACTIVE,
+        created_at=now,
+        expires_at=now + expires_in,
+        last_accessed_at=now,
+    )
+
+
+def spill(store: ResultStore, sandbox: Sandbox, row_count: int) -> str:
+    writer = store.open_writer(sandbox, ["id", "name"])
+    writer.write([(i, f"row {i}") for i in range(row_count)])
+    return writer.commit().handle
+
+
+class TestResultStore:
+    def test_pages_by_offset(self, store: ResultStore) -> None:
+        sandbox = make_sandbox()
+        handle = spill(store, sandbox, 25)
+
+        first = store.get_page(sandbox.sandbox_id, handle)
+        assert first.columns == ["id", "name"]
+        assert first.rows[0] == [0, "row 0"]
+        assert len(first.rows) == 10
+        assert first.row_count == 25
+        assert first.next_offset == 10
+
+        last = store.get_page(sandbox.sandbox_id, handle, offset=20)
+        assert last.rows == [[i, f"row {i}"] for i in range(20, 25)]
+        assert last.next_offset is None
+
+    def test_values_serialized_like_responses(self, store: ResultStore) -> None:
+        from decimal import Decimal
+
+        sandbox = make_sandbox()
+        writer = store.open_writer(sandbox, ["price", "created"])
+        writer.write([(Decimal("1.50"), datetime(2024, 1, 1, tzinfo=UTC))])
+        handle = writer.commit().handle
+
+        page = store.get_page(sandbox.sandbox_id, handle)
+        assert page.rows == [["1.50", "2024-01-01T00:00:00Z"]]
+
+    def test_handle_scoped_to_sandbox(self, store: ResultStore) -> None:
+        handle = spill(store, make_sandbox(), 5)
+
+        with pytest.raises(ValueError, match="not found"):
+            store.get_page("other_sandbox", handle)
+
+    def test_result_expires_with_sandbox(self, store: ResultStore) -> None:
+        sandbox = make_sandbox(expires_in=timedelta(seconds=-1))
+        handle = spill(store, sandbox, 5)
+
+        with pytest.raises(ValueError, match="not found|expired"):
+            store.get_page(sandbox.sandbox_id, handle)
+
+    def test_discard_sandbox_removes_files(self, store: ResultStore, tmp_path: Path) -> None:
+        sandbox = make_sandbox()
+        spill(store, sandbox, 5)
+        spill(store, sandbox, 5)
+        assert len(os.listdir(tmp_path)) == 2
+
+        assert store.discard_sandbox(sandbox.sandbox_id) == 2
+
+        assert os.listdir(tmp_path) == []
+        assert store.get_stats().used_bytes == 0
+
+    def test_oldest_results_evicted_over_budget(self, store: ResultStore) -> None:
+        sandbox = make_sandbox()
+        writer = store.open_writer(sandbox, ["data"])
+        writer.write([("x" * 1000,) for _ in range(600)])
+        first = writer.commit().handle
+
+        writer = store.open_writer(sandbox, ["data"])
+        writer.write([("y" * 1000,) for _ in range(600)])
+        second = writer.commit().handle
+
+        stats = store.get_stats()
+        assert stats.results == 1
+        assert stats.evicted == 1
+        assert stats.used_bytes <= stats.budget_bytes
+        with pytest.raises(ValueError):
+            store.get_page(sandbox.sandbox_id, first)
+        assert store.get_page(sandbox.sandbox_id, second).row_count == 600
+
+    def test_result_larger_than_budget_rejected(self, store: ResultStore, tmp_path: Path) -> None:
+        writer = store.open_writer(make_sandbox(), ["data"])
+
+        with pytest.raises(RuntimeError, match="disk budget"):
+            writer.write([("x" * 1000,) for _ in range(2000)])
+
+        writer.abort()
+        assert os.listdir(tmp_path) == []
@@ -0,0 +1,243 @@
+"""
+Tests for lessons that roll back data modification after showing its effect.
+"""
+
+from datetime import UTC, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import SandboxStatus
+from app.services.query_executor import MySQLQueryExecutor
+from app.services.query_validator import LessonQueryPolicy, ValidatorRegistry
+from app.services.sandbox import (
+    InMemorySandboxManager,
+    MockQueryExecutor,
+    MockSchemaManager,
+    Sandbox,
+    SandboxService,
+)
+from app.services.shared_schema import SharedSchemaSandboxManager
+
+ROLLBACK_LESSON = 1
+VERIFIED_LESSON = 2
+WRITABLE_LESSON = 3
+
+VERIFICATION_QUERY = "SELECT id, name FROM users ORDER BY id"
+
+
+@pytest.fixture
+def config() -> SandboxConfig:
+    return SandboxConfig(
+        enabled=True, mysql_admin_password="test_password", shared_schemas_enabled=True
+    )
+
+
+@pytest.fixture
+def validator_registry(config: SandboxConfig) -> ValidatorRegistry:
+    registry = ValidatorRegistry(config)
+    dml = ["SELECT", "INSERT", "UPDATE", "DELETE"]
+    registry.set_policy(
+        LessonQueryPolicy(lesson_id=ROLLBACK_LESSON, allowed_query_types=dml, rollback_dml=True)
+    )
+    registry.set_policy(
+        LessonQueryPolicy(
+            lesson_id=VERIFIED_LESSON,
+            allowed_query_types=dml,
+            rollback_dml=True,
+            verification_query=VERIFICATION_QUERY,
+        )
+    )
+    registry.set_policy(LessonQueryPolicy(lesson_id=WRITABLE_LESSON, allowed_query_types=dml))
+    return registry
+
+
+def make_sandbox(lesson_id: int, schema_name: str = "sandbox_user_1_123") -> Sandbox:
+    now = datetime.now(UTC)
+    return Sandbox(
+        sandbox_id=f"1_{lesson_id}_123",
+        user_id=1,
+        lesson_id=lesson_id,
+        schema_name=schema_name,
+        status=SandboxStatus.ACTIVE,
+        created_at=now,
+        expires_at=now + timedelta(hours=1),
+        last_accessed_at=now,
+    )
+
+
+def attach_mock_pool(executor: MySQLQueryExecutor, rows: list[tuple]) -> AsyncMock:
+    cursor = AsyncMock()
+    cursor.description = [("id",), ("name",)]
+    cursor.rowcount = 1
+    cursor.fetchmany = AsyncMock(side_effect=lambda size: rows[:size])
+
+    conn = MagicMock()
+    conn.cursor = AsyncMock(return_value=cursor)
+
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+    executor.pool = pool
+    return cursor
+
+
+def test_policies_that_leave_data_unchanged(validator_registry: ValidatorRegistry) -> None:
+    assert validator_registry.leaves_data_unchanged(ROLLBACK_LESSON) is True
+    assert validator_registry.leaves_data_unchanged(WRITABLE_LESSON) is False
+
+    validator_registry.set_policy(
+        LessonQueryPolicy(
+            lesson_id=4, allowed_query_types=["SELECT", "INSERT", "CREATE"], rollback_dml=True
+        )
+    )
+    # DDL commits implicitly, so it cannot be rolled back
+    assert validator_registry.leaves_data_unchanged(4) is False
+
+
+class TestExecutorRollback:
+    async def test_dml_and_verification_run_in_rolled_back_transaction(
+        self, config: SandboxConfig, validator_registry: ValidatorRegistry
+    ) -> None:
+        executor = MySQLQueryExecutor(config, validator_registry=validator_registry)
+        cursor = attach_mock_pool(executor, [(1, "renamed"), (2, "b")])
+
+        result = await executor.execute_query(
+            make_sandbox(VERIFIED_LESSON), "UPDATE users SET name = 'renamed' WHERE id = 1"
+        )
+
+        assert executor.pool.acquire.call_args.kwargs == {"read_only": False, "rollback": True}
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        assert statements[1:] == [
+            "UPDATE users SET name = 'renamed' WHERE id = 1",
+            f"{VERIFICATION_QUERY} LIMIT {config.max_result_rows + 1}",
+        ]
+        assert result.columns == ["id", "name"]
+        assert result.rows == [[1, "renamed"], [2, "b"]]
+        assert result.row_count == 2
+        assert result.affected_rows == 1
+
+    async def test_dml_without_verification_query(
+        self, config: SandboxConfig, validator_registry: ValidatorRegistry
+    ) -> None:
+        executor = MySQLQueryExecutor(config, validator_registry=validator_registry)
+        cursor = attach_mock_pool(executor, [])
+
+        result = await executor.execute_query(
+            make_sandbox(ROLLBACK_LESSON), "DELETE FROM users WHERE id = 1"
+        )
+
+        assert executor.pool.acquire.call_args.kwargs["rollback"] is True
+        assert cursor.execute.await_count == 2
+        assert (result.columns, result.rows, result.affected_rows) == ([], [], 1)
+
+    async def test_stacked_commit_rejected(
+        self, config: SandboxConfig, validator_registry: ValidatorRegistry
+    ) -> None:
+        executor = MySQLQueryExecutor(config, validator_registry=validator_registry)
+        attach_mock_pool(executor, [])
+
+        with pytest.raises(ValueError, match="Stacked queries"):
+            await executor.execute_query(
+                make_sandbox(ROLLBACK_LESSON), "UPDATE users SET name = 'x'; COMMIT"
+            )
+        executor.pool.acquire.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "query", ["RENAME TABLE users TO x", "LOCK TABLES users WRITE", "OPTIMIZE TABLE users"]
+    )
+    async def test_unclassified_statement_rejected(
+        self, config: SandboxConfig, validator_registry: ValidatorRegistry, query: str
+    ) -> None:
+        executor = MySQLQueryExecutor(config, validator_registry=validator_registry)
+        attach_mock_pool(executor, [])
+
+        with pytest.raises(ValueError, match="not recognised"):
+            await executor.execute_query(make_sandbox(ROLLBACK_LESSON), query)
+        executor.pool.acquire.assert_not_called()
+
+    def test_only_data_modification_rolled_back(
+        self, config: SandboxConfig, validator_registry: ValidatorRegistry
+    ) -> None:
+        executor = MySQLQueryExecutor(config, validator_registry=validator_registry)
+        sandbox = make_sandbox(ROLLBACK_LESSON)
+
+        for query_type in ("INSERT", "UPDATE", "DELETE", "WITH"):
+            assert executor._rollback_policy(sandbox, query_type) is not None
+        # DDL would commit the transaction implicitly
+        for query_type in ("SELECT", "CREATE", None):
+            assert executor._rollback_policy(sandbox, query_type) is None
+
+    async def test_select_runs_outside_transaction(
+        self, config: SandboxConfig, validator_registry: ValidatorRegistry
+    ) -> None:
+        executor = MySQLQueryExecutor(config, validator_registry=validator_registry)
+        attach_mock_pool(executor, [(1, "a")])
+
+        await executor.execute_query(make_sandbox(VERIFIED_LESSON), "SELECT id, name FROM users")
+
+        assert executor.pool.acquire.call_args.kwargs["rollback"] is False
+
+    async def test_dml_on_shared_schema_is_not_read_only(
+        self, config: SandboxConfig, validator_registry: ValidatorRegistry
+    ) -> None:
+        executor = MySQLQueryExecutor(config, validator_registry=validator_registry)
+        attach_mock_pool(executor, [])
+        template = config.get_template_schema_name(ROLLBACK_LESSON)
+
+        await executor.execute_query(
+            make_sandbox(ROLLBACK_LESSON, template), "INSERT INTO users VALUES (3, 'c')"
+        )
+
+        assert executor.pool.acquire.call_args.args == (template,)
+        assert executor.pool.acquire.call_args.kwargs == {"read_only": False, "rollback": True}
+
+    async def test_stream_sends_verification_rows(
+        self, config: SandboxConfig, validator_registry: ValidatorRegistry
+    ) -> None:
+        executor = MySQLQueryExecutor(config, validator_registry=validator_registry)
+        attach_mock_pool(executor, [(1, "a"), (2, "b")])
+
+        frames = [
+            frame
+            async for frame in executor.stream_query(
+                make_sandbox(VERIFIED_LESSON), "UPDATE users SET name = 'a'"
+            )
+        ]
+
+        assert [frame.type for frame in frames] == ["header", "rows", "trailer"]
+        assert frames[1].rows == [[1, "a"], [2, "b"]]
+        assert frames[-1].affected_rows == 1
+
+
+class TestServiceRollback:
+    @pytest.fixture
+    def sandbox_service(
+        self, config: SandboxConfig, validator_registry: ValidatorRegistry
+    ) -> SandboxService:
+        return SandboxService(
+            config=config,
+            sandbox_manager=SharedSchemaSandboxManager(
+                config, InMemorySandboxManager(config), validator_registry
+            ),
+            schema_manager=MockSchemaManager(config),
+            query_executor=MockQueryExecutor(config, validator_registry),
+        )
+
+    async def test_rollback_dml_keeps_sandbox_clean(self, sandbox_service: SandboxService) -> None:
+        rollback = await sandbox_service.create_sandbox(user_id=1, lesson_id=ROLLBACK_LESSON)
+        writable = await sandbox_service.create_sandbox(user_id=1, lesson_id=WRITABLE_LESSON)
+
+        await sandbox_service.execute_query(rollback.sandbox_id, "DELETE FROM users")
+        await sandbox_service.execute_query(writable.sandbox_id, "DELETE FROM users")
+
+        assert rollback.is_dirty is False
+        assert writable.is_dirty is True
+
+    async def test_rollback_lesson_shares_template_schema(
+        self, sandbox_service: SandboxService, config: SandboxConfig
+    ) -> None:
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=ROLLBACK_LESSON)
+
+        assert sandbox.schema_name == config.get_template_schema_name(ROLLBACK_LESSON)
@@ -0,0 +1,70 @@
+"""
+Tests for row limit injection.
+"""
+
+import pytest
+
+from app.services.row_limit import apply_row_limit
+
+
+class TestApplyRowLimit:
+    @pytest.mark.parametrize(
+        ("query", "expected"),
+        [
+            ("SELECT * FROM t", "SELECT * FROM t LIMIT 100"),
+            ("SELECT * FROM t ORDER BY id DESC;", "SELECT * FROM t ORDER BY id DESC LIMIT 100;"),
+            ("SELECT 1 -- trailing comment", "SELECT 1 LIMIT 100 -- trailing comment"),
+            ("SELECT 'LIMIT 5' AS s FROM t", "SELECT 'LIMIT 5' AS s FROM t LIMIT 100"),
+            (
+                "SELECT a FROM t UNION SELECT b FROM u",
+                "SELECT a FROM t UNION SELECT b FROM u LIMIT 100",
+            ),
+        ],
+    )
+    def test_limit_appended_after_last_clause(self, query: str, expected: str) -> None:
+        assert apply_row_limit(query, 100) == expected
+
+    def test_subquery_and_cte_limits_left_alone(self) -> None:
+        assert apply_row_limit("SELECT * FROM (SELECT * FROM t LIMIT 5) x", 100) == (
+            "SELECT * FROM (SELECT * FROM t LIMIT 5) x LIMIT 100"
+        )
+        assert apply_row_limit("WITH c AS (SELECT 1 LIMIT 1) SELECT * FROM c", 100) == (
+            "WITH c AS (SELECT 1 LIMIT 1) SELECT * FROM c LIMIT 100"
+        )
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "SELECT * FROM t LIMIT 10",
+            "SELECT * FROM t LIMIT 5, 10",
+            "SELECT * FROM t LIMIT 10 OFFSET 5",
+        ],
+    )
+    def test_smaller_user_limit_kept(self, query: str) -> None:
+        assert apply_row_limit(query, 100) == query
+
+    @pytest.mark.parametrize(
+        ("query", "expected"),
+        [
+            ("SELECT * FROM t LIMIT 5000", "SELECT * FROM t LIMIT 100"),
+            ("SELECT * FROM t LIMIT 20, 5000", "SELECT * FROM t LIMIT 20, 100"),
+            ("SELECT * FROM t LIMIT 5000 OFFSET 20", "SELECT * FROM t LIMIT 100 OFFSET 20"),
+        ],
+    )
+    def test_larger_user_limit_lowered(self, query: str, expected: str) -> None:
+        assert apply_row_limit(query, 100) == expected
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "UPDATE t SET a = 1",
+            "WITH c AS (SELECT 1) DELETE FROM t",
+            "(SELECT 1) UNION (SELECT 2)",
+            "SELECT * FROM t FOR UPDATE",
+            "SELECT a INTO @x FROM t",
+            "SELECT 1; SELECT 2",
+            "SELECT * FROM t LIMIT @n",
+        ],
+    )
+    def test_queries_that_cannot_be_limited(self, query: str) -> None:
+        assert apply_row_limit(query, 100) is None
@@ -4,6 +4,7 @@ Integration tests for sandbox SQL executor with timeout, diffing, and security t
 
 import asyncio
 from typing import Any
+from unittest.mock import AsyncMock, MagicMock, Mock
 
 import pytest
 
@@ -11,7 +12,7 @@ from app.core.sandbox_config import SandboxConfig
 from app.schemas.sandbox import QueryExecuteResponse
 from app.services.query_executor import MySQLQueryExecutor
 from app.services.sandbox import InMemorySandboxManager, Sandbox, SandboxStatus
-from app.services.schema_manager import MySQLSchemaManager
+from app.services.schema_manager import MySQLSchemaManager, get_fixture_version
 
 
 class TestQueryExecutorTimeout:
@@ -83,6 +84,204 @@ class TestQueryExecutorTimeout:
         assert result.row_count == 1
 
 
+class TestQueryStreaming:
+    """Test streaming results through an unbuffered cursor."""
+
+    @pytest.fixture
+    def config(self) -> SandboxConfig:
+        return SandboxConfig(
+            enabled=True,
+            mysql_admin_password="test_password",
+            stream_chunk_rows=2,
+            stream_max_rows=4,
+        )
+
+    @pytest.fixture
+    def executor(self, config: SandboxConfig) -> MySQLQueryExecutor:
+        return MySQLQueryExecutor(config)
+
+    @pytest.fixture
+    def mock_sandbox(self) -> Sandbox:
+        from datetime import UTC, datetime, timedelta
+
+        now = datetime.now(UTC)
+        return Sandbox(
+            sandbox_id="test_1_1_12345",
+            user_id=1,
+            lesson_id=1,
+            schema_name="sandbox_user_1_12345",
+            status=SandboxStatus.ACTIVE,
+            created_at=now,
+            expires_at=now + timedelta(hours=1),
+            last_accessed_at=now,
+        )
+
+    def _attach_mock_pool(self, executor: MySQLQueryExecutor, rows: list[tuple]) -> AsyncMock:
+        remaining = list(rows)
+
+        async def fetchmany(size: int) -> list[tuple]:
+            chunk = remaining[:size]
+            del remaining[:size]
+            return chunk
+
+        async def fetchone() -> tuple | None:
+            return remaining.pop(0) if remaining else None
+
+        cursor = AsyncMock()
+        cursor.description = [("id",), ("name",)]
+        cursor.fetchmany = AsyncMock(side_effect=fetchmany)
+        cursor.fetchone = AsyncMock(side_effect=fetchone)
+
+        conn = MagicMock()
+        conn.cursor = AsyncMock(return_value=cursor)
+
+        pool = MagicMock()
+        pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+        pool.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+        executor.pool = pool
+        return cursor
+
+    async def _collect(self, executor: MySQLQueryExecutor, sandbox: Sandbox, query: str) -> list:
+        return [frame async for frame in executor.stream_query(sandbox, query)]
+
+    @pytest.mark.asyncio
+    async def test_stream_frames(self, executor: MySQLQueryExecutor, mock_sandbox: Sandbox):
+        """Test that results arrive as header, row chunks and trailer."""
+        cursor = self._attach_mock_pool(executor, [(1, "a"), (2, "b"), (3, "c")])
+
+        frames = await self._collect(executor, mock_sandbox, "SELECT id, name FROM t")
+
+        assert [frame.type for frame in frames] == ["header", "rows", "rows", "trailer"]
+        assert frames[0].columns == ["id", "name"]
+        assert frames[1].rows == [[1, "a"], [2, "b"]]
+        assert frames[2].rows == [[3, "c"]]
+        assert frames[-1].row_count == 3
+        assert frames[-1].truncated is False
+        cursor.close.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_stream_truncated_at_max_rows(
+        self, executor: MySQLQueryExecutor, mock_sandbox: Sandbox
+    ):
+        """Test that streaming stops at stream_max_rows of a query limited by MySQL."""
+        cursor = self._attach_mock_pool(executor, [(i, str(i)) for i in range(5)])
+
+        frames = await self._collect(executor, mock_sandbox, "SELECT id, name FROM t")
+
+        assert cursor.execute.call_args_list[-1].args[0] == "SELECT id, name FROM t LIMIT 5"
+        assert frames[-1].row_count == 4
+        assert frames[-1].truncated is True
+        # The injected LIMIT leaves nothing unread, so the connection is reused
+        cursor.close.assert_awaited_once()
+        executor.pool.discard.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_stream_truncated_without_limit_drops_connection(
+        self, config: SandboxConfig, mock_sandbox: Sandbox
+    ):
+        """Test that a truncated stream MySQL was not limiting drops the connection."""
+        config.row_limit_injection = False
+        executor = MySQLQueryExecutor(config)
+        cursor = self._attach_mock_pool(executor, [(i, str(i)) for i in range(10)])
+
+        frames = await self._collect(executor, mock_sandbox, "SELECT id, name FROM t")
+
+        assert cursor.execute.call_args_list[-1].args[0] == "SELECT id, name FROM t"
+        assert frames[-1].truncated is True
+        cursor.close.assert_not_awaited()
+        executor.pool.discard.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_execute_truncated_at_max_result_rows(
+        self, config: SandboxConfig, mock_sandbox: Sandbox
+    ):
+        """Test that execution asks MySQL for one row past the limit and reports truncation."""
+        config.max_result_rows = 3
+        config.result_spill_threshold_rows = 3
+        executor = MySQLQueryExecutor(config)
+        cursor = self._attach_mock_pool(executor, [(i, str(i)) for i in range(4)])
+
+        result = await executor._execute_with_connection(
+            mock_sandbox, "SELECT id, name FROM t ORDER BY id", "SELECT"
+        )
+
+        assert cursor.execute.call_args_list[-1].args[0] == (
+            "SELECT id, name FROM t ORDER BY id LIMIT 4"
+        )
+        assert result.row_count == 3
+        assert result.truncated is True
+        cursor.close.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_execute_keeps_smaller_user_limit(
+        self, executor: MySQLQueryExecutor, mock_sandbox: Sandbox
+    ):
+        """Test that a learner's LIMIT below the row limit is left as written."""
+        cursor = self._attach_mock_pool(executor, [(1, "a"), (2, "b")])
+
+        result = await executor._execute_with_connection(
+            mock_sandbox, "SELECT id, name FROM t LIMIT 2", "SELECT"
+        )
+
+        assert cursor.execute.call_args_list[-1].args[0] == "SELECT id, name FROM t LIMIT 2"
+        assert result.truncated is False
+
+    @pytest.mark.asyncio
+    async def test_stream_dml(self, executor: MySQLQueryExecutor, mock_sandbox: Sandbox):
+        """Test that DML statements stream only header and trailer."""
+        cursor = self._attach_mock_pool(executor, [])
+        cursor.rowcount = 3
+
+        frames = await self._collect(executor, mock_sandbox, "UPDATE t SET name = 'x'")
+
+        assert [frame.type for frame in frames] == ["header", "trailer"]
+        assert frames[-1].affected_rows == 3
+
+    @pytest.mark.asyncio
+    async def test_stream_invalid_query(self, executor: MySQLQueryExecutor, mock_sandbox: Sandbox):
+        """Test that invalid queries fail before any frame is produced."""
+        with pytest.raises(ValueError, match="Invalid query"):
+            await self._collect(executor, mock_sandbox, "DROP TABLE t")
+
+    @pytest.mark.asyncio
+    async def test_large_result_spilled(
+        self, config: SandboxConfig, mock_sandbox: Sandbox, tmp_path: Any
+    ):
+        """Test that results above the spill threshold return a page and a handle."""
+        from app.services.result_store import ResultStore
+
+        config.result_spill_threshold_rows = 3
+        config.result_page_size = 2
+        config.result_spill_dir = str(tmp_path)
+        store = ResultStore(config)
+        executor = MySQLQueryExecutor(config, result_store=store)
+        self._attach_mock_pool(executor, [(i, str(i)) for i in range(7)])
+
+        result = await executor._execute_with_connection(mock_sandbox, "SELECT * FROM t", "SELECT")
+
+        assert result.row_count == 7
+        assert result.rows == [[0, "0"], [1, "1"]]
+        assert result.result_handle is not None
+        page = store.get_page(mock_sandbox.sandbox_id, result.result_handle, offset=6)
+        assert page.rows == [[6, "6"]]
+
+    @pytest.mark.asyncio
+    async def test_small_result_inline(
+        self, config: SandboxConfig, mock_sandbox: Sandbox, tmp_path: Any
+    ):
+        """Test that results under the spill threshold are returned inline."""
+        from app.services.result_store import ResultStore
+
+        config.result_spill_dir = str(tmp_path)
+        executor = MySQLQueryExecutor(config, result_store=ResultStore(config))
+        self._attach_mock_pool(executor, [(1, "a"), (2, "b")])
+
+        result = await executor._execute_with_connection(mock_sandbox, "SELECT * FROM t", "SELECT")
+
+        assert result.rows == [[1, "a"], [2, "b"]]
+        assert result.result_handle is None
+
+
 class TestResultComparison:
     """Test order-insensitive result comparison."""
 
@@ -410,6 +609,160 @@ class TestSchemaManager:
         for stmt in statements:
             assert not stmt.strip().startswith("--")
 
+    def _attach_mock_pool(self, schema_manager: MySQLSchemaManager) -> AsyncMock:
+        cursor = AsyncMock()
+        cursor.nextset = AsyncMock(return_value=None)
+
+        conn = MagicMock()
+        conn.escape = Mock(side_effect=lambda value: f"'{value}'")
+        conn.cursor.return_value.__aenter__ = AsyncMock(return_value=cursor)
+        conn.cursor.return_value.__aexit__ = AsyncMock(return_value=None)
+
+        pool = MagicMock()
+        pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+        pool.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+        schema_manager.pool = pool
+        return cursor
+
+    @pytest.mark.asyncio
+    async def test_provision_schema_single_round_trip(self, schema_manager: MySQLSchemaManager):
+        """Test that provisioning sends schema, user, grants and fixtures as one batch."""
+        schema_manager.config.use_template_schemas = False
+        cursor = self._attach_mock_pool(schema_manager)
+
+        await schema_manager.provision_schema(
+            "sandbox_user_1_100", lesson_id=1, username="sandbox_user_1_100", password="secret"
+        )
+
+        cursor.execute.assert_awaited_once()
+        batch = cursor.execute.call_args.args[0]
+        assert batch.index("CREATE DATABASE") < batch.index("CREATE USER")
+        assert batch.index("GRANT") < batch.index("USE `sandbox_user_1_100`")
+        assert batch.index("USE `sandbox_user_1_100`") < batch.index("CREATE TABLE")
+        assert "INSERT INTO employees" in batch
+        assert "FLUSH PRIVILEGES" not in batch
+        schema_manager.pool.acquire.assert_called_once_with()
+
+    @pytest.mark.asyncio
+    async def test_seed_data_uses_schema_connection(self, schema_manager: MySQLSchemaManager):
+        """Test that fixture seeding runs on a connection switched to the sandbox schema."""
+        schema_manager.config.use_template_schemas = False
+        cursor = self._attach_mock_pool(schema_manager)
+
+        await schema_manager.seed_data("sandbox_user_1_100", lesson_id=2)
+
+        schema_manager.pool.acquire.assert_called_once_with("sandbox_user_1_100")
+        cursor.execute.assert_awaited_once()
+        assert "INSERT INTO products" in cursor.execute.call_args.args[0]
+
+    @pytest.mark.asyncio
+    async def test_seed_data_clones_template(self, schema_manager: MySQLSchemaManager):
+        """Test that seeding clones each template table in a single batch."""
+        schema_manager._template_tables[1] = ["departments", "employees"]
+        cursor = self._attach_mock_pool(schema_manager)
+
+        await schema_manager.seed_data("sandbox_user_1_100", lesson_id=1)
+
+        cursor.execute.assert_awaited_once()
+        batch = cursor.execute.call_args.args[0]
+        assert (
+            "CREATE TABLE `sandbox_user_1_100`.`employees` LIKE `lesson_1_template`.`employees`"
+            in batch
+        )
+        assert (
+            "INSERT INTO `sandbox_user_1_100`.`departments` "
+            "SELECT * FROM `lesson_1_template`.`departments`" in batch
+        )
+        assert "VALUES" not in batch
+
+    @pytest.mark.asyncio
+    async def test_template_built_on_first_use(self, schema_manager: MySQLSchemaManager):
+        """Test that a missing template is built once, under a lock, and then reused."""
+        cursor = self._attach_mock_pool(schema_manager)
+        # Template tables, recheck under the lock, staging tables, template tables
+        cursor.fetchall = AsyncMock(side_effect=[[], [], [("employees",)], []])
+        # No recorded version, GET_LOCK
+        cursor.fetchone = AsyncMock(side_effect=[None, (1,)])
+
+        await schema_manager.seed_data("sandbox_user_1_100", lesson_id=1)
+        await schema_manager.seed_data("sandbox_user_1_200", lesson_id=1)
+
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        fixture_batch = next(s for s in statements if "INSERT INTO employees" in s)
+        assert "CREATE DATABASE `lesson_1_template_staging`" in fixture_batch
+        swap_batch = next(s for s in statements if "RENAME TABLE" in s)
+        assert (
+            "RENAME TABLE `lesson_1_template_staging`.`employees` "
+            "TO `lesson_1_template`.`employees`" in swap_batch
+        )
+        assert f"'{get_fixture_version(1)}'" in swap_batch
+        assert "sandbox_meta" in swap_batch
+        assert sum("RELEASE_LOCK" in s for s in statements) == 1
+        assert schema_manager._template_tables[1] == ["employees"]
+
+    @pytest.mark.asyncio
+    async def test_existing_template_not_rebuilt(self, schema_manager: MySQLSchemaManager):
+        """Test that an up-to-date template left by another process is reused as-is."""
+        cursor = self._attach_mock_pool(schema_manager)
+        cursor.fetchall = AsyncMock(return_value=[("employees",)])
+        cursor.fetchone = AsyncMock(return_value=(get_fixture_version(1),))
+
+        await schema_manager.seed_data("sandbox_user_1_100", lesson_id=1)
+
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        assert not any("GET_LOCK" in s or "DROP DATABASE" in s for s in statements)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("recorded", [("0123456789abcdef",), None])
+    async def test_template_from_other_fixture_rebuilt(
+        self, schema_manager: MySQLSchemaManager, recorded: tuple[str] | None
+    ):
+        """Test that a template built from another fixture version is swapped out."""
+        cursor = self._attach_mock_pool(schema_manager)
+        cursor.fetchall = AsyncMock(return_value=[("employees",)])
+        cursor.fetchone = AsyncMock(side_effect=[recorded, (1,), recorded])
+
+        await schema_manager.seed_data("sandbox_user_1_100", lesson_id=1)
+
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        swap_batch = next(s for s in statements if "RENAME TABLE" in s)
+        assert (
+            "`lesson_1_template`.`employees` TO `lesson_1_template_retired`.`employees`, "
+            "`lesson_1_template_staging`.`employees` TO `lesson_1_template`.`employees`"
+            in swap_batch
+        )
+        # The template schema is never dropped, so shared sandboxes keep working
+        assert "DROP DATABASE `lesson_1_template`" not in swap_batch
+        assert "DROP DATABASE IF EXISTS `lesson_1_template`" not in swap_batch
+        assert f"'{get_fixture_version(1)}'" in swap_batch
+
+    @pytest.mark.asyncio
+    async def test_template_rebuilt_by_other_worker_reused(
+        self, schema_manager: MySQLSchemaManager
+    ):
+        """Test that a template another worker rebuilt while this one waited is not rebuilt."""
+        cursor = self._attach_mock_pool(schema_manager)
+        cursor.fetchall = AsyncMock(return_value=[("employees",)])
+        cursor.fetchone = AsyncMock(side_effect=[("stale",), (1,), (get_fixture_version(1),)])
+
+        await schema_manager.seed_data("sandbox_user_1_100", lesson_id=1)
+
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        assert not any("RENAME TABLE" in s for s in statements)
+        assert any("RELEASE_LOCK" in s for s in statements)
+
+    @pytest.mark.asyncio
+    async def test_template_lock_timeout(self, schema_manager: MySQLSchemaManager):
+        """Test that a build gives up when another worker holds the template lock."""
+        cursor = self._attach_mock_pool(schema_manager)
+        cursor.fetchone = AsyncMock(return_value=(0,))
+
+        with pytest.raises(TimeoutError, match="still being built"):
+            await schema_manager.build_template(1)
+
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        assert not any("CREATE DATABASE" in s for s in statements)
+
 
 class TestIntegrationWorkflow:
     """Integration tests for complete sandbox workflow."""
@@ -0,0 +1,162 @@
+"""
+Tests for the SQL-backed sandbox registry.
+
+Each test uses a fresh SQLite file; two managers on the same file stand in for two
+worker processes.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import update
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import SandboxStatus
+from app.services.sandbox import MockQueryExecutor, MockSchemaManager, SandboxService
+from app.services.sandbox_registry import SQLSandboxManager, sandboxes_table
+
+
+@pytest.fixture
+def config(tmp_path: Path) -> SandboxConfig:
+    return SandboxConfig(
+        enabled=True,
+        mysql_admin_password="test_password",
+        registry_url=f"sqlite+aiosqlite:///{tmp_path / 'sandboxes.db'}",
+        max_sandboxes_per_user=2,
+        max_active_sandboxes=3,
+        idle_timeout_minutes=30,
+        max_lifetime_hours=4,
+    )
+
+
+@pytest.fixture
+async def manager(config: SandboxConfig) -> AsyncIterator[SQLSandboxManager]:
+    manager = SQLSandboxManager(config)
+    await manager.initialize()
+    yield manager
+    await manager.close()
+
+
+@pytest.fixture
+async def other_worker(
+    config: SandboxConfig, manager: SQLSandboxManager
+) -> AsyncIterator[SQLSandboxManager]:
+    other = SQLSandboxManager(config)
+    await other.initialize()
+    yield other
+    await other.close()
+
+
+class TestSQLSandboxManager:
+    async def test_visible_to_other_workers(
+        self, manager: SQLSandboxManager, other_worker: SQLSandboxManager
+    ) -> None:
+        sandbox = await manager.create_sandbox(user_id=1, lesson_id=1)
+
+        found = await other_worker.get_sandbox(sandbox.sandbox_id)
+
+        assert found is not None
+        assert found.schema_name == sandbox.schema_name
+        assert found.status == SandboxStatus.CREATING
+        assert found.expires_at == sandbox.expires_at
+        assert [s.sandbox_id for s in await other_worker.get_user_sandboxes(1)] == [
+            sandbox.sandbox_id
+        ]
+
+    async def test_user_quota_across_workers(
+        self, manager: SQLSandboxManager, other_worker: SQLSandboxManager
+    ) -> None:
+        await manager.create_sandbox(user_id=1, lesson_id=1)
+
+        results = await asyncio.gather(
+            manager.create_sandbox(user_id=1, lesson_id=2),
+            other_worker.create_sandbox(user_id=1, lesson_id=3),
+            return_exceptions=True,
+        )
+
+        errors = [r for r in results if isinstance(r, Exception)]
+        assert len(errors) == 1
+        assert "maximum of 2 active sandboxes" in str(errors[0])
+        assert len(await manager.get_user_sandboxes(1)) == 2
+
+    async def test_system_quota(self, manager: SQLSandboxManager) -> None:
+        for user_id in range(3):
+            await manager.create_sandbox(user_id=user_id, lesson_id=1)
+
+        with pytest.raises(ValueError, match="System has reached maximum"):
+            await manager.create_sandbox(user_id=9, lesson_id=1)
+
+    async def test_updates_persisted(
+        self, manager: SQLSandboxManager, other_worker: SQLSandboxManager
+    ) -> None:
+        sandbox = await manager.create_sandbox(user_id=1, lesson_id=1)
+
+        await manager.set_sandbox_status(sandbox.sandbox_id, SandboxStatus.ACTIVE)
+        await manager.mark_sandbox_dirty(sandbox.sandbox_id)
+        await manager.update_sandbox_access(sandbox.sandbox_id)
+
+        found = await other_worker.get_sandbox(sandbox.sandbox_id)
+        assert found is not None
+        assert found.status == SandboxStatus.ACTIVE
+        assert found.is_dirty is True
+        assert found.query_count == 1
+        assert found.expires_at <= datetime.now(UTC) + timedelta(minutes=30)
+
+    async def test_cleanup_expired(self, manager: SQLSandboxManager) -> None:
+        expired = await manager.create_sandbox(user_id=1, lesson_id=1)
+        live = await manager.create_sandbox(user_id=2, lesson_id=1)
+        for sandbox in (expired, live):
+            await manager.set_sandbox_status(sandbox.sandbox_id, SandboxStatus.ACTIVE)
+
+        async with manager.engine.begin() as conn:
+            await conn.execute(
+                update(sandboxes_table)
+                .where(sandboxes_table.c.sandbox_id == expired.sandbox_id)
+                .values(expires_at=datetime(2000, 1, 1))
+            )
+
+        result = await manager.cleanup_expired_sandboxes()
+
+        assert result.cleaned_sandbox_ids == [expired.sandbox_id]
+        assert await manager.get_sandbox(expired.sandbox_id) is None
+        assert await manager.get_sandbox(live.sandbox_id) is not None
+
+    async def test_claim_expired_once_across_workers(
+        self, manager: SQLSandboxManager, other_worker: SQLSandboxManager
+    ) -> None:
+        sandboxes = [await manager.create_sandbox(user_id=i, lesson_id=1) for i in range(3)]
+        async with manager.engine.begin() as conn:
+            await conn.execute(update(sandboxes_table).values(expires_at=datetime(2000, 1, 1)))
+
+        first, second = await asyncio.gather(
+            manager.claim_expired_sandboxes(limit=10, lease_seconds=60),
+            other_worker.claim_expired_sandboxes(limit=10, lease_seconds=60),
+        )
+
+        claimed = [s.sandbox_id for s in first + second]
+        assert sorted(claimed) == sorted(s.sandbox_id for s in sandboxes)
+        assert all(s.status == SandboxStatus.EXPIRED for s in first + second)
+        assert await manager.claim_expired_sandboxes(limit=10, lease_seconds=60) == []
+
+
+async def test_sandbox_service_with_registry(
+    config: SandboxConfig, manager: SQLSandboxManager, other_worker: SQLSandboxManager
+) -> None:
+    def make_service(sandbox_manager: SQLSandboxManager) -> SandboxService:
+        return SandboxService(
+            config=config,
+            sandbox_manager=sandbox_manager,
+            schema_manager=MockSchemaManager(config),
+            query_executor=MockQueryExecutor(config),
+        )
+
+    sandbox = await make_service(manager).create_sandbox(user_id=1, lesson_id=1)
+    worker_b = make_service(other_worker)
+
+    await worker_b.execute_query(sandbox.sandbox_id, "DELETE FROM employees WHERE id = 1")
+    await worker_b.destroy_sandbox(sandbox.sandbox_id)
+
+    assert await manager.get_sandbox(sandbox.sandbox_id) is None
@@ -0,0 +1,49 @@
+"""
+Tests for sandbox endpoint helpers.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.auth import get_current_user
+from app.routers import sandbox as sandbox_router
+
+
+class TestCancelOnDisconnect:
+    async def test_returns_result(self) -> None:
+        http_request = AsyncMock()
+        http_request.is_disconnected.return_value = False
+
+        async def work() -> int:
+            return 42
+
+        assert await sandbox_router._cancel_on_disconnect(http_request, work()) == 42
+
+    async def test_disconnect_cancels_work(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(sandbox_router, "DISCONNECT_POLL_SECONDS", 0.01)
+        http_request = AsyncMock()
+        http_request.is_disconnected.side_effect = [False, True]
+        cleaned_up = False
+
+        async def work() -> None:
+            nonlocal cleaned_up
+            try:
+                await asyncio.sleep(10)
+            finally:
+                cleaned_up = True
+
+        with pytest.raises(HTTPException) as exc_info:
+            await sandbox_router._cancel_on_disconnect(http_request, work())
+
+        assert exc_info.value.status_code == 499
+        assert cleaned_up is True
+
+
+@pytest.mark.parametrize("path", ["/api/v1/sandbox/metrics", "/api/v1/sandbox/admin/metrics"])
+def test_metrics_require_authenticated_user(path: str) -> None:
+    route = next(route for route in sandbox_router.router.routes if route.path == path)
+
+    assert get_current_user in [dependency.call for dependency in route.dependant.dependencies]
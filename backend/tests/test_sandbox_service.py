@@ -382,6 +382,24 @@ class TestSandboxService:
         assert isinstance(result.columns, list)
         assert isinstance(result.rows, list)
 
+    async def test_stream_query(self, sandbox_service: SandboxService) -> None:
+        sandbox_service.config.stream_chunk_rows = 1
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=5)
+
+        frames = [
+            frame
+            async for frame in sandbox_service.stream_query(
+                sandbox.sandbox_id, "SELECT * FROM employees"
+            )
+        ]
+
+        assert frames[0].type == "header"
+        assert [frame.type for frame in frames[1:-1]] == ["rows", "rows"]
+        assert frames[-1].type == "trailer"
+        assert frames[-1].row_count == 2
+        assert frames[-1].truncated is False
+        assert sandbox.query_count == 1
+
     async def test_execute_query_nonexistent_sandbox(self, sandbox_service: SandboxService) -> None:
         with pytest.raises(ValueError) as exc_info:
             await sandbox_service.execute_query("nonexistent_id", "SELECT * FROM employees")
@@ -404,6 +422,17 @@ class TestSandboxService:
         retrieved = await sandbox_service.sandbox_manager.get_sandbox(sandbox.sandbox_id)
         assert retrieved is None
 
+    async def test_destroy_sandbox_drops_provisioned_user(
+        self, sandbox_service: SandboxService, schema_manager: MockSchemaManager
+    ) -> None:
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=5)
+        assert len(schema_manager._users) == 1
+
+        await sandbox_service.destroy_sandbox(sandbox.sandbox_id)
+
+        assert schema_manager._users == set()
+        assert sandbox.schema_name not in schema_manager._schemas
+
     async def test_destroy_nonexistent_sandbox(self, sandbox_service: SandboxService) -> None:
         with pytest.raises(ValueError) as exc_info:
             await sandbox_service.destroy_sandbox("nonexistent_id")
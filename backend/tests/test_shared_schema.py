@@ -0,0 +1,169 @@
+"""
+Tests for shared read-only schemas of SELECT-only lessons.
+"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import SandboxStatus
+from app.services.query_executor import MySQLQueryExecutor
+from app.services.query_validator import LessonQueryPolicy, ValidatorRegistry
+from app.services.sandbox import (
+    InMemorySandboxManager,
+    MockQueryExecutor,
+    MockSchemaManager,
+    SandboxService,
+)
+from app.services.shared_schema import SharedSchemaManager, SharedSchemaSandboxManager
+
+READ_ONLY_LESSON = 1
+WRITABLE_LESSON = 2
+
+
+@pytest.fixture
+def config() -> SandboxConfig:
+    return SandboxConfig(
+        enabled=True, mysql_admin_password="test_password", shared_schemas_enabled=True
+    )
+
+
+@pytest.fixture
+def validator_registry(config: SandboxConfig) -> ValidatorRegistry:
+    registry = ValidatorRegistry(config)
+    registry.set_policy(
+        LessonQueryPolicy(lesson_id=READ_ONLY_LESSON, allowed_query_types=["SELECT"])
+    )
+    return registry
+
+
+@pytest.fixture
+def schema_manager(config: SandboxConfig) -> MockSchemaManager:
+    return MockSchemaManager(config)
+
+
+@pytest.fixture
+def sandbox_service(
+    config: SandboxConfig,
+    validator_registry: ValidatorRegistry,
+    schema_manager: MockSchemaManager,
+) -> SandboxService:
+    return SandboxService(
+        config=config,
+        sandbox_manager=SharedSchemaSandboxManager(
+            config, InMemorySandboxManager(config), validator_registry
+        ),
+        schema_manager=SharedSchemaManager(config, schema_manager),
+        query_executor=MockQueryExecutor(config, validator_registry),
+    )
+
+
+def test_read_only_policies(validator_registry: ValidatorRegistry) -> None:
+    assert validator_registry.is_read_only(READ_ONLY_LESSON) is True
+    assert validator_registry.is_read_only(WRITABLE_LESSON) is False
+
+    validator_registry.set_policy(
+        LessonQueryPolicy(lesson_id=3, allowed_query_types=["SELECT", "WITH"])
+    )
+    # WITH leading into data modification is a write
+    assert validator_registry.is_read_only(3) is False
+
+
+class TestSharedSchemas:
+    async def test_select_only_lesson_shares_template_schema(
+        self,
+        sandbox_service: SandboxService,
+        schema_manager: MockSchemaManager,
+        config: SandboxConfig,
+    ) -> None:
+        first = await sandbox_service.create_sandbox(user_id=1, lesson_id=READ_ONLY_LESSON)
+        second = await sandbox_service.create_sandbox(user_id=2, lesson_id=READ_ONLY_LESSON)
+
+        template_name = config.get_template_schema_name(READ_ONLY_LESSON)
+        assert first.schema_name == second.schema_name == template_name
+        assert first.status == second.status == SandboxStatus.ACTIVE
+        assert schema_manager._schemas == {template_name}
+        assert schema_manager._users == set()
+
+        result = await sandbox_service.execute_query(first.sandbox_id, "SELECT * FROM t")
+        assert result.row_count == 2
+
+    async def test_destroying_shared_sandbox_keeps_schema(
+        self,
+        sandbox_service: SandboxService,
+        schema_manager: MockSchemaManager,
+        config: SandboxConfig,
+    ) -> None:
+        first = await sandbox_service.create_sandbox(user_id=1, lesson_id=READ_ONLY_LESSON)
+        second = await sandbox_service.create_sandbox(user_id=2, lesson_id=READ_ONLY_LESSON)
+
+        await sandbox_service.destroy_sandbox(first.sandbox_id)
+
+        assert config.get_template_schema_name(READ_ONLY_LESSON) in schema_manager._schemas
+        result = await sandbox_service.execute_query(second.sandbox_id, "SELECT 1")
+        assert result.row_count == 2
+
+    async def test_writable_lesson_gets_private_schema(
+        self, sandbox_service: SandboxService, schema_manager: MockSchemaManager
+    ) -> None:
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=WRITABLE_LESSON)
+
+        assert sandbox.schema_name.startswith("sandbox_user_")
+        assert schema_manager._users == {sandbox.schema_name}
+
+        await sandbox_service.destroy_sandbox(sandbox.sandbox_id)
+        assert schema_manager._schemas == set()
+
+    async def test_template_provisioned_once(
+        self, config: SandboxConfig, validator_registry: ValidatorRegistry
+    ) -> None:
+        inner = MockSchemaManager(config)
+        inner.ensure_template = AsyncMock()  # type: ignore[method-assign]
+        service = SandboxService(
+            config=config,
+            sandbox_manager=SharedSchemaSandboxManager(
+                config, InMemorySandboxManager(config), validator_registry
+            ),
+            schema_manager=SharedSchemaManager(config, inner),
+            query_executor=MockQueryExecutor(config, validator_registry),
+        )
+
+        for user_id in range(3):
+            await service.create_sandbox(user_id=user_id, lesson_id=READ_ONLY_LESSON)
+
+        inner.ensure_template.assert_awaited_once_with(READ_ONLY_LESSON)
+
+
+async def test_executor_runs_shared_schema_queries_read_only(config: SandboxConfig) -> None:
+    executor = MySQLQueryExecutor(config)
+    executor.pool = MagicMock()
+    private = MagicMock(schema_name="sandbox_user_1_123")
+    shared = MagicMock(schema_name=config.get_template_schema_name(READ_ONLY_LESSON))
+
+    executor._acquire(private)
+    executor._acquire(shared)
+
+    assert executor.pool.acquire.call_args_list[0].kwargs == {"read_only": False, "rollback": False}
+    assert executor.pool.acquire.call_args_list[1].kwargs == {"read_only": True, "rollback": False}
+
+
+async def test_executor_refuses_non_select_on_shared_schema(config: SandboxConfig) -> None:
+    # A permissive policy, as if it changed while sandboxes share the template
+    registry = ValidatorRegistry(config)
+    registry.set_policy(
+        LessonQueryPolicy(lesson_id=READ_ONLY_LESSON, allowed_query_types=["SELECT", "INSERT"])
+    )
+    executor = MySQLQueryExecutor(config, validator_registry=registry)
+    executor.pool = MagicMock()
+    shared = MagicMock(
+        lesson_id=READ_ONLY_LESSON,
+        schema_name=config.get_template_schema_name(READ_ONLY_LESSON),
+    )
+
+    with pytest.raises(ValueError, match="only SELECT"):
+        await executor.execute_query(shared, "INSERT INTO employees VALUES (9, 'x', 'y', 1)")
+    with pytest.raises(ValueError, match="only SELECT"):
+        async for _ in executor.stream_query(shared, "INSERT INTO employees VALUES (9)"):
+            pass
+    executor.pool.acquire.assert_not_called()
@@ -0,0 +1,74 @@
+"""
+Tests for the single-pass SQL tokenizer.
+"""
+
+from app.services.sql_lexer import (
+    COMMENT,
+    DOT,
+    NUMBER,
+    QUOTED_IDENTIFIER,
+    SEMICOLON,
+    STRING,
+    VARIABLE,
+    WORD,
+    tokenize,
+)
+
+
+def kinds(query: str) -> list[str]:
+    return [token.kind for token in tokenize(query)]
+
+
+class TestTokenize:
+    def test_basic_select(self) -> None:
+        tokens = tokenize("SELECT id FROM employees WHERE salary > 5;")
+
+        assert [token.value for token in tokens] == [
+            "SELECT", "id", "FROM", "employees", "WHERE", "salary", ">", "5", ";",
+        ]  # fmt: skip
+        assert tokens[7].kind == NUMBER
+        assert tokens[8].kind == SEMICOLON
+        assert tokens[2].position == 10
+
+    def test_string_literals(self) -> None:
+        tokens = tokenize("SELECT 'it''s; DROP', \"a\\\"b\" FROM t")
+
+        assert tokens[1].kind == STRING
+        assert tokens[1].value == "'it''s; DROP'"
+        assert tokens[3].kind == STRING
+        assert [token.keyword for token in tokens].count("DROP") == 0
+
+    def test_comments(self) -> None:
+        assert kinds("SELECT 1 -- note") == [WORD, NUMBER, COMMENT]
+        assert kinds("SELECT /* a\nb */ 1") == [WORD, COMMENT, NUMBER]
+        assert kinds("SELECT 1 # note\n") == [WORD, NUMBER, COMMENT]
+
+    def test_double_dash_without_space_is_operator(self) -> None:
+        assert COMMENT not in kinds("SELECT 5--3")
+
+    def test_unterminated_literals_run_to_end(self) -> None:
+        assert kinds("SELECT 'abc") == [WORD, STRING]
+        assert kinds("SELECT /* abc") == [WORD, COMMENT]
+        assert kinds("SELECT `abc") == [WORD, QUOTED_IDENTIFIER]
+
+    def test_variables(self) -> None:
+        tokens = tokenize("SELECT @@version, @total")
+
+        assert tokens[1].kind == VARIABLE
+        assert tokens[1].value == "@@version"
+        assert tokens[3].value == "@total"
+
+    def test_identifiers(self) -> None:
+        tokens = tokenize("SELECT * FROM `MySQL`.user")
+
+        assert tokens[3].identifier == "mysql"
+        assert tokens[4].kind == DOT
+        assert tokens[0].identifier == "select"
+        assert tokens[1].identifier == ""
+
+    def test_linear_on_adversarial_input(self) -> None:
+        query = "SELECT '" + "\\'" * 20000 + " /*" + "*" * 20000
+
+        tokens = tokenize(query)
+
+        assert [token.kind for token in tokens] == [WORD, STRING]
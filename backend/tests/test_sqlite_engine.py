@@ -0,0 +1,227 @@
+"""
+Tests for the in-process SQLite engine.
+"""
+
+import sqlite3
+
+import pytest
+
+from app.core.sandbox_config import SandboxConfig
+from app.services.query_validator import LessonQueryPolicy, ValidatorRegistry
+from app.services.sandbox import (
+    InMemorySandboxManager,
+    MockQueryExecutor,
+    MockSchemaManager,
+    SandboxService,
+)
+from app.services.shared_schema import SharedSchemaManager, SharedSchemaSandboxManager
+from app.services.sqlite_engine import SQLiteQueryExecutor, SQLiteSchemaManager
+
+EMPLOYEES_LESSON = 1
+PRODUCTS_LESSON = 2
+
+ENGINEERS = "SELECT name FROM employees WHERE department = 'Engineering' ORDER BY id"
+
+
+@pytest.fixture
+def config() -> SandboxConfig:
+    return SandboxConfig(enabled=True, mysql_admin_password="test_password")
+
+
+@pytest.fixture
+def validator_registry(config: SandboxConfig) -> ValidatorRegistry:
+    return ValidatorRegistry(config)
+
+
+def make_service(
+    config: SandboxConfig,
+    validator_registry: ValidatorRegistry,
+    fallback: bool = False,
+    shared: bool = False,
+) -> SandboxService:
+    schema_manager = SQLiteSchemaManager(
+        config, validator_registry, fallback=MockSchemaManager(config) if fallback else None
+    )
+    sandbox_manager = InMemorySandboxManager(config)
+    return SandboxService(
+        config=config,
+        sandbox_manager=(
+            SharedSchemaSandboxManager(config, sandbox_manager, validator_registry)
+            if shared
+            else sandbox_manager
+        ),
+        schema_manager=SharedSchemaManager(config, schema_manager) if shared else schema_manager,
+        query_executor=SQLiteQueryExecutor(
+            config,
+            schema_manager,
+            fallback=MockQueryExecutor(config, validator_registry) if fallback else None,
+        ),
+    )
+
+
+@pytest.fixture
+def sandbox_service(config: SandboxConfig, validator_registry: ValidatorRegistry) -> SandboxService:
+    return make_service(config, validator_registry)
+
+
+class TestSQLiteEngine:
+    async def test_query_runs_on_lesson_fixture(self, sandbox_service: SandboxService) -> None:
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=EMPLOYEES_LESSON)
+
+        result = await sandbox_service.execute_query(sandbox.sandbox_id, ENGINEERS)
+
+        assert result.columns == ["name"]
+        assert result.rows == [["John Doe"], ["Bob Johnson"], ["Charlie Wilson"]]
+        assert result.affected_rows is None
+
+    async def test_sandboxes_get_private_copies(self, sandbox_service: SandboxService) -> None:
+        first = await sandbox_service.create_sandbox(user_id=1, lesson_id=EMPLOYEES_LESSON)
+        second = await sandbox_service.create_sandbox(user_id=2, lesson_id=EMPLOYEES_LESSON)
+
+        deleted = await sandbox_service.execute_query(
+            first.sandbox_id, "DELETE FROM employees WHERE department = 'Engineering'"
+        )
+
+        assert deleted.affected_rows == 3
+        assert (await sandbox_service.execute_query(first.sandbox_id, ENGINEERS)).rows == []
+        assert (await sandbox_service.execute_query(second.sandbox_id, ENGINEERS)).row_count == 3
+
+    async def test_result_truncated_at_max_result_rows(
+        self, config: SandboxConfig, sandbox_service: SandboxService
+    ) -> None:
+        config.max_result_rows = 2
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=PRODUCTS_LESSON)
+
+        result = await sandbox_service.execute_query(sandbox.sandbox_id, "SELECT * FROM products")
+
+        assert result.row_count == 2
+        assert result.truncated is True
+
+    async def test_runaway_query_times_out(
+        self, config: SandboxConfig, sandbox_service: SandboxService
+    ) -> None:
+        config.query_timeout_seconds = 1
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=EMPLOYEES_LESSON)
+
+        with pytest.raises(TimeoutError, match="exceeded timeout of 1 seconds"):
+            await sandbox_service.execute_query(
+                sandbox.sandbox_id,
+                "SELECT COUNT(*) FROM " + ", ".join(f"employees e{i}" for i in range(12)),
+            )
+
+        # The connection is free again afterwards
+        result = await sandbox_service.execute_query(sandbox.sandbox_id, ENGINEERS)
+        assert result.row_count == 3
+
+    async def test_rollback_lesson_shows_effect_without_keeping_it(
+        self, config: SandboxConfig, validator_registry: ValidatorRegistry
+    ) -> None:
+        validator_registry.set_policy(
+            LessonQueryPolicy(
+                lesson_id=EMPLOYEES_LESSON,
+                rollback_dml=True,
+                verification_query="SELECT name, salary FROM employees WHERE id = 1",
+            )
+        )
+        service = make_service(config, validator_registry)
+        sandbox = await service.create_sandbox(user_id=1, lesson_id=EMPLOYEES_LESSON)
+
+        result = await service.execute_query(
+            sandbox.sandbox_id, "UPDATE employees SET salary = salary + 5000 WHERE id = 1"
+        )
+
+        assert result.affected_rows == 1
+        assert result.rows == [["John Doe", 80000]]
+        unchanged = await service.execute_query(
+            sandbox.sandbox_id, "SELECT salary FROM employees WHERE id = 1"
+        )
+        assert unchanged.rows == [[75000]]
+
+    async def test_destroy_drops_database(self, sandbox_service: SandboxService) -> None:
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=EMPLOYEES_LESSON)
+        schema_manager = sandbox_service.schema_manager
+
+        assert await schema_manager.schema_exists(sandbox.schema_name)
+        await sandbox_service.destroy_sandbox(sandbox.sandbox_id)
+        assert not await schema_manager.schema_exists(sandbox.schema_name)
+
+
+class TestEngineSelection:
+    async def test_only_opted_in_lessons_run_on_sqlite(
+        self, config: SandboxConfig, validator_registry: ValidatorRegistry
+    ) -> None:
+        validator_registry.set_policy(
+            LessonQueryPolicy(lesson_id=EMPLOYEES_LESSON, engine="sqlite")
+        )
+        service = make_service(config, validator_registry, fallback=True)
+        fallback = service.schema_manager.fallback  # type: ignore[attr-defined]
+
+        sqlite_sandbox = await service.create_sandbox(user_id=1, lesson_id=EMPLOYEES_LESSON)
+        mysql_sandbox = await service.create_sandbox(user_id=2, lesson_id=PRODUCTS_LESSON)
+
+        assert fallback._schemas == {mysql_sandbox.schema_name}
+        assert (await service.execute_query(sqlite_sandbox.sandbox_id, ENGINEERS)).row_count == 3
+        # The mock executor's canned result
+        result = await service.execute_query(mysql_sandbox.sandbox_id, "SELECT * FROM products")
+        assert result.columns == ["id", "name", "value"]
+
+        await service.destroy_sandbox(mysql_sandbox.sandbox_id)
+        await service.destroy_sandbox(sqlite_sandbox.sandbox_id)
+        assert fallback._schemas == set()
+        assert fallback._users == set()
+
+    async def test_read_only_lesson_shares_one_database(
+        self, config: SandboxConfig, validator_registry: ValidatorRegistry
+    ) -> None:
+        validator_registry.set_policy(
+            LessonQueryPolicy(lesson_id=EMPLOYEES_LESSON, allowed_query_types=["SELECT"])
+        )
+        service = make_service(config, validator_registry, shared=True)
+
+        first = await service.create_sandbox(user_id=1, lesson_id=EMPLOYEES_LESSON)
+        second = await service.create_sandbox(user_id=2, lesson_id=EMPLOYEES_LESSON)
+
+        assert first.schema_name == second.schema_name
+        assert (await service.execute_query(second.sandbox_id, ENGINEERS)).row_count == 3
+
+
+class TestSQLiteSandboxing:
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "VACUUM INTO '/tmp/sandbox_copy.db'",
+            "ATTACH DATABASE '/tmp/sandbox_copy.db' AS p",
+            "PRAGMA table_info(employees)",
+        ],
+    )
+    async def test_unclassified_statements_refused(
+        self, sandbox_service: SandboxService, query: str
+    ) -> None:
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=EMPLOYEES_LESSON)
+
+        with pytest.raises(ValueError, match="Invalid query"):
+            await sandbox_service.execute_query(sandbox.sandbox_id, query)
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "SELECT * FROM pragma_table_info('employees')",
+            "SELECT * FROM sqlite_temp_master",
+        ],
+    )
+    async def test_authorizer_denies_beyond_rows(
+        self, sandbox_service: SandboxService, query: str
+    ) -> None:
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=EMPLOYEES_LESSON)
+
+        with pytest.raises(RuntimeError, match="not authorized|prohibited"):
+            await sandbox_service.execute_query(sandbox.sandbox_id, query)
+
+    def test_databases_cannot_attach(
+        self, config: SandboxConfig, validator_registry: ValidatorRegistry
+    ) -> None:
+        schema_manager = SQLiteSchemaManager(config, validator_registry)
+        connection = schema_manager._copy_template(EMPLOYEES_LESSON)
+
+        with pytest.raises(sqlite3.OperationalError, match="too many attached databases"):
+            connection.execute("ATTACH DATABASE ':memory:' AS p")
@@ -0,0 +1,218 @@
+"""
+Tests for the shared query result and verdict cache.
+"""
+
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import QueryExecuteResponse
+from app.services.query_validator import LessonQueryPolicy
+from app.services.sandbox import (
+    InMemorySandboxManager,
+    MockQueryExecutor,
+    MockSchemaManager,
+    SandboxService,
+)
+from app.services.verdict_cache import VerdictCache, is_deterministic, normalize_query
+
+
+@pytest.fixture
+def config() -> SandboxConfig:
+    return SandboxConfig(
+        enabled=True,
+        mysql_admin_password="test_password",
+        verdict_cache_max_entries=3,
+        verdict_cache_max_result_rows=5,
+        verdict_cache_max_total_rows=8,
+    )
+
+
+@pytest.fixture
+def cache(config: SandboxConfig) -> VerdictCache:
+    return VerdictCache(config)
+
+
+@pytest.fixture
+def query_executor(config: SandboxConfig) -> MockQueryExecutor:
+    executor = MockQueryExecutor(config)
+    executor.execute_query = AsyncMock(wraps=executor.execute_query)  # type: ignore[method-assign]
+    return executor
+
+
+@pytest.fixture
+def sandbox_service(
+    config: SandboxConfig, cache: VerdictCache, query_executor: MockQueryExecutor
+) -> SandboxService:
+    return SandboxService(
+        config=config,
+        sandbox_manager=InMemorySandboxManager(config),
+        schema_manager=MockSchemaManager(config),
+        query_executor=query_executor,
+        verdict_cache=cache,
+    )
+
+
+def make_result(row_count: int) -> QueryExecuteResponse:
+    return QueryExecuteResponse(
+        columns=["id"],
+        rows=[[i] for i in range(row_count)],
+        row_count=row_count,
+        execution_time=0.001,
+    )
+
+
+class TestNormalizeQuery:
+    def test_whitespace_and_semicolon(self) -> None:
+        assert normalize_query("SELECT *\n  FROM   employees ;") == "SELECT * FROM employees"
+
+    def test_literals_untouched(self) -> None:
+        assert (
+            normalize_query("SELECT  'a  b' ,  `my  col`  FROM t")
+            == "SELECT 'a  b' , `my  col` FROM t"
+        )
+
+
+class TestIsDeterministic:
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "SELECT NOW()",
+            "SELECT id FROM employees ORDER BY RAND() LIMIT 1",
+            "SELECT uuid()",
+            "SELECT CURRENT_TIMESTAMP",
+            "SELECT CONNECTION_ID ()",
+        ],
+    )
+    def test_nondeterministic_functions(self, query: str) -> None:
+        assert is_deterministic(query) is False
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "SELECT * FROM employees",
+            "SELECT 'NOW()' AS label",
+            "SELECT user, `now` FROM accounts",
+        ],
+    )
+    def test_deterministic_queries(self, query: str) -> None:
+        assert is_deterministic(query) is True
+
+
+class TestVerdictCache:
+    def test_lru_eviction(self, cache: VerdictCache) -> None:
+        keys = [cache.make_key(1, "v1", f"SELECT {i}") for i in range(4)]
+        for key in keys[:3]:
+            cache.put(key, make_result(1))
+
+        cache.get(keys[0])
+        cache.put(keys[3], make_result(1))
+
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) is not None
+        assert cache.get_stats().evictions == 1
+
+    def test_size_limits(self, cache: VerdictCache) -> None:
+        too_large = cache.make_key(1, "v1", "SELECT big")
+        cache.put(too_large, make_result(6))
+        assert cache.get(too_large) is None
+
+        first = cache.make_key(1, "v1", "SELECT a")
+        second = cache.make_key(1, "v1", "SELECT b")
+        cache.put(first, make_result(5))
+        cache.put(second, make_result(5))
+
+        assert cache.get(first) is None
+        assert cache.get_stats().cached_rows == 5
+
+    def test_verdicts_per_expected_version(self, cache: VerdictCache) -> None:
+        key = cache.make_key(1, "v1", "SELECT 1")
+        cache.put(key, make_result(1))
+        cache.put_verdict(key, "2024-01-01", True, [])
+
+        assert cache.get_verdict(key, "2024-01-01") == (True, [])
+        assert cache.get_verdict(key, "2024-02-01") is None
+
+    def test_template_version_in_key(self, cache: VerdictCache) -> None:
+        cache.put(cache.make_key(1, "v1", "SELECT 1"), make_result(1))
+
+        assert cache.get(cache.make_key(1, "v2", "SELECT 1")) is None
+        assert cache.get(cache.make_key(2, "v1", "SELECT 1")) is None
+
+
+class TestSandboxServiceVerdictCache:
+    async def test_result_shared_between_sandboxes(
+        self,
+        sandbox_service: SandboxService,
+        query_executor: MockQueryExecutor,
+        cache: VerdictCache,
+    ) -> None:
+        first = await sandbox_service.create_sandbox(user_id=1, lesson_id=1)
+        second = await sandbox_service.create_sandbox(user_id=2, lesson_id=1)
+
+        await sandbox_service.execute_query(first.sandbox_id, "SELECT * FROM employees")
+        result = await sandbox_service.execute_query(second.sandbox_id, "SELECT *  FROM employees;")
+
+        assert result.row_count == 2
+        assert query_executor.execute_query.await_count == 1
+        assert second.query_count == 1
+        assert cache.get_stats().hits == 1
+
+    async def test_dml_marks_sandbox_dirty(
+        self, sandbox_service: SandboxService, query_executor: MockQueryExecutor
+    ) -> None:
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=1)
+        await sandbox_service.execute_query(sandbox.sandbox_id, "SELECT * FROM employees")
+
+        await sandbox_service.execute_query(
+            sandbox.sandbox_id, "UPDATE employees SET salary = 0 WHERE id = 1"
+        )
+        await sandbox_service.execute_query(sandbox.sandbox_id, "SELECT * FROM employees")
+
+        assert sandbox.is_dirty is True
+        assert query_executor.execute_query.await_count == 3
+
+    async def test_non_select_not_cached_and_marks_dirty(
+        self, sandbox_service: SandboxService
+    ) -> None:
+        query = (
+            "WITH e AS (SELECT id FROM employees) DELETE FROM employees WHERE id IN "
+            "(SELECT id FROM e)"
+        )
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=1)
+        policy = LessonQueryPolicy(lesson_id=1, allowed_query_types=["SELECT", "DELETE", "WITH"])
+        sandbox_service.query_executor.validator_registry.set_policy(policy)
+
+        assert await sandbox_service.get_cache_key(sandbox, query) is None
+        assert sandbox.is_dirty is True
+
+    async def test_cache_key_computed_once(
+        self, sandbox_service: SandboxService, cache: VerdictCache
+    ) -> None:
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=1)
+        sandbox_service.get_cache_key = AsyncMock(  # type: ignore[method-assign]
+            wraps=sandbox_service.get_cache_key
+        )
+
+        _, cache_key = await sandbox_service.execute_query_with_cache_key(
+            sandbox.sandbox_id, "SELECT * FROM employees"
+        )
+
+        sandbox_service.get_cache_key.assert_awaited_once()
+        assert cache_key == cache.make_key(1, "mock_1", "SELECT * FROM employees")
+
+    async def test_nondeterministic_query_not_shared(
+        self, sandbox_service: SandboxService, query_executor: MockQueryExecutor
+    ) -> None:
+        first = await sandbox_service.create_sandbox(user_id=1, lesson_id=1)
+        second = await sandbox_service.create_sandbox(user_id=2, lesson_id=1)
+
+        for sandbox in (first, second):
+            _, cache_key = await sandbox_service.execute_query_with_cache_key(
+                sandbox.sandbox_id, "SELECT id, NOW() FROM employees"
+            )
+            assert cache_key is None
+
+        assert query_executor.execute_query.await_count == 2
+        assert first.is_dirty is False
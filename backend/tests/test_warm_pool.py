@@ -0,0 +1,199 @@
+import pytest
+
+from app.core.sandbox_config import SandboxConfig
+from app.schemas.sandbox import SandboxStatus
+from app.services.sandbox import (
+    InMemorySandboxManager,
+    MockQueryExecutor,
+    MockSchemaManager,
+    SandboxService,
+)
+from app.services.warm_pool import WarmSandboxPool
+
+
+@pytest.fixture
+def sandbox_config() -> SandboxConfig:
+    return SandboxConfig(
+        enabled=True,
+        mysql_admin_password="test_password",
+        max_sandboxes_per_user=3,
+        warm_pool_enabled=True,
+        warm_pool_max_per_lesson=3,
+        warm_pool_max_total=5,
+        warm_pool_refill_batch=10,
+    )
+
+
+@pytest.fixture
+def schema_manager(sandbox_config: SandboxConfig) -> MockSchemaManager:
+    return MockSchemaManager(sandbox_config)
+
+
+@pytest.fixture
+def warm_pool(sandbox_config: SandboxConfig, schema_manager: MockSchemaManager) -> WarmSandboxPool:
+    return WarmSandboxPool(sandbox_config, schema_manager)
+
+
+@pytest.fixture
+def sandbox_service(
+    sandbox_config: SandboxConfig,
+    schema_manager: MockSchemaManager,
+    warm_pool: WarmSandboxPool,
+) -> SandboxService:
+    return SandboxService(
+        config=sandbox_config,
+        sandbox_manager=InMemorySandboxManager(sandbox_config),
+        schema_manager=schema_manager,
+        query_executor=MockQueryExecutor(sandbox_config),
+        warm_pool=warm_pool,
+    )
+
+
+class TestWarmSandboxPool:
+    async def test_no_demand_no_provisioning(self, warm_pool: WarmSandboxPool) -> None:
+        assert await warm_pool.refill() == 0
+        assert warm_pool.get_stats().ready == 0
+
+    async def test_configured_targets_are_provisioned(
+        self, sandbox_config: SandboxConfig, schema_manager: MockSchemaManager
+    ) -> None:
+        sandbox_config.warm_pool_lesson_targets = {1: 2}
+        pool = WarmSandboxPool(sandbox_config, schema_manager)
+
+        assert await pool.refill() == 2
+
+        stats = pool.get_stats()
+        assert stats.ready_by_lesson == {1: 2}
+        assert len(schema_manager._schemas) == 2
+        assert all(sandbox_config.is_sandbox_schema(name) for name in schema_manager._schemas)
+
+    async def test_target_follows_demand_with_cap(self, warm_pool: WarmSandboxPool) -> None:
+        for _ in range(5):
+            assert warm_pool.claim(lesson_id=7) is None
+
+        assert warm_pool.get_target(7) == 3
+        assert await warm_pool.refill() == 3
+        assert await warm_pool.refill() == 0
+
+    async def test_total_cap_and_refill_batch(
+        self, sandbox_config: SandboxConfig, schema_manager: MockSchemaManager
+    ) -> None:
+        sandbox_config.warm_pool_refill_batch = 2
+        pool = WarmSandboxPool(sandbox_config, schema_manager)
+        for lesson_id in (1, 2, 3):
+            for _ in range(3):
+                pool.claim(lesson_id)
+
+        assert await pool.refill() == 2
+        assert await pool.refill() == 2
+        assert await pool.refill() == 1
+        assert pool.get_stats().ready == sandbox_config.warm_pool_max_total
+
+    async def test_claim_returns_ready_schema(self, warm_pool: WarmSandboxPool) -> None:
+        warm_pool.claim(lesson_id=1)
+        await warm_pool.refill()
+
+        warm_schema = warm_pool.claim(lesson_id=1)
+
+        assert warm_schema is not None
+        assert warm_schema.lesson_id == 1
+        stats = warm_pool.get_stats()
+        assert stats.hits == 1
+        assert stats.misses == 1
+        assert stats.hit_rate == 0.5
+
+    async def test_failed_provisioning_counted(
+        self, warm_pool: WarmSandboxPool, schema_manager: MockSchemaManager
+    ) -> None:
+        async def failing_provision(*args: object, **kwargs: object) -> None:
+            raise RuntimeError("MySQL unavailable")
+
+        schema_manager.provision_schema = failing_provision  # type: ignore[method-assign]
+        warm_pool.claim(lesson_id=1)
+
+        assert await warm_pool.refill() == 0
+        stats = warm_pool.get_stats()
+        assert stats.failures == 1
+        assert stats.pending == 0
+
+    async def test_stop_drops_unclaimed_schemas(
+        self, warm_pool: WarmSandboxPool, schema_manager: MockSchemaManager
+    ) -> None:
+        warm_pool.claim(lesson_id=1)
+        await warm_pool.refill()
+        assert schema_manager._schemas
+
+        await warm_pool.stop()
+
+        assert schema_manager._schemas == set()
+        assert warm_pool.owned_schema_names() == set()
+
+
+class TestSandboxServiceWarmPool:
+    async def test_create_sandbox_claims_warm_schema(
+        self,
+        sandbox_service: SandboxService,
+        warm_pool: WarmSandboxPool,
+        schema_manager: MockSchemaManager,
+    ) -> None:
+        warm_pool.claim(lesson_id=1)
+        await warm_pool.refill()
+        ready_names = warm_pool.owned_schema_names()
+
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=1)
+
+        assert sandbox.status == SandboxStatus.ACTIVE
+        assert sandbox.schema_name in ready_names
+        assert warm_pool.get_stats().hits == 1
+
+        await sandbox_service.destroy_sandbox(sandbox.sandbox_id)
+        assert sandbox.schema_name not in schema_manager._schemas
+
+    async def test_create_sandbox_falls_back_to_inline(
+        self, sandbox_service: SandboxService, sandbox_config: SandboxConfig
+    ) -> None:
+        sandbox = await sandbox_service.create_sandbox(user_id=1, lesson_id=2)
+
+        assert sandbox.status == SandboxStatus.ACTIVE
+        assert sandbox.schema_name.startswith(sandbox_config.schema_prefix + "1_")
+
+    async def test_claimed_schema_restored_when_quota_exceeded(
+        self,
+        sandbox_service: SandboxService,
+        warm_pool: WarmSandboxPool,
+        sandbox_config: SandboxConfig,
+    ) -> None:
+        sandbox_config.max_sandboxes_per_user = 1
+        await sandbox_service.create_sandbox(user_id=1, lesson_id=2)
+        warm_pool.claim(lesson_id=1)
+        await warm_pool.refill()
+        ready_before = warm_pool.get_stats().ready
+
+        with pytest.raises(ValueError, match="maximum"):
+            await sandbox_service.create_sandbox(user_id=1, lesson_id=1)
+
+        assert warm_pool.get_stats().ready == ready_before
+
+    async def test_filtered_lessons_skip_the_pool(
+        self, sandbox_config: SandboxConfig, schema_manager: MockSchemaManager
+    ) -> None:
+        # Lesson 1 runs on another engine
+        sandbox_config.warm_pool_lesson_targets = {1: 2, 2: 1}
+        warm_pool = WarmSandboxPool(
+            sandbox_config, schema_manager, lesson_filter=lambda lesson_id: lesson_id != 1
+        )
+        service = SandboxService(
+            config=sandbox_config,
+            sandbox_manager=InMemorySandboxManager(sandbox_config),
+            schema_manager=schema_manager,
+            query_executor=MockQueryExecutor(sandbox_config),
+            warm_pool=warm_pool,
+        )
+
+        assert await warm_pool.refill() == 1
+        sandbox = await service.create_sandbox(user_id=1, lesson_id=1)
+
+        assert sandbox.schema_name not in warm_pool.owned_schema_names()
+        stats = warm_pool.get_stats()
+        assert stats.ready_by_lesson == {2: 1}
+        assert (stats.hits, stats.misses) == (0, 0)